@@ -0,0 +1,26 @@
+"""summary time updated
+
+Revision ID: 3d7f2a9c8e15
+Revises: 5b1e9d0c7a43
+Create Date: 2026-10-17 14:21:08.113406
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3d7f2a9c8e15"
+down_revision = "5b1e9d0c7a43"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("SensorSummaries", sa.Column("time_updated", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False))
+    op.add_column("SensorSummaryRollups", sa.Column("time_updated", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False))
+
+
+def downgrade():
+    op.drop_column("SensorSummaryRollups", "time_updated")
+    op.drop_column("SensorSummaries", "time_updated")
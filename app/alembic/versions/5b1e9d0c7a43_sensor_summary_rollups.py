@@ -0,0 +1,43 @@
+"""sensor summary rollups
+
+Revision ID: 5b1e9d0c7a43
+Revises: ef2a2576db1f
+Create Date: 2026-10-17 11:02:31.540812
+
+"""
+
+import geoalchemy2
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b1e9d0c7a43"
+down_revision = "ef2a2576db1f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "SensorSummaryRollups",
+        sa.Column("sensor_id", sa.Integer(), nullable=False),
+        sa.Column("resolution", sa.String(length=1), nullable=False),
+        sa.Column("timestamp", sa.Integer(), nullable=False),
+        sa.Column("measurement_count", sa.Integer(), nullable=False),
+        sa.Column("measurement_statistics", sa.JSON(), nullable=False),
+        sa.Column("min_latitude", sa.Float(), nullable=True),
+        sa.Column("max_latitude", sa.Float(), nullable=True),
+        sa.Column("min_longitude", sa.Float(), nullable=True),
+        sa.Column("max_longitude", sa.Float(), nullable=True),
+        sa.Column("stationary", sa.Boolean(), nullable=False),
+        sa.Column("geom", geoalchemy2.types.Geometry(geometry_type="POLYGON", srid=4326, spatial_index=False, from_text="ST_GeomFromEWKT", name="geometry"), nullable=True),
+        sa.ForeignKeyConstraint(["sensor_id"], ["SensorPlatforms.id"]),
+        sa.PrimaryKeyConstraint("sensor_id", "resolution", "timestamp"),
+    )
+    # range queries read one resolution across many sensors
+    op.create_index("ix_SensorSummaryRollups_resolution_timestamp", "SensorSummaryRollups", ["resolution", "timestamp"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_SensorSummaryRollups_resolution_timestamp", table_name="SensorSummaryRollups")
+    op.drop_table("SensorSummaryRollups")
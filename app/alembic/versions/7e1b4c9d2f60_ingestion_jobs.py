@@ -0,0 +1,44 @@
+"""ingestion jobs
+
+Revision ID: 7e1b4c9d2f60
+Revises: 3d7f2a9c8e15
+Create Date: 2026-10-17 16:40:52.207311
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7e1b4c9d2f60"
+down_revision = "3d7f2a9c8e15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "IngestionJobs",
+        sa.Column("task_id", sa.String(length=50), nullable=False),
+        sa.Column("sensor_id", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.Integer(), nullable=False),
+        sa.Column("fetch_start", sa.Integer(), nullable=False),
+        sa.Column("incremental", sa.Boolean(), nullable=False),
+        sa.Column("notify", sa.Boolean(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("worker", sa.String(length=100), nullable=True),
+        sa.Column("lease_expires", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("time_created", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("time_updated", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["sensor_id"], ["SensorPlatforms.id"]),
+        sa.PrimaryKeyConstraint("task_id", "sensor_id", "timestamp"),
+    )
+    # workers look up the claimable units by status
+    op.create_index("ix_IngestionJobs_status_time_created", "IngestionJobs", ["status", "time_created"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_IngestionJobs_status_time_created", table_name="IngestionJobs")
+    op.drop_table("IngestionJobs")
@@ -0,0 +1,37 @@
+"""measurement reencoding tasks
+
+Revision ID: b5c81e0f3a47
+Revises: 7e1b4c9d2f60
+Create Date: 2026-10-17 18:12:05.634190
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b5c81e0f3a47"
+down_revision = "7e1b4c9d2f60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "MeasurementReencodingTasks",
+        sa.Column("task_id", sa.String(length=50), nullable=False),
+        sa.Column("cursor_timestamp", sa.Integer(), nullable=True),
+        sa.Column("cursor_sensor_id", sa.Integer(), nullable=True),
+        sa.Column("rows_checked", sa.Integer(), nullable=False),
+        sa.Column("rows_rewritten", sa.Integer(), nullable=False),
+        sa.Column("rows_failed", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("time_created", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("time_updated", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("task_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("MeasurementReencodingTasks")
@@ -0,0 +1,24 @@
+"""rollup spatial index
+
+Revision ID: d3a6f1c8b2e9
+Revises: b5c81e0f3a47
+Create Date: 2026-10-17 20:41:18.207364
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d3a6f1c8b2e9"
+down_revision = "b5c81e0f3a47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the geojson export applies its spatial filters to the geometry of the rollups
+    op.create_index("idx_SensorSummaryRollups_geom", "SensorSummaryRollups", ["geom"], unique=False, postgresql_using="gist")
+
+
+def downgrade():
+    op.drop_index("idx_SensorSummaryRollups_geom", table_name="SensorSummaryRollups", postgresql_using="gist")
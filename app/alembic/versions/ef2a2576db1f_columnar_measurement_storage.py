@@ -0,0 +1,32 @@
+"""columnar measurement storage
+
+Revision ID: ef2a2576db1f
+Revises: c2ca892aa6f6
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "ef2a2576db1f"
+down_revision = "c2ca892aa6f6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("SensorSummaries", sa.Column("measurement_blob", sa.LargeBinary(), nullable=True))
+    op.alter_column("SensorSummaries", "measurement_data", existing_type=sa.JSON(), nullable=True)
+    # the blob is already zlib compressed, so store it out of line without letting postgres try to compress it again
+    op.execute('ALTER TABLE "SensorSummaries" ALTER COLUMN measurement_blob SET STORAGE EXTERNAL')
+
+
+def downgrade():
+    # columnar rows have no json measurement_data, they must be re-ingested with MEASUREMENT_STORAGE_FORMAT=json before downgrading
+    columnar_rows = op.get_bind().execute(sa.text('SELECT count(*) FROM "SensorSummaries" WHERE measurement_data IS NULL')).scalar()
+    if columnar_rows:
+        raise RuntimeError(f"{columnar_rows} sensor summaries are stored in the columnar format, re-ingest them as json before downgrading")
+    op.alter_column("SensorSummaries", "measurement_data", existing_type=sa.JSON(), nullable=False)
+    op.drop_column("SensorSummaries", "measurement_blob")
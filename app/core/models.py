@@ -1,7 +1,7 @@
 from db.database import Base
 from geoalchemy2 import Geometry
 from geoalchemy2.shape import to_shape
-from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -101,17 +101,21 @@ class SensorSummaries(Base):
     :timestamp (DateTime), primary key
     :geom (Geometry)
     :measurement_count (Integer)
-    :measurement_data (JSON)
+    :measurement_data (JSON), null when the measurements are stored in measurement_blob
+    :measurement_blob (LargeBinary), compressed columnar measurements (see measurement_codec)
     :stationary (Boolean)
-    :sensor_id (Integer), foreign key"""
+    :sensor_id (Integer), foreign key
+    :time_updated (DateTime), when the row was last written (used to validate cached responses)"""
 
     __tablename__ = "SensorSummaries"
     timestamp = Column(Integer, primary_key=True, nullable=False)
     geom = Column(Geometry(geometry_type="POLYGON", srid=4326, spatial_index=True), unique=False, nullable=True)  # TODO check if spatial index is needed for alembic
     measurement_count = Column(Integer, nullable=False)
-    measurement_data = Column(JSON, nullable=False)
+    measurement_data = Column(JSON(none_as_null=True), nullable=True)
+    measurement_blob = Column(LargeBinary, nullable=True)
     stationary = Column(Boolean, nullable=False)
     sensor_id = Column(Integer, ForeignKey("SensorPlatforms.id"), primary_key=True, nullable=False)
+    time_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # relationship to sensors table
     SensorId_fk = relationship("SensorPlatforms")
@@ -127,6 +131,107 @@ class SensorSummaries(Base):
         }
 
 
+class SensorSummaryRollups(Base):
+    """SensorSummaryRollups table extends Base class from database.py
+    pre-aggregated sensor summaries, kept up to date by the data ingestion tasks (see routers/services/rollups.py)
+    :sensor_id (Integer), primary key, foreign key
+    :resolution (String), primary key, H (hourly), D (daily) or M (monthly)
+    :timestamp (Integer), primary key, start of the period (UTC)
+    :measurement_count (Integer), number of readings in the period
+    :measurement_statistics (JSON), mean, min, max, median and count of each measurement column e.g {"PM2.5": {"mean": 1.2, ...}}
+    :min_latitude, max_latitude, min_longitude, max_longitude (Float), location extent of the readings
+    :stationary (Boolean)
+    :geom (Geometry), stationary bounding box of the sensor, or the box around the readings of a mobile sensor
+    :time_updated (DateTime), when the row was last written (used to validate cached responses)
+    """
+
+    __tablename__ = "SensorSummaryRollups"
+    sensor_id = Column(Integer, ForeignKey("SensorPlatforms.id"), primary_key=True, nullable=False)
+    resolution = Column(String(1), primary_key=True, nullable=False)
+    timestamp = Column(Integer, primary_key=True, nullable=False)
+    measurement_count = Column(Integer, nullable=False)
+    measurement_statistics = Column(JSON, nullable=False)
+    min_latitude = Column(Float, nullable=True)
+    max_latitude = Column(Float, nullable=True)
+    min_longitude = Column(Float, nullable=True)
+    max_longitude = Column(Float, nullable=True)
+    stationary = Column(Boolean, nullable=False)
+    geom = Column(Geometry(geometry_type="POLYGON", srid=4326, spatial_index=True), unique=False, nullable=True)
+    time_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # range queries read one resolution across many sensors
+    __table_args__ = (Index("ix_SensorSummaryRollups_resolution_timestamp", "resolution", "timestamp"),)
+
+    SensorId_fk = relationship("SensorPlatforms")
+
+
+class IngestionJobs(Base):
+    """IngestionJobs table extends Base class from database.py
+    durable queue of the data ingestion work units, one for each sensor and day (see routers/services/ingestion_queue.py)
+    :task_id (String), primary key, the task that scheduled the unit (the task_id returned by the schedule endpoints and the date of its log)
+    :sensor_id (Integer), primary key, foreign key
+    :timestamp (Integer), primary key, start of the day (UTC)
+    :fetch_start (Integer), start of the readings to fetch, later than timestamp if the sensor was already updated during the day
+    :incremental (Boolean), only append the new readings to the stored sensor summaries
+    :notify (Boolean), report the progress of the task to the firebase notification of the user who scheduled it
+    :status (String), queued, running, done or failed
+    :attempts (Integer), number of times the unit was claimed by a worker
+    :message (String), error message of a unit that failed
+    :worker (String), worker that last claimed the unit
+    :lease_expires (DateTime), a running unit is claimed again once its lease has expired (e.g its worker crashed)
+    :time_created (DateTime)
+    :time_updated (DateTime)
+    """
+
+    __tablename__ = "IngestionJobs"
+    task_id = Column(String(50), primary_key=True, nullable=False)
+    sensor_id = Column(Integer, ForeignKey("SensorPlatforms.id"), primary_key=True, nullable=False)
+    timestamp = Column(Integer, primary_key=True, nullable=False)
+    fetch_start = Column(Integer, nullable=False)
+    incremental = Column(Boolean, nullable=False, default=False)
+    notify = Column(Boolean, nullable=False, default=False)
+    status = Column(String(10), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    message = Column(String(), nullable=True)
+    worker = Column(String(100), nullable=True)
+    lease_expires = Column(DateTime(timezone=True), nullable=True)
+    time_created = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    time_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # workers look up the claimable units by status
+    __table_args__ = (Index("ix_IngestionJobs_status_time_created", "status", "time_created"),)
+
+    SensorId_fk = relationship("SensorPlatforms")
+
+
+class MeasurementReencodingTasks(Base):
+    """MeasurementReencodingTasks table extends Base class from database.py
+    progress of the tasks that rewrite the legacy measurement_data of the sensor summaries as strict json (see routers/services/measurement_reencoding.py)
+    :task_id (String), primary key
+    :cursor_timestamp (Integer), timestamp of the last sensor summary checked, the task resumes after it
+    :cursor_sensor_id (Integer), sensor id of the last sensor summary checked
+    :rows_checked (Integer), number of sensor summaries checked
+    :rows_rewritten (Integer), number of sensor summaries rewritten as strict json
+    :rows_failed (Integer), number of sensor summaries whose measurement_data could not be parsed
+    :status (String), running, done or failed
+    :message (String), error of a failed task or of the last sensor summary that could not be parsed
+    :time_created (DateTime)
+    :time_updated (DateTime)
+    """
+
+    __tablename__ = "MeasurementReencodingTasks"
+    task_id = Column(String(50), primary_key=True, nullable=False)
+    cursor_timestamp = Column(Integer, nullable=True)
+    cursor_sensor_id = Column(Integer, nullable=True)
+    rows_checked = Column(Integer, nullable=False, default=0)
+    rows_rewritten = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    status = Column(String(10), nullable=False)
+    message = Column(String(), nullable=True)
+    time_created = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    time_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
 class SensorPlatformTypeConfig(Base):
     """SensorPlatformTypeConfig table extends Base class from database.py
     stores configuration for generic sensor platform types
@@ -13,7 +13,8 @@ class SensorSummary(BaseModel):
     :timestamp (int)
     :geom (Optional[str]), WKTElement format
     :measurement_count (int)
-    :measurement_data (str), JSON format
+    :measurement_data (Optional[str]), JSON format
+    :measurement_blob (Optional[bytes]), columnar binary format (see measurement_codec)
     :stationary (bool)
     :sensor_id (str)
     """
@@ -21,7 +22,8 @@ class SensorSummary(BaseModel):
     timestamp: int
     geom: Optional[str] = None
     measurement_count: int
-    measurement_data: str
+    measurement_data: Optional[str] = None
+    measurement_blob: Optional[bytes] = None
     stationary: bool
     sensor_id: str
 
@@ -59,7 +61,8 @@ class SensorSummary(BaseModel):
         :param v: measurement_data
         :return: v if valid, raise HTTPException if not"""
         try:
-            json.loads(v)
+            if v is not None:
+                json.loads(v)
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"measurement_data must be a valid json: {e}")
         return v
@@ -0,0 +1,158 @@
+"""Worker of the data ingestion queue (see routers/services/ingestion_queue.py).
+
+    python ingestion_worker.py
+
+starts INGESTION_WORKER_PROCESSES processes. Each process claims up to INGESTION_WORKER_BATCH units at a time, fetches
+the sensor data of the claimed units (the units of a day are fetched together, so the vendors that batch their
+requests still can), writes the sensor summaries and rollups and, once every unit of a task has finished, writes the
+log of the task. Workers only share the database, so more of them can be started on any machine to scale ingestion out.
+
+The settings are read from the environment:
+    INGESTION_WORKER_PROCESSES: number of worker processes (default 2)
+    INGESTION_WORKER_BATCH: maximum number of units claimed at a time (default 20)
+    INGESTION_WORKER_POLL_SECONDS: seconds to wait before polling an empty queue again (default 5)
+"""
+
+import datetime as dt
+import multiprocessing
+import os
+import socket
+import time
+from os import environ as env
+
+from core.schema import DataIngestionLog as SchemaDataIngestionLog
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from routers.background_tasks import finish_ingestion_task, update_rollups, update_sensor_last_updated, write_sensor_summaries
+from routers.services.enums import ingestionJobStatus
+from routers.services.ingestion_queue import INGESTION_JOB_MAX_ATTEMPTS, SECONDS_IN_DAY, claim_ingestion_jobs, finish_ingestion_job, retry_ingestion_job
+from routers.services.sensorPlatform_utils import get_sensor_dict
+from sensor_api_wrappers.sensorPlatform_factory_wrapper import SensorPlatformFactoryWrapper
+
+load_dotenv()
+
+INGESTION_WORKER_PROCESSES = int(env.get("INGESTION_WORKER_PROCESSES", 2))
+INGESTION_WORKER_BATCH = int(env.get("INGESTION_WORKER_BATCH", 20))
+INGESTION_WORKER_POLL_SECONDS = float(env.get("INGESTION_WORKER_POLL_SECONDS", 5))
+
+NO_DATA_MESSAGE = "No data was found for this sensor in the given date range"
+
+
+def sensor_dict_of_jobs(jobs: list) -> dict[str, dict[str, dict]]:
+    """creates the data ingestion information of the sensors of units of the same day, in the format of get_lookupids_of_sensors.
+    A unit that resumes from when its sensor was last updated gets that time as the time_updated of its sensor
+    :param jobs: claimed units of the same day
+    :return: [sensor_type_name][lookup_id] = {"stationary_box": stationary_box, ...}"""
+    fetch_start = {job.sensor_id: job.fetch_start for job in jobs if job.fetch_start > job.timestamp}
+    (sensors, _) = get_sensor_dict(active_only=False, idtype="sensor_id", ids=[job.sensor_id for job in jobs])
+
+    sensor_dict = {}
+    for sensor in sensors:
+        info = {key: value for key, value in sensor.items() if key not in ("id", "type_name", "lookup_id", "time_updated")}
+        if sensor["id"] in fetch_start:
+            info["time_updated"] = dt.datetime.utcfromtimestamp(fetch_start[sensor["id"]])
+        sensor_dict.setdefault(sensor["type_name"], {})[str(sensor["lookup_id"])] = info
+    return sensor_dict
+
+
+def job_results(jobs: list, data_ingestion_logs: list[SchemaDataIngestionLog]) -> dict[tuple[int, int], tuple[str, str]]:
+    """derives the status of each unit from the data ingestion logs of its day. A unit without a written sensor summary has failed
+    :param jobs: claimed units
+    :param data_ingestion_logs: data ingestion logs of the sensor summaries written for the units
+    :return: [(sensor_id, timestamp)] = (status, message)"""
+    logs = {}
+    for data_ingestion_log in data_ingestion_logs:
+        key = (data_ingestion_log.sensor_id, data_ingestion_log.timestamp)
+        # a successful log takes precedence over the failures of the same sensor and day
+        if key not in logs or data_ingestion_log.success_status:
+            logs[key] = data_ingestion_log
+
+    results = {}
+    for job in jobs:
+        data_ingestion_log = logs.get((job.sensor_id, job.timestamp))
+        if data_ingestion_log is None:
+            results[(job.sensor_id, job.timestamp)] = (ingestionJobStatus.failed.value, NO_DATA_MESSAGE)
+        elif data_ingestion_log.success_status:
+            results[(job.sensor_id, job.timestamp)] = (ingestionJobStatus.done.value, data_ingestion_log.message)
+        else:
+            results[(job.sensor_id, job.timestamp)] = (ingestionJobStatus.failed.value, data_ingestion_log.message or NO_DATA_MESSAGE)
+    return results
+
+
+def run_ingestion_jobs(jobs: list, worker: str, sfw: SensorPlatformFactoryWrapper):
+    """runs claimed units, the units of the same day are fetched and written together.
+    If fetching or writing raises an error the units are queued again (see retry_ingestion_job)
+    :param jobs: claimed units
+    :param worker: name of the worker
+    :param sfw: sensor platform factory wrapper"""
+    days = {}
+    for job in jobs:
+        # the worker of the last attempt did not finish the unit before its lease expired
+        if job.attempts > INGESTION_JOB_MAX_ATTEMPTS:
+            finish_ingestion_job(job, worker, ingestionJobStatus.failed.value, job.message or "The unit was not finished before its lease expired")
+            continue
+        days.setdefault((job.timestamp, job.incremental), []).append(job)
+
+    for (timestamp, incremental), day_jobs in sorted(days.items()):
+        startDate = dt.datetime.utcfromtimestamp(timestamp)
+        try:
+            data_ingestion_logs = []
+            sensor_dict = sensor_dict_of_jobs(day_jobs)
+            if sensor_dict:
+                data_ingestion_logs = write_sensor_summaries(sfw.fetch_sensor_data_concurrently(sensor_dict, startDate, startDate + dt.timedelta(seconds=SECONDS_IN_DAY)), [], incremental)
+            update_rollups(data_ingestion_logs)
+            update_sensor_last_updated(data_ingestion_logs)
+        except Exception as e:
+            message = str(e.detail) if isinstance(e, HTTPException) else str(e)
+            print(f"units of {startDate.date()} failed: {message}")
+            for job in day_jobs:
+                retry_ingestion_job(job, worker, message)
+            continue
+
+        results = job_results(day_jobs, data_ingestion_logs)
+        for job in day_jobs:
+            finish_ingestion_job(job, worker, *results[(job.sensor_id, job.timestamp)])
+
+
+def work_once(worker: str, sfw: SensorPlatformFactoryWrapper = None, limit: int = INGESTION_WORKER_BATCH) -> int:
+    """claims and runs one batch of units
+    :param worker: name of the worker
+    :param sfw: sensor platform factory wrapper
+    :param limit: maximum number of units to claim
+    :return: number of units claimed"""
+    jobs = claim_ingestion_jobs(worker, limit)
+    if not jobs:
+        return 0
+
+    run_ingestion_jobs(jobs, worker, sfw or SensorPlatformFactoryWrapper())
+    for task_id in {job.task_id for job in jobs}:
+        try:
+            finish_ingestion_task(task_id)
+        except Exception as e:
+            print(f"could not finish the data ingestion task {task_id}: {e}")
+    return len(jobs)
+
+
+def run_worker(worker: str):
+    """claims and runs units until the process is stopped, a stopped worker's units are claimed again when their lease expires
+    :param worker: name of the worker"""
+    sfw = SensorPlatformFactoryWrapper()
+    print(f"ingestion worker {worker} started")
+    while True:
+        try:
+            claimed = work_once(worker, sfw)
+        except Exception as e:
+            print(f"ingestion worker {worker} failed to claim units: {e}")
+            claimed = 0
+        if claimed == 0:
+            time.sleep(INGESTION_WORKER_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    # processes are spawned rather than forked so that they do not share the database connections of the parent process
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(f"{socket.gethostname()}:{os.getpid()}:{i}",), daemon=True) for i in range(INGESTION_WORKER_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -1,29 +1,69 @@
-from fastapi import Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import status
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 MAX_FILE_SIZE_MB = 800
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
 
-class FileSizeLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class UploadTooLarge(Exception):
+    """Raised when a multipart body exceeds MAX_FILE_SIZE_BYTES while it is being received"""
+
+
+class FileSizeLimitMiddleware:
+    """Rejects multipart uploads larger than MAX_FILE_SIZE_BYTES.
+    The body is not buffered: it is counted as it is streamed to the handler (which spools the file to disk),
+    and an upload with a Content-Length over the limit is rejected before any of it is read."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Only check for multipart/form-data (file uploads)
-        content_type = request.headers.get("content-type", "")
-        if "multipart/form-data" in content_type.lower():
-            # Read the body to check the size
-            body = await request.body()
-            if len(body) > MAX_FILE_SIZE_BYTES:
-
-                return JSONResponse(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    content={"detail": f"Uploaded file size exceeds {MAX_FILE_SIZE_MB}MB limit."},
-                )
-
-            # Re-inject the body for downstream handlers
-            async def receive():
-                return {"type": "http.request", "body": body}
-
-            request._receive = receive
-        response = await call_next(request)
-        return response
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        if "multipart/form-data" not in headers.get("content-type", "").lower():
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_FILE_SIZE_BYTES:
+            return await self.too_large()(scope, receive, send)
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def receive_counted() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_FILE_SIZE_BYTES:
+                    exceeded = True
+                    raise UploadTooLarge()
+            return message
+
+        async def send_tracked(message: Message):
+            nonlocal response_started
+            # the error response of the handler that failed to read the body is replaced by a 413
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counted, send_tracked)
+        except UploadTooLarge:
+            if response_started:
+                raise
+        if exceeded and not response_started:
+            await self.too_large()(scope, receive, send)
+
+    @staticmethod
+    def too_large() -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": f"Uploaded file size exceeds {MAX_FILE_SIZE_MB}MB limit."},
+        )
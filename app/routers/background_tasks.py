@@ -3,7 +3,7 @@ import json
 
 # enviroment variables dependacies
 from os import environ as env
-from typing import Tuple
+from typing import Iterable, Tuple
 
 from core.authentication import AuthHandler
 from core.models import SensorSummaries
@@ -14,12 +14,26 @@ from core.schema import SensorSummary as SchemaSensorSummary
 # sensor summary
 from dotenv import load_dotenv
 from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from routers.logs import add_log
-from routers.sensorSummaries import upsert_sensorSummary
+from routers.sensorSummaries import append_sensorSummaries, upsert_sensorSummaries
 from routers.services.crud.crud import CRUD
+from routers.services.enums import ingestionJobStatus, reencodingTaskStatus
 from routers.services.firebase_notifications import addFirebaseNotifcationDataIngestionTask, clearFirebaseNotifcationDataIngestionTask, updateFirebaseNotifcationDataIngestionTask
-from routers.services.formatting import convertDateRangeStringToDate
-from routers.services.sensorPlatform_utils import deactivate_unsynced_sensor, get_lookupids_of_sensors, get_sensor_info_from_lookup_id_and_type, set_last_updated
+from routers.services.formatting import convertDateRangeStringToDate, convertDateRangeStringToTimestamp
+from routers.services.ingestion_queue import (
+    enqueue_ingestion_jobs,
+    failed_ingestion_job,
+    get_ingestion_task_jobs,
+    get_recent_ingestion_jobs,
+    ingestion_jobs,
+    ingestion_task_log,
+    ingestion_task_status,
+    unfinished_ingestion_job_count,
+)
+from routers.services.measurement_reencoding import create_measurement_reencoding_task, get_measurement_reencoding_task, measurement_reencoding_status, run_measurement_reencoding
+from routers.services.rollups import refresh_sensor_rollups
+from routers.services.sensorPlatform_utils import deactivate_unsynced_sensor, get_lookupids_of_sensors, get_sensor_dict, get_sensor_info_from_lookup_id_and_type, set_last_updated
 from sensor_api_wrappers.sensorPlatform_factory_wrapper import SensorPlatformFactoryWrapper
 
 load_dotenv()
@@ -30,118 +44,136 @@ backgroundTasksRouter = APIRouter()
 # TODO add leap year check
 dateRegex = "\s+(?:0[1-9]|[12][0-9]|3[01])[-/.](?:0[1-9]|1[012])[-/.](?:19\d{2}|20\d{2}|2100)\b"
 
+# number of sensor summaries written to the database with each upsert statement
+SENSOR_SUMMARY_BATCH_SIZE = 100
 
-# @backgroundTasksRouter.put("/upsert/sensor-data-ingestion-by-IdList/{start}/{end}/{type_of_id}")
-def upsert_sensor_summary_by_id_list(
-    start: str = Query(regex=dateRegex),
-    end: str = Query(regex=dateRegex),
-    id_list: list[int] = Query(default=[]),
-    type_of_id: str = Query(default="sensor_id"),
-    log_timestamp: str = Query(default=dt.datetime.today().strftime("%Y-%m-%d %H:%M:%S")),
-):
-    """start a background task to ingest sensor data using a list of ids. The type of id must be specified
+
+def schedule_ingestion_jobs(task_id: str, start: str, end: str, id_list: list[int], type_of_id: str = "sensor_id", incremental: bool = False, notify: bool = False) -> int:
+    """adds the work units of a data ingestion task to the ingestion queue, they are run by the ingestion workers (see ingestion_worker.py).
+    A sensor of a sensor type that has not been updated in over 90 days is deactivated and recorded as a failed unit instead.
+    If no unit is queued then no worker finishes the task, so it is finished here
+    :param task_id: id of the task
     :param start: start date of the data to be ingested. (e.g 20-08-2022)
     :param end: end date of the data to be ingested (e.g 26-08-2022)
     :param id_list: list of ids
-    :param type_of_id: type of id. Can be sensor_id or sensor_type_id
-    :param log_timestamp: timestamp of the log
+    :param type_of_id: type of id. Can be sensor_id or sensor_type_id. The active sensors of a sensor type resume from when they were last updated
+    :param incremental: if true then only the readings newer than the stored sensor summaries are appended to them, instead of replacing the stored days
+    :param notify: if true then the firebase notification of the task is updated when it finishes
+    :return: number of units added to the queue (including the failed units)
     """
-
     startDate, endDate = convertDateRangeStringToDate(start, end)
 
-    sfw = SensorPlatformFactoryWrapper()
-
-    data_ingestion_logs = []
-
     if type_of_id == "sensor_id":
-        sensor_dict, flagged_sensors = get_lookupids_of_sensors(active_only=False, ids=id_list, idtype="sensor_id")
-    elif type_of_id == "sensor_type_id":
-        sensor_dict, flagged_sensors = get_lookupids_of_sensors(active_only=True, ids=id_list, idtype="sensor_type_id")
+        sensors, flagged_sensors = get_sensor_dict(active_only=False, idtype="sensor_id", ids=id_list)
+        jobs = ingestion_jobs(task_id, sensors, startDate, endDate, incremental=incremental, notify=notify)
+    else:
+        sensors, flagged_sensors = get_sensor_dict(active_only=True, idtype="sensor_type_id", ids=id_list)
+        jobs = ingestion_jobs(task_id, sensors, startDate, endDate, incremental=incremental, notify=notify, resume=True)
         # only deactivate sensors that have not been updated in over 90 days for the cron job which uses sensor_type_id
-        if flagged_sensors:
-            for flaggedSensor in flagged_sensors:
-                deactivate_unsynced_sensor(flaggedSensor["id"])
-                data_ingestion_logs.append(
-                    SchemaDataIngestionLog(
-                        sensor_id=flaggedSensor["id"],
-                        sensor_serial_number=flaggedSensor["serial_number"],
-                        timestamp=int(dt.datetime.now().timestamp()),
-                        success_status=False,
-                        message="Sensor has not been updated in over 90 days",
-                    )
-                )
+        for flaggedSensor in flagged_sensors:
+            deactivate_unsynced_sensor(flaggedSensor["id"])
+            jobs.append(failed_ingestion_job(task_id, flaggedSensor["id"], "Sensor has not been updated in over 90 days"))
 
-    if sensor_dict:
-        # for each sensor type, fetch the data from the sfw and write to the database
-        for sensorType, sensorDataMapping in sensor_dict.items():
-            for sensorSummary in sfw.fetch_sensor_data(sensorType, startDate, endDate, sensorDataMapping):
-                data_ingestion_logs = append_data_ingestion_logs(sensorSummary, data_ingestion_logs, sensorType)
-    else:
-        if type_of_id == "sensor_id":
-            try:
-                updateFirebaseNotifcationDataIngestionTask(log_timestamp, -1, "❌ No active sensors found")
-            except Exception as e:
-                return "No active sensors found"
+    count = enqueue_ingestion_jobs(jobs)
+    if not any(job["status"] == ingestionJobStatus.queued.value for job in jobs):
+        finish_ingestion_task(task_id)
+    return count
 
-    if len(data_ingestion_logs) == 0:
-        if type_of_id == "sensor_id":
-            try:
-                updateFirebaseNotifcationDataIngestionTask(log_timestamp, -1, "❌ No data was found for the requested sensors in the given date range")
-            except Exception as e:
-                return "No data was found for this sensor in the given date range"
 
-    else:
-        # return timestamp and sensor id of the summaries that were successfully written to the database
-        log_dict = update_sensor_last_updated(data_ingestion_logs, log_timestamp)
-        if type_of_id == "sensor_id":
-            try:
-                updateFirebaseNotifcationDataIngestionTask(log_timestamp, 1, "✅ data ingestion task completed")
-            except Exception as e:
-                print("✅ data ingestion task completed")
-            return log_dict
+def finish_ingestion_task(task_id: str):
+    """writes the log of a task and updates its firebase notification once all of its units have finished.
+    The log is keyed by the task id, so only one of the workers that finish the last units of a task writes it
+    :param task_id: id of the task"""
+    if unfinished_ingestion_job_count(task_id) > 0:
+        return
+
+    jobs = get_ingestion_task_jobs(task_id)
+    try:
+        add_log(task_id, SchemaLog(log_data=json.dumps(ingestion_task_log(jobs))))
+    except HTTPException as e:
+        # another worker has already finished the task
+        if e.status_code == status.HTTP_409_CONFLICT:
+            return
+        raise e
 
-    return
+    if any(job.notify for job in jobs):
+        try:
+            if any(job.status == ingestionJobStatus.done.value for job in jobs):
+                updateFirebaseNotifcationDataIngestionTask(task_id, 1, "✅ data ingestion task completed")
+            else:
+                updateFirebaseNotifcationDataIngestionTask(task_id, -1, "❌ No data was found for the requested sensors in the given date range")
+        except Exception as e:
+            print(f"could not update the notification of data ingestion task {task_id}: {e}")
 
 
-def append_data_ingestion_logs(sensorSummary: SchemaSensorSummary, data_ingestion_logs: list[SchemaDataIngestionLog], sensorType: str) -> list[SchemaDataIngestionLog]:
-    """append a data ingestion log to the data ingestion logs
+def write_sensor_summaries(sensorSummaries: Iterable[tuple[str, SchemaSensorSummary]], data_ingestion_logs: list[SchemaDataIngestionLog], incremental: bool = False) -> list[SchemaDataIngestionLog]:
+    """writes sensor summaries to the database in batches and appends a data ingestion log for each of them
+    :param sensorSummaries: iterable of the sensor type and sensor summary (the sensor_id of each summary is its lookup id)
     :param data_ingestion_logs: list of data ingestion logs
-    :param sensorSummary: sensor summary object
-    """
-    (sensorSummary.sensor_id, sensor_serial_number) = get_sensor_info_from_lookup_id_and_type(lookup_id=str(sensorSummary.sensor_id), sensor_type=sensorType)
+    :param incremental: if true then the new readings are appended to the stored sensor summaries (see append_sensorSummaries)
+    :return: data ingestion logs"""
+    sensor_info = {}
+    batch = []
+    for sensorType, sensorSummary in sensorSummaries:
+        # the sensor id and serial number are looked up once for each sensor
+        lookup = (str(sensorSummary.sensor_id), sensorType)
+        if lookup not in sensor_info:
+            sensor_info[lookup] = get_sensor_info_from_lookup_id_and_type(lookup_id=lookup[0], sensor_type=sensorType)
+        (sensorSummary.sensor_id, sensor_serial_number) = sensor_info[lookup]
+
+        # if the sensor has data we upsert the sensor summary with the next batch
+        if sensorSummary.measurement_count > 0:
+            batch.append((sensorSummary, sensor_serial_number))
+            if len(batch) == SENSOR_SUMMARY_BATCH_SIZE:
+                upsert_sensor_summary_batch(batch, data_ingestion_logs, incremental)
+                batch = []
+
+        # else the sensor has no data. So we log the failure
+        else:
+            message = "No data was found for this sensor in the given date range"
+            try:
+                message = json.loads(sensorSummary.measurement_data)["message"]
+            except Exception as e:
+                pass
 
-    # if the sensor has data we try to upsert a sensor summary into the database
-    if sensorSummary.measurement_count > 0:
-        try:
-            upsert_sensorSummary(sensorSummary)
-            data_ingestion_logs.append(SchemaDataIngestionLog(sensor_id=sensorSummary.sensor_id, sensor_serial_number=sensor_serial_number, timestamp=sensorSummary.timestamp, success_status=True))
-        # if the upsert fails we log the failure
-        except Exception as e:
             data_ingestion_logs.append(
-                SchemaDataIngestionLog(sensor_id=sensorSummary.sensor_id, sensor_serial_number=sensor_serial_number, timestamp=sensorSummary.timestamp, success_status=False, message=str(e))
-            )
-
-    # else the sensor has no data. So we log the failure
-    else:
-        message = "No data was found for this sensor in the given date range"
-        try:
-            message = json.loads(sensorSummary.measurement_data)["message"]
-        except Exception as e:
-            pass
-
-        data_ingestion_logs.append(
-            SchemaDataIngestionLog(
-                sensor_id=sensorSummary.sensor_id,
-                sensor_serial_number=sensor_serial_number,
-                timestamp=sensorSummary.timestamp,
-                success_status=False,
-                message=message,
+                SchemaDataIngestionLog(
+                    sensor_id=sensorSummary.sensor_id,
+                    sensor_serial_number=sensor_serial_number,
+                    timestamp=sensorSummary.timestamp,
+                    success_status=False,
+                    message=message,
+                )
             )
-        )
 
+    if batch:
+        upsert_sensor_summary_batch(batch, data_ingestion_logs, incremental)
     return data_ingestion_logs
 
 
+def upsert_sensor_summary_batch(batch: list[tuple[SchemaSensorSummary, str]], data_ingestion_logs: list[SchemaDataIngestionLog], incremental: bool = False):
+    """upserts a batch of sensor summaries with a single statement, the data ingestion logs are derived from the rows the statement returned
+    :param batch: list of sensor summaries and the serial numbers of their sensors
+    :param data_ingestion_logs: list of data ingestion logs to append to
+    :param incremental: if true then only the new readings are appended to the stored sensor summaries"""
+    message = "Sensor summary was not written to the database"
+    upsert = append_sensorSummaries if incremental else upsert_sensorSummaries
+    try:
+        written = {(row.sensor_id, row.timestamp) for row in upsert([sensorSummary for sensorSummary, _ in batch])}
+    # if the upsert fails we log the failure of every summary in the batch
+    except Exception as e:
+        written = set()
+        message = str(e)
+
+    for sensorSummary, sensor_serial_number in batch:
+        if (sensorSummary.sensor_id, sensorSummary.timestamp) in written:
+            data_ingestion_logs.append(SchemaDataIngestionLog(sensor_id=sensorSummary.sensor_id, sensor_serial_number=sensor_serial_number, timestamp=sensorSummary.timestamp, success_status=True))
+        else:
+            data_ingestion_logs.append(
+                SchemaDataIngestionLog(sensor_id=sensorSummary.sensor_id, sensor_serial_number=sensor_serial_number, timestamp=sensorSummary.timestamp, success_status=False, message=message)
+            )
+
+
 @backgroundTasksRouter.post("/upload-file/")
 async def upload_sensor_data(sensor_ids: list[int], file: UploadFile, payload=Depends(auth_handler.auth_wrapper)):
     """
@@ -163,7 +195,6 @@ async def upload_sensor_data(sensor_ids: list[int], file: UploadFile, payload=De
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
         # TODO add firebase notification task to the realtime db
         data_ingestion_logs = []
-        file_content = await file.read()
         # get sensor dict of the sensor
         (sensor_dict, flagged_sensors) = get_lookupids_of_sensors(active_only=False, ids=sensor_ids, idtype="sensor_id")
 
@@ -190,10 +221,13 @@ async def upload_sensor_data(sensor_ids: list[int], file: UploadFile, payload=De
                 elif "purpleair" in sensorType.lower() or "airgradient" in sensorType.lower():
                     # check if the file is a csv file
                     if check_file_type(file, ["text/csv"]):
-                        for sensorSummary in sfw.upload_user_input_sensor_data(sensor_type=sensorType, sensor_dict=sensorDataMapping, file=file_content):
-                            data_ingestion_logs = append_data_ingestion_logs(sensorSummary=sensorSummary, data_ingestion_logs=data_ingestion_logs, sensorType=sensorType)
+                        # the upload is spooled to a temporary file, it is parsed in chunks and written in batches on a worker thread
+                        await file.seek(0)
+                        sensorSummaries = sfw.upload_user_input_sensor_data(sensor_type=sensorType, sensor_dict=sensorDataMapping, file=file.file)
+                        data_ingestion_logs = await run_in_threadpool(write_sensor_summaries, ((sensorType, sensorSummary) for sensorSummary in sensorSummaries), data_ingestion_logs)
                 else:
                     raise ValueError(f"Unsupported sensor type: {sensorType}")
+        await run_in_threadpool(update_rollups, data_ingestion_logs)
         return data_ingestion_logs
     except HTTPException as e:
         raise e
@@ -203,14 +237,13 @@ async def upload_sensor_data(sensor_ids: list[int], file: UploadFile, payload=De
 
 @backgroundTasksRouter.post("/schedule/ingest-bysensorid/{start}/{end}")
 async def schedule_data_ingest_task_by_sensorid(
-    background_tasks: BackgroundTasks,
     start: str = Query(regex=dateRegex),
     end: str = Query(regex=dateRegex),
     sensor_ids: list[int] = Query(default=[], description="list of sensor ids to search for"),
     payload=Depends(auth_handler.auth_wrapper),
 ):
     """
-    Run by admins to schedule the data ingest task in the background for a list of sensors by sensor id
+    Run by admins to schedule the data ingest task for a list of sensors by sensor id. The task is added to the ingestion queue and run by the ingestion workers
     \n :param start: start date of the data to be ingested. (e.g 20-08-2022)
     \n :param end: end date of the data to be ingested (e.g 26-08-2022)
     \n :param sensor_ids: list of sensor ids
@@ -220,20 +253,95 @@ async def schedule_data_ingest_task_by_sensorid(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
 
     log_timestamp = dt.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
-    background_tasks.add_task(upsert_sensor_summary_by_id_list, start, end, sensor_ids, "sensor_id", log_timestamp)
 
     # get the user id from the payload
     uid = payload["sub"]
     # add a firebase notification task to the realtime db
     addFirebaseNotifcationDataIngestionTask(uid, log_timestamp, 0, "🔎 searching for sensors")
 
+    if await run_in_threadpool(schedule_ingestion_jobs, log_timestamp, start, end, sensor_ids, "sensor_id", False, True) == 0:
+        try:
+            updateFirebaseNotifcationDataIngestionTask(log_timestamp, -1, "❌ No active sensors found")
+        except Exception as e:
+            print("No active sensors found")
+
+    return {"task_id": log_timestamp, "task_message": "task sent to backend"}
+
+
+@backgroundTasksRouter.post("/schedule/rebuild-rollups/{start}/{end}")
+async def schedule_rebuild_rollups_task(
+    background_tasks: BackgroundTasks,
+    start: str = Query(regex=dateRegex),
+    end: str = Query(regex=dateRegex),
+    sensor_ids: list[int] = Query(default=[], description="list of sensor ids to rebuild, leave empty to rebuild all sensors"),
+    payload=Depends(auth_handler.auth_wrapper),
+):
+    """
+    Run by admins to rebuild the hourly, daily and monthly rollups from the sensor summaries already in the database (e.g after a migration)
+    \n :param start: start date of the sensor summaries to roll up. (e.g 20-08-2022)
+    \n :param end: end date of the sensor summaries to roll up (e.g 26-08-2022)
+    \n :param sensor_ids: list of sensor ids
+    \n :return: task_id and task_message
+    """
+    if auth_handler.checkRoleAdmin(payload) == False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
+
+    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end)
+    log_timestamp = dt.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
+    background_tasks.add_task(rebuild_rollups, timestampStart, timestampEnd, sensor_ids)
+
     return {"task_id": log_timestamp, "task_message": "task sent to backend"}
 
 
+@backgroundTasksRouter.post("/schedule/reencode-measurement-data")
+async def schedule_reencode_measurement_data_task(
+    background_tasks: BackgroundTasks,
+    task_id: str = Query(default=None, description="task_id of an interrupted or failed task to resume, leave empty to start a new task"),
+    payload=Depends(auth_handler.auth_wrapper),
+):
+    """
+    Run by admins to rewrite the measurement_data of the sensor summaries that were stored as python dictionary strings as strict json.
+    The task saves its progress after every batch of sensor summaries, so a task that was interrupted resumes from where it stopped
+    \n :param task_id: task_id of the task to resume
+    \n :return: task_id and task_message
+    """
+    if auth_handler.checkRoleAdmin(payload) == False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
+
+    if task_id is None:
+        task_id = dt.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
+        create_measurement_reencoding_task(task_id)
+    else:
+        task = get_measurement_reencoding_task(task_id)
+        if task is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        if task.status == reencodingTaskStatus.done.value:
+            return {"task_id": task_id, "task_message": "task already completed"}
+
+    background_tasks.add_task(run_measurement_reencoding, task_id)
+    return {"task_id": task_id, "task_message": "task sent to backend"}
+
+
+@backgroundTasksRouter.get("/measurement-reencoding/{task_id}")
+def get_measurement_reencoding_progress(task_id: str, payload=Depends(auth_handler.auth_wrapper)):
+    """
+    Run by admins to get the progress of a measurement data re-encoding task
+    \n :param task_id: task_id returned when the task was scheduled
+    \n :return: status, cursor and number of sensor summaries checked, rewritten and that could not be parsed
+    """
+    if auth_handler.checkRoleAdmin(payload) == False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
+
+    task = get_measurement_reencoding_task(task_id)
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return measurement_reencoding_status(task)
+
+
 @backgroundTasksRouter.get("/cron/ingest-active-sensors/{id_type}")
-async def schedule_data_ingest_task_of_active_sensors_by_sensorTypeId(background_tasks: BackgroundTasks, id_type: int, cron_job_token=Header(...)):
+async def schedule_data_ingest_task_of_active_sensors_by_sensorTypeId(id_type: int, cron_job_token=Header(...)):
     """
-    This function is called by AWS Lambda to run the scheduled ingest task for plume sensors
+    This function is called by AWS Lambda to add the scheduled ingest task of the active sensors of a sensor type to the ingestion queue
     :param cron_job_token: cron job token
     """
     if cron_job_token != env["CRON_JOB_TOKEN"]:
@@ -241,10 +349,44 @@ async def schedule_data_ingest_task_of_active_sensors_by_sensorTypeId(background
 
     start, end = get_dates(-1)
     log_timestamp = dt.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
-    background_tasks.add_task(upsert_sensor_summary_by_id_list, start, end, [id_type], "sensor_type_id", log_timestamp)
+    # INGESTION_MERGE_MODE=append only appends the readings that are newer than the stored sensor summaries
+    incremental = env.get("INGESTION_MERGE_MODE", "replace").lower() == "append"
+    await run_in_threadpool(schedule_ingestion_jobs, log_timestamp, start, end, [id_type], "sensor_type_id", incremental)
     return {"task_id": log_timestamp, "task_message": "task sent to backend"}
 
 
+@backgroundTasksRouter.get("/ingestion-jobs")
+def get_ingestion_tasks(days: int = Query(default=1, ge=1, description="number of days to look back"), payload=Depends(auth_handler.auth_wrapper)):
+    """
+    Run by admins to get the progress of the data ingestion tasks scheduled in the last days
+    \n :param days: number of days to look back
+    \n :return: number of queued, running, done and failed units of each task
+    """
+    if auth_handler.checkRoleAdmin(payload) == False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
+
+    tasks = {}
+    for job in get_recent_ingestion_jobs(dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=days)):
+        tasks.setdefault(job.task_id, []).append(job)
+    return [{key: value for key, value in ingestion_task_status(task_id, jobs).items() if key != "failed_jobs"} for task_id, jobs in tasks.items()]
+
+
+@backgroundTasksRouter.get("/ingestion-jobs/{task_id}")
+def get_ingestion_task(task_id: str, payload=Depends(auth_handler.auth_wrapper)):
+    """
+    Run by admins to get the progress of a data ingestion task
+    \n :param task_id: task_id returned when the task was scheduled
+    \n :return: number of queued, running, done and failed units of the task and the units that failed
+    """
+    if auth_handler.checkRoleAdmin(payload) == False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
+
+    jobs = get_ingestion_task_jobs(task_id)
+    if not jobs:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return ingestion_task_status(task_id, jobs)
+
+
 @backgroundTasksRouter.get("/cron/clear-data-ingestion-queue")
 async def clear_data_ingestion_queue(cron_job_token=Header(...)):
     """
@@ -284,37 +426,50 @@ def get_dates(days: int) -> Tuple[str, str]:
     return (dt.datetime.today() + dt.timedelta(days)).strftime("%d-%m-%Y"), dt.datetime.today().strftime("%d-%m-%Y")
 
 
-def update_sensor_last_updated(data_ingestion_logs: list[SchemaDataIngestionLog], log_timestamp: str) -> dict:
+def update_sensor_last_updated(data_ingestion_logs: list[SchemaDataIngestionLog]):
     """
-    Logs sensor data that was successfully written to the database and updates the last_updated field of the sensor
+    Updates the last_updated field of the sensors whose sensor summaries were successfully written to the database, a failure is recorded in the message of the data ingestion log
     """
-    log_data_dict = {}
     for data_ingestion_log in data_ingestion_logs:
-        id_ = data_ingestion_log.sensor_id
-        timestamp = data_ingestion_log.timestamp
-        sensor_serial_number = data_ingestion_log.sensor_serial_number
-        success_status = data_ingestion_log.success_status
-        message = data_ingestion_log.message
-
-        if success_status:
+        if data_ingestion_log.success_status:
             try:
-                set_last_updated(id_, timestamp)
+                set_last_updated(data_ingestion_log.sensor_id, data_ingestion_log.timestamp)
             except Exception as e:
-                message = "sensor last updated failed: " + str(e)
+                data_ingestion_log.message = "sensor last updated failed: " + str(e)
 
-        # if message is None then don't include it in the log
 
-        if timestamp in log_data_dict:
-            log_data_dict[timestamp][id_] = {"serial_number": sensor_serial_number, "status": success_status, "message": message}
-        else:
-            log_data_dict[timestamp] = {id_: {"serial_number": sensor_serial_number, "status": success_status, "message": message}}
+def update_rollups(data_ingestion_logs: list[SchemaDataIngestionLog]):
+    """
+    Refreshes the hourly, daily and monthly rollups of the sensor summaries that were successfully written to the database
+    """
+    written_summaries = {}
+    for data_ingestion_log in data_ingestion_logs:
+        if data_ingestion_log.success_status:
+            written_summaries.setdefault(data_ingestion_log.sensor_id, []).append(data_ingestion_log.timestamp)
+    refresh_rollups(written_summaries)
+
 
-        if message is None:
-            del log_data_dict[timestamp][id_]["message"]
+def rebuild_rollups(timestampStart: int, timestampEnd: int, sensor_ids: list[int]):
+    """
+    Rebuilds the rollups of every sensor summary between two timestamps
+    """
+    filter_expressions = [SensorSummaries.timestamp >= timestampStart, SensorSummaries.timestamp <= timestampEnd]
+    if sensor_ids:
+        filter_expressions.append(SensorSummaries.sensor_id.in_(sensor_ids))
 
-    add_log(
-        log_timestamp,
-        SchemaLog(log_data=json.dumps(log_data_dict)),
-    )
+    summaries = {}
+    for row in CRUD().db_get_fields_using_filter_expression(filter_expressions, [SensorSummaries.sensor_id, SensorSummaries.timestamp]):
+        summaries.setdefault(row.sensor_id, []).append(row.timestamp)
+    refresh_rollups(summaries)
 
-    return log_data_dict
+
+def refresh_rollups(summaries: dict[int, list[int]]):
+    """
+    Refreshes the rollups of each sensor given the timestamps of its sensor summaries.
+    A failure is printed rather than raised so that it does not fail the data ingestion task
+    """
+    for sensor_id, timestamps in summaries.items():
+        try:
+            refresh_sensor_rollups(sensor_id, timestamps)
+        except Exception as e:
+            print(f"could not refresh the rollups of sensor {sensor_id}: {e}")
@@ -1,52 +1,96 @@
-import json
-import sys
-from typing import Iterator
+from itertools import chain
+from typing import Iterable, Iterator
 
+import orjson
 # dependencies for hidden routes
 from core.models import SensorPlatforms as ModelSensorPlatform
 from core.models import SensorPlatformTypes as ModelSensorPlatformTypePlatform
 from core.models import SensorSummaries as ModelSensorPlatformSummary
+from core.models import SensorSummaryRollups as ModelSensorSummaryRollup
+from core.schema import GeoJsonExport
 from core.schema import SensorSummary as SchemaSensorSummary
 # dependencies for exposed routes
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from routers.services.arrow_export import (ARROW_STREAM_MEDIA_TYPE,
+                                           PARQUET_MEDIA_TYPE,
+                                           export_measurement_projection,
+                                           generate_sensor_summary_arrow)
 from routers.services.crud.crud import CRUD
 from routers.services.enums import (SensorMeasurementsColumns, averagingMethod,
-                                    sensorSummaryColumns, spatialQueryType)
+                                    rollupResolution, sensorSummaryColumns,
+                                    spatialQueryType)
 from routers.services.formatting import (convertDateRangeStringToTimestamp,
                                          format_sensor_summary_data,
-                                         format_sensor_summary_to_csv,
+                                         format_sensor_summary_row,
+                                         generate_sensor_summary_csv,
+                                         measurement_column_union,
                                          sensorSummariesToGeoJson)
-from routers.services.query_building import searchQueryFilters
-from routers.services.validation import validate_json_file_size
-
-sensorSummariesRouter = APIRouter()
-
-
-def generate_json_stream(json_objects: list[dict]) -> Iterator[str]:
+from routers.services.incremental_merge import (append_update_values,
+                                                sensor_summary_delta)
+from routers.services.query_building import (encodePageCursor,
+                                             keysetPaginationFilter,
+                                             keysetPaginationOrder,
+                                             measurementColumnsProjection,
+                                             measurementDataIsLegacy,
+                                             measurementKeysProjection,
+                                             measurementLastTimestamp,
+                                             searchQueryFilters)
+from routers.services.response_cache import conditional_response
+from routers.services.rollups import (MAX_DAYS, format_rollup_row, get_rollups,
+                                      rollup_filters, rollups_to_geojson)
+from routers.services.validation import (estimate_query_result_size,
+                                         validate_json_file_size)
+from sensor_api_wrappers.data_transfer_object.measurement_codec import \
+    HEADER_PREFIX_BYTES
+from sensor_api_wrappers.data_transfer_object.measurement_json import \
+    measurement_json_columns
+from sqlalchemy import func, tuple_
+
+sensorSummariesRouter = APIRouter(default_response_class=ORJSONResponse)
+
+# largest page that can be requested with keyset pagination
+MAX_PAGE_SIZE = 1000
+
+# the sensor and sensor type columns joined to the exports, a change to them changes the ETag of the responses
+SENSOR_METADATA_COLUMNS = [
+    [ModelSensorPlatform.id, ModelSensorPlatform.type_id],
+    [ModelSensorPlatformTypePlatform.id, ModelSensorPlatformTypePlatform.name, ModelSensorPlatformTypePlatform.sensor_metadata],
+]
+
+
+def generate_json_stream(json_objects: Iterable[dict]) -> Iterator[bytes]:
     """
-    Generates a streaming response for a list of JSON objects.
-    Each JSON object is yielded as a separate line in the response.
+    Generates a streaming response for an iterable of JSON objects.
+    Each JSON object is yielded as a separate line in the response (NDJSON).
 
     Args:
-        json_objects (list): A list of JSON objects to stream.
+        json_objects (Iterable[dict]): A list or generator of JSON objects to stream.
     Yields:
-        str: A JSON object as a string, followed by a newline character.
+        bytes: A JSON object encoded with orjson, followed by a newline character.
     """
     for obj in json_objects:
-        yield json.dumps(obj) + "\n"  # Add newline for line-by-line streaming
+        yield orjson.dumps(obj, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)  # newline for line-by-line streaming
+
+
+def json_default(obj: any) -> any:
+    """converts values orjson can not serialise (e.g numpy scalars that are not arrays) to python types
+    :param obj: value to convert
+    :return: json serialisable value"""
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
 
 
 #################################################################################################################################
 #                                                  Read                                                                         #
 #################################################################################################################################
 # TODO add param to read to allow aggregation of sensors into a single measurement_data json
-# TODO use ORJSONResponse for better performance
-# TODO check filesize of the json response and if it is too large then return a streaming response instead
 
 
 @sensorSummariesRouter.get("/as-json")
 def get_sensorSummaries(
+    request: Request,
     start: str = Query(..., description="format dd-mm-yyyy"),
     end: str = Query(..., description="format dd-mm-yyyy"),
     columns: str = Depends(
@@ -71,10 +115,16 @@ def get_sensorSummaries(
     sensor_ids: str = Depends(
         lambda sensor_ids=Query(default=[], description="Comma-separated list of integer sensor ids to filter by"): ([int(id) for id in sensor_ids.split(",")] if sensor_ids else [])
     ),
+    stream: bool = Query(False, description="if true then the rows are read with a server-side cursor and streamed as newline delimited json (NDJSON)"),
+    page_size: int = Query(None, ge=1, le=MAX_PAGE_SIZE, description="if set then the rows are returned in pages of this size, ordered by timestamp and sensor id"),
+    cursor: str = Query(None, description="the next cursor of the previous page, leave empty for the first page"),
 ):
     """
     read sensor summaries given a date range (e.g /read/28-09-2022/30-09-2022) and any optional filters then return a json of sensor summaries
     leave the measurement_columns empty to return the measurement_data as a json string with all the columns
+    set stream to true for long date ranges, rows are then read in bounded batches and each row is sent as soon as it is formatted
+    or set page_size to read the date range in pages, the response is then {"data": [...], "next": cursor} and next is passed as the cursor of the following request (it is null on the last page).
+    pages are not limited to a 30 day range because each page is read with a range scan of the primary key index
 
     Args:
         start (str): Start date of the query in the format dd-mm-yyyy.
@@ -86,20 +136,33 @@ def get_sensorSummaries(
         spatial_query_type (spatialQueryType): type of spatial query to perform (e.g intersects, contains, within ) - see spatialQueryBuilder for more info
         geom (str): geometry to use in the spatial query (e.g POINT(0 0), POLYGON((0 0, 0 1, 1 1, 1 0, 0 0)) ) - see spatialQueryBuilder for more info
         sensor_ids str: list of sensor integer ids to filter by if none then all sensors that match the above filters will be returned
+        stream (bool): if true then the sensor summaries are streamed as NDJSON using a server-side cursor
+        page_size (int): number of sensor summaries per page, if set then the response is paginated
+        cursor (str): continuation token returned as next by the previous page
 
     Returns:
-        list[dict]: sensor summaries as a list of dictionaries
+        list[dict]: sensor summaries as a list of dictionaries (or a NDJSON StreamingResponse if stream is true)
+        dict: a page of sensor summaries and the cursor of the next page if page_size is set
+        the response has an ETag and Last-Modified header, a request with a matching If-None-Match or If-Modified-Since header gets a 304
 
     Raises:
         HTTPException: if the query fails or if the file size exceeds the limit set in the env
         HTTPException: if the geometry is not a valid WKT string
-        HTTPException: if the date range exceeds the maximum allowed days (30 days by default)
+        HTTPException: if the date range exceeds the maximum allowed days (30 days by default, no limit when paginated)
+        HTTPException: if the cursor is invalid or page_size is combined with stream
     """
+    paginate = page_size is not None
+    if paginate and stream:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="page_size can not be combined with stream")
+    if cursor is not None and not paginate:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor requires page_size")
 
-    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, max_days=30)
+    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, max_days=None if paginate else 30)
 
     # if measurement columns are provided then we need to deserialize the measurement data.
     deserialize = True if len(measurement_columns) > 0 else deserialize
+    # only project the measurement data in postgres when the client asked for specific columns
+    project_measurement_columns = len(measurement_columns) > 0
 
     # add Timestamp by default if not already included
     if SensorMeasurementsColumns.TIMESTAMP.value not in measurement_columns:
@@ -110,7 +173,14 @@ def get_sensorSummaries(
         model = ModelSensorPlatformSummary
         join_models = None
         for col in columns:
-            fields.append(getattr(ModelSensorPlatformSummary, col))
+            if col == sensorSummaryColumns.measurement_data.value and project_measurement_columns:
+                fields.append(measurementColumnsProjection(measurement_columns))
+            else:
+                fields.append(getattr(ModelSensorPlatformSummary, col))
+
+        # rows stored in the columnar format keep their measurements in measurement_blob
+        if sensorSummaryColumns.measurement_data.value in columns:
+            fields.append(ModelSensorPlatformSummary.measurement_blob)
 
         if include_sensor_metadata:
             fields.append(getattr(ModelSensorPlatformTypePlatform, "sensor_metadata").label("sensor_metadata"))
@@ -122,17 +192,31 @@ def get_sensorSummaries(
         join_models = [ModelSensorPlatform, ModelSensorPlatformTypePlatform]
 
         filter_expressions = searchQueryFilters([ModelSensorPlatformSummary.timestamp >= timestampStart, ModelSensorPlatformSummary.timestamp <= timestampEnd], spatial_query_type, geom, sensor_ids)
-        query_result = CRUD().db_get_fields_using_filter_expression(filter_expressions, fields, model, join_models)
 
-        if validate_json_file_size(sys.getsizeof(query_result)):
-            # if the query result is too large then return a streaming response
-            return StreamingResponse(
-                generate_json_stream(format_sensor_summary_data(query_result, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata)),
-                media_type="application/json",
-            )
-        else:
-            return format_sensor_summary_data(query_result, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata)
-            # return ORJSONResponse(format_sensor_summary_data(query_result, deserialize))
+        def render():
+            if paginate:
+                return ORJSONResponse(get_sensorSummaries_page(filter_expressions, fields, join_models, page_size, cursor, deserialize, measurement_columns, include_sensor_metadata))
+
+            if stream:
+                rows = CRUD().db_stream_fields_using_filter_expression(filter_expressions, fields, model, join_models)
+                return StreamingResponse(
+                    generate_json_stream(format_sensor_summary_row(row, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata) for row in rows),
+                    media_type="application/x-ndjson",
+                )
+
+            query_result = CRUD().db_get_fields_using_filter_expression(filter_expressions, fields, model, join_models)
+
+            if validate_json_file_size(estimate_query_result_size(query_result)):
+                # if the query result is too large then return a streaming response
+                return StreamingResponse(
+                    generate_json_stream(format_sensor_summary_data(query_result, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata)),
+                    media_type="application/json",
+                )
+            else:
+                # returning the response directly skips fastapi's jsonable_encoder pass over every record
+                return ORJSONResponse(format_sensor_summary_data(query_result, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata))
+
+        return conditional_response(request, ModelSensorPlatformSummary, filter_expressions, render, cache=not stream, metadata=SENSOR_METADATA_COLUMNS)
 
     except HTTPException as e:
         raise e
@@ -140,10 +224,43 @@ def get_sensorSummaries(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+def get_sensorSummaries_page(
+    filter_expressions: list, fields: list, join_models: list, page_size: int, cursor: str, deserialize: bool, measurement_columns: list[str], include_sensor_metadata: bool
+) -> dict:
+    """reads a page of sensor summaries after the cursor (keyset pagination on the (timestamp, sensor_id) primary key)
+    :param filter_expressions: filter expressions of the query
+    :param fields: fields to return
+    :param join_models: models to join
+    :param page_size: number of rows per page
+    :param cursor: cursor of the previous page (None for the first page)
+    :param deserialize: if true then the measurement_data field is deserialized
+    :param measurement_columns: measurement columns to return
+    :param include_sensor_metadata: if true then the sensor metadata is formatted
+    :return: dictionary of the page data and the cursor of the next page (None on the last page)"""
+    if cursor is not None:
+        filter_expressions = filter_expressions + [keysetPaginationFilter(cursor)]
+    # the key of the last row is read separately so it does not depend on the requested columns
+    fields = fields + [ModelSensorPlatformSummary.timestamp.label("page_timestamp"), ModelSensorPlatformSummary.sensor_id.label("page_sensor_id")]
+
+    query_result = CRUD().db_get_fields_using_filter_expression(
+        filter_expressions, fields, ModelSensorPlatformSummary, join_models, limit=page_size, order_by=keysetPaginationOrder()
+    )
+
+    data = format_sensor_summary_data(query_result, deserialize, columns=measurement_columns, format_sensor_metadata=include_sensor_metadata)
+    for row in data:
+        del row["page_timestamp"], row["page_sensor_id"]
+
+    next_cursor = None
+    if len(query_result) == page_size:
+        next_cursor = encodePageCursor(query_result[-1].page_timestamp, query_result[-1].page_sensor_id)
+    return {"data": data, "next": next_cursor}
+
+
 # TODO include stationary bool and geom in the query. for stationary sensors use its geom for the bounding boxes in the geojson.
 # for non stationary sensors calculate the bounding box from the sensor readings
 @sensorSummariesRouter.get("/as-geojson")
 def get_sensorSummaries_geojson_export(
+    request: Request,
     start: str = Query(..., description=" format: dd-mm-yyyy"),
     end: str = Query(..., description="format: dd-mm-yyyy"),
     averaging_frequency: str = Query(..., description="examples: 'Min','H', '8H' , 'D', 'M', 'Y'"),
@@ -166,11 +283,29 @@ def get_sensorSummaries_geojson_export(
         sensor_ids (list[int]): list of sensor ids to filter by, if none then all sensors that match the above filters will be returned
     Returns:
         dict: geojson of sensor summaries
+        the response has an ETag and Last-Modified header, a request with a matching If-None-Match or If-Modified-Since header gets a 304
     Raises:
         HTTPException: if the query fails or if the file size exceeds the limit set in the env
         HTTPException: if the geometry is not a valid WKT string
-        HTTPException: if the date range exceeds the maximum allowed days (30 days for minutely data, 90 days for hourly data, 365 days for daily data, 1825 days for monthly data, no limit for yearly data)
+        HTTPException: if the date range exceeds the maximum allowed days (30 days for minutely data, 366 days for hourly data, 1830 days for daily data, no limit for monthly or yearly data)
     """
+    # hourly, daily and monthly averages are read from the pre-aggregated rollups rather than the raw measurement data
+    if averaging_frequency in MAX_DAYS:
+        (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, MAX_DAYS[averaging_frequency])
+        try:
+            filter_expressions = searchQueryFilters([], spatial_query_type, geom, sensor_ids, model=ModelSensorSummaryRollup)
+            return conditional_response(
+                request,
+                ModelSensorSummaryRollup,
+                rollup_filters(averaging_frequency, timestampStart, timestampEnd, filter_expressions),
+                lambda: geojson_response(rollups_to_geojson(get_rollups(averaging_frequency, timestampStart, timestampEnd, filter_expressions), averaging_methods, averaging_frequency)),
+                metadata=SENSOR_METADATA_COLUMNS,
+            )
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
     max_days = 30
     if averaging_frequency == "Min":
         max_days = 30  # 30 days for minutely data
@@ -187,29 +322,88 @@ def get_sensorSummaries_geojson_export(
 
     # append all the columns we want to return from the sensor summary table and the sensor type name from the sensor type table
     fields = []
-    columns = ["geom", "stationary", "measurement_data"]
+    columns = ["geom", "stationary", "measurement_data", "measurement_blob"]
     for col in columns:
         fields.append(getattr(ModelSensorPlatformSummary, col))
 
     fields.append(getattr(ModelSensorPlatformTypePlatform, "name").label("type_name"))
     fields.append(getattr(ModelSensorPlatform, "id").label("sensor_id"))
 
-    try:
-        filter_expressions = searchQueryFilters([ModelSensorPlatformSummary.timestamp >= timestampStart, ModelSensorPlatformSummary.timestamp <= timestampEnd], spatial_query_type, geom, sensor_ids)
-        join_models = [ModelSensorPlatform, ModelSensorPlatformTypePlatform]
+    def render():
         query_result = CRUD().db_get_fields_using_filter_expression(filter_expressions, fields, ModelSensorPlatformSummary, join_models)
         results = format_sensor_summary_data(query_result, deserialize=False)
+        return geojson_response(sensorSummariesToGeoJson(results, averaging_methods, averaging_frequency))
 
+    try:
+        filter_expressions = searchQueryFilters([ModelSensorPlatformSummary.timestamp >= timestampStart, ModelSensorPlatformSummary.timestamp <= timestampEnd], spatial_query_type, geom, sensor_ids)
+        join_models = [ModelSensorPlatform, ModelSensorPlatformTypePlatform]
+        return conditional_response(request, ModelSensorPlatformSummary, filter_expressions, render, metadata=SENSOR_METADATA_COLUMNS)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-    return sensorSummariesToGeoJson(results, averaging_methods, averaging_frequency)
+
+def geojson_response(geojsons: list[GeoJsonExport]) -> ORJSONResponse:
+    """renders the geojson exports so the body can be cached
+    :param geojsons: list of geojsons
+    :return: json response"""
+    return ORJSONResponse([geojson.dict() for geojson in geojsons])
+
+
+@sensorSummariesRouter.get("/aggregated")
+def get_sensorSummaries_aggregated(
+    start: str = Query(..., description="format: dd-mm-yyyy"),
+    end: str = Query(..., description="format: dd-mm-yyyy"),
+    resolution: rollupResolution = Query(..., description="H (hourly), D (daily) or M (monthly)"),
+    averaging_methods: list[averagingMethod] = Query([], description="statistics to return, leave empty to return all of them"),
+    measurement_columns: str = Depends(
+        lambda measurement_columns=Query(
+            default="",
+            description=f"""Comma-separated list of sensor measurements columns to return, leave empty to return all of them.
+            \n Available columns: {', '.join([col.value for col in SensorMeasurementsColumns])}""",
+            example="PM1,PM2.5,PM10",
+        ): ([col for col in measurement_columns.split(",")] if measurement_columns else [])
+    ),
+    spatial_query_type: spatialQueryType = Query(None),
+    geom: str = Query(None, description="format: WKT string. **Required if spatial_query_type is provided**"),
+    sensor_ids: str = Depends(
+        lambda sensor_ids=Query(default=[], description="Comma-separated list of integer sensor ids to filter by"): ([int(id) for id in sensor_ids.split(",")] if sensor_ids else [])
+    ),
+):
+    """read the hourly, daily or monthly rollups of the sensor summaries given a date range and any optional filters
+
+    Args:
+        start (str): start date of the query in the format dd-mm-yyyy
+        end (str): end date of the query in the format dd-mm-yyyy
+        resolution (rollupResolution): resolution of the rollups H, D or M
+        averaging_methods (list[averagingMethod]): statistics to return (mean, min, max, median, count), all by default
+        measurement_columns str: list of sensor measurements columns to return, all by default
+        spatial_query_type (spatialQueryType): type of spatial query to perform (e.g intersects, contains, within ) - see spatialQueryBuilder for more info
+        geom (str): geometry to use in the spatial query (e.g POINT(0 0), POLYGON((0 0, 0 1, 1 1, 1 0, 0 0)) ) - see spatialQueryBuilder for more info
+        sensor_ids (list[int]): list of sensor ids to filter by, if none then all sensors that match the above filters will be returned
+    Returns:
+        list[dict]: one row per sensor and period with the measurement statistics and location extent
+    Raises:
+        HTTPException: if the query fails
+        HTTPException: if the geometry is not a valid WKT string
+        HTTPException: if the date range exceeds the maximum allowed days (366 days for hourly data, 1830 days for daily data, no limit for monthly data)
+    """
+    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, MAX_DAYS[resolution.value])
+
+    try:
+        filter_expressions = searchQueryFilters([], spatial_query_type, geom, sensor_ids, model=ModelSensorSummaryRollup)
+        query_result = get_rollups(resolution.value, timestampStart, timestampEnd, filter_expressions)
+        return ORJSONResponse([format_rollup_row(row, averaging_methods, measurement_columns) for row in query_result])
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
 @sensorSummariesRouter.get("/as-csv")
 def get_sensorSummaries_csv_export(
+    request: Request,
     start: str = Query(..., description="format: dd-mm-yyyy"),
     end: str = Query(..., description="format: dd-mm-yyyy"),
     measurement_columns: str = Depends(
@@ -223,60 +417,219 @@ def get_sensorSummaries_csv_export(
     all_columns: bool = Query(False, description="if true then all columns will be returned from the measurement_data field"),
     sensor_id: int = Query(default=0, description="a sensor id to filter by"),
 ):
-    """read sensor summaries given a date range and one sensor id then return as csv
+    """read sensor summaries given a date range and an optional sensor id then stream them as csv
+    each reading is written as a row with the sensor_id and Timestamp columns followed by the measurement columns
     Args:
         start (str): start date of the query in the format dd-mm-yyyy
         end (str): end date of the query in the format dd-mm-yyyy
         measurement_columns str: list of sensor measurements columns to return from the sensor summaries measurement_data field
-        all_columns (bool): if true then all columns will be returned from the measurement_data field
+        all_columns (bool): if true then all columns will be returned from the measurement_data field (the union of the columns of every summary)
         sensor_id (int): sensor id to filter by (default is 0 which means no filter)
     Returns:
         StreamingResponse: a streaming response with the csv data
+        the response has an ETag and Last-Modified header, a request with a matching If-None-Match or If-Modified-Since header gets a 304
     Raises:
-        HTTPException: if the query fails or if the file size exceeds the limit set in the env
-        HTTPException: if the date range exceeds the maximum allowed days (30 days by default)
+        HTTPException: if the query fails or no sensor summaries match the filters
+        HTTPException: if the date range exceeds the maximum allowed days (365 days)
     """
 
-    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, max_days=30)
+    # rows are streamed in batches so the export is not limited by memory
+    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, max_days=365)
 
-    if all_columns:
-        measurement_columns = [col for col in SensorMeasurementsColumns]
-    elif not measurement_columns:
+    if not all_columns and not measurement_columns:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Please provide at least one measurement column or set all_columns to true.",
         )
 
     try:
-        fields = []
-        join_models = None
-
-        fields.append(getattr(ModelSensorPlatformSummary, "measurement_data").label("measurement_data"))
-
         filter_expressions = searchQueryFilters(
             filter_expressions=[ModelSensorPlatformSummary.timestamp >= timestampStart, ModelSensorPlatformSummary.timestamp <= timestampEnd],
             spatial_query_type=None,
             geom=None,
-            sensor_ids=[sensor_id],
+            sensor_ids=[sensor_id] if sensor_id else [],
         )
-        query_result = CRUD().db_get_fields_using_filter_expression(filter_expressions, fields, ModelSensorPlatformSummary, join_models)
-        if not query_result:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No sensor summaries found for the given parameters.",
+
+        def render():
+            columns = measurement_columns
+            fields = [ModelSensorPlatformSummary.sensor_id]
+            if all_columns:
+                columns = get_measurement_column_union(filter_expressions)
+                fields.append(getattr(ModelSensorPlatformSummary, "measurement_data").label("measurement_data"))
+            else:
+                fields.append(measurementColumnsProjection(columns))
+            fields.append(getattr(ModelSensorPlatformSummary, "measurement_blob").label("measurement_blob"))
+
+            rows = CRUD().db_stream_fields_using_filter_expression(
+                filter_expressions, fields, ModelSensorPlatformSummary, order_by=[ModelSensorPlatformSummary.sensor_id, ModelSensorPlatformSummary.timestamp]
             )
-        response = StreamingResponse(
-            iter([format_sensor_summary_to_csv(query_result, measurement_columns)]),
-            media_type="text/csv",
+            # read the first row before responding so that an empty export is still a 404
+            first_row = next(rows, None)
+            if first_row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No sensor summaries found for the given parameters.",
+                )
+            response = StreamingResponse(
+                generate_sensor_summary_csv(chain([first_row], rows), columns),
+                media_type="text/csv",
+            )
+            response.headers["Content-Disposition"] = "attachment; filename=sensor_summaries.csv"
+            return response
+
+        # the export is streamed so only the conditional headers apply, the body is not cached
+        return conditional_response(request, ModelSensorPlatformSummary, filter_expressions, render, cache=False)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@sensorSummariesRouter.get("/as-parquet")
+def get_sensorSummaries_parquet_export(
+    request: Request,
+    start: str = Query(..., description="format: dd-mm-yyyy"),
+    end: str = Query(..., description="format: dd-mm-yyyy"),
+    measurement_columns: str = Depends(
+        lambda measurement_columns=Query(
+            default="",
+            description=f"""Comma-separated list of sensor measurements columns to return, leave empty to return all of them.
+            \n Available columns: {', '.join([col.value for col in SensorMeasurementsColumns])}""",
+            example="PM1,PM2_5,PM10",
+        ): ([col for col in measurement_columns.split(",")] if measurement_columns else [])
+    ),
+    spatial_query_type: spatialQueryType = Query(None),
+    geom: str = Query(None, description="format: WKT string. **Required if spatial_query_type is provided**"),
+    sensor_ids: str = Depends(
+        lambda sensor_ids=Query(default=[], description="Comma-separated list of integer sensor ids to filter by"): ([int(id) for id in sensor_ids.split(",")] if sensor_ids else [])
+    ),
+):
+    """read sensor summaries given a date range and any optional filters then stream them as an Apache Parquet file
+    each reading is a row with the sensor_id, type_name and Timestamp columns followed by a float column for each measurement (Latitude and Longitude are always included)
+    Args:
+        start (str): start date of the query in the format dd-mm-yyyy
+        end (str): end date of the query in the format dd-mm-yyyy
+        measurement_columns str: list of sensor measurements columns to return, all columns by default
+        spatial_query_type (spatialQueryType): type of spatial query to perform (e.g intersects, contains, within ) - see spatialQueryBuilder for more info
+        geom (str): geometry to use in the spatial query (e.g POINT(0 0), POLYGON((0 0, 0 1, 1 1, 1 0, 0 0)) ) - see spatialQueryBuilder for more info
+        sensor_ids (list[int]): list of sensor ids to filter by, if none then all sensors that match the above filters will be returned
+    Returns:
+        StreamingResponse: a streaming response with the parquet file, one row group per batch of sensor summaries
+    Raises:
+        HTTPException: if the query fails or no sensor summaries match the filters
+        HTTPException: if the geometry is not a valid WKT string
+        HTTPException: if the date range exceeds the maximum allowed days (365 days)
+    """
+    return stream_sensorSummaries_arrow(request, start, end, measurement_columns, spatial_query_type, geom, sensor_ids, "parquet")
+
+
+@sensorSummariesRouter.get("/as-arrow")
+def get_sensorSummaries_arrow_export(
+    request: Request,
+    start: str = Query(..., description="format: dd-mm-yyyy"),
+    end: str = Query(..., description="format: dd-mm-yyyy"),
+    measurement_columns: str = Depends(
+        lambda measurement_columns=Query(
+            default="",
+            description=f"""Comma-separated list of sensor measurements columns to return, leave empty to return all of them.
+            \n Available columns: {', '.join([col.value for col in SensorMeasurementsColumns])}""",
+            example="PM1,PM2_5,PM10",
+        ): ([col for col in measurement_columns.split(",")] if measurement_columns else [])
+    ),
+    spatial_query_type: spatialQueryType = Query(None),
+    geom: str = Query(None, description="format: WKT string. **Required if spatial_query_type is provided**"),
+    sensor_ids: str = Depends(
+        lambda sensor_ids=Query(default=[], description="Comma-separated list of integer sensor ids to filter by"): ([int(id) for id in sensor_ids.split(",")] if sensor_ids else [])
+    ),
+):
+    """read sensor summaries given a date range and any optional filters then stream them in the Arrow IPC streaming format
+    the columns are the same as the parquet export (see /as-parquet), e.g read with pyarrow.ipc.open_stream
+    Args:
+        start (str): start date of the query in the format dd-mm-yyyy
+        end (str): end date of the query in the format dd-mm-yyyy
+        measurement_columns str: list of sensor measurements columns to return, all columns by default
+        spatial_query_type (spatialQueryType): type of spatial query to perform (e.g intersects, contains, within ) - see spatialQueryBuilder for more info
+        geom (str): geometry to use in the spatial query (e.g POINT(0 0), POLYGON((0 0, 0 1, 1 1, 1 0, 0 0)) ) - see spatialQueryBuilder for more info
+        sensor_ids (list[int]): list of sensor ids to filter by, if none then all sensors that match the above filters will be returned
+    Returns:
+        StreamingResponse: a streaming response with the arrow stream, one record batch per batch of sensor summaries
+    Raises:
+        HTTPException: if the query fails or no sensor summaries match the filters
+        HTTPException: if the geometry is not a valid WKT string
+        HTTPException: if the date range exceeds the maximum allowed days (365 days)
+    """
+    return stream_sensorSummaries_arrow(request, start, end, measurement_columns, spatial_query_type, geom, sensor_ids, "arrow")
+
+
+def stream_sensorSummaries_arrow(
+    request: Request, start: str, end: str, measurement_columns: list[str], spatial_query_type: str, geom: str, sensor_ids: list[int], file_format: str
+) -> StreamingResponse:
+    """streams the sensor summaries that match the filters as parquet or arrow (see get_sensorSummaries_parquet_export)
+    :param file_format: parquet or arrow
+    :return: streaming response"""
+    (timestampStart, timestampEnd) = convertDateRangeStringToTimestamp(start, end, max_days=365)
+
+    try:
+        filter_expressions = searchQueryFilters(
+            [ModelSensorPlatformSummary.timestamp >= timestampStart, ModelSensorPlatformSummary.timestamp <= timestampEnd], spatial_query_type, geom, sensor_ids
         )
-        response.headers["Content-Disposition"] = "attachment; filename=sensor_summaries.csv"
-        return response
+
+        def render():
+            columns = measurement_columns
+            fields = [ModelSensorPlatformSummary.sensor_id, getattr(ModelSensorPlatformTypePlatform, "name").label("type_name")]
+            if not columns:
+                columns = get_measurement_column_union(filter_expressions)
+                fields.append(getattr(ModelSensorPlatformSummary, "measurement_data").label("measurement_data"))
+            else:
+                fields.append(export_measurement_projection(columns))
+            fields.append(getattr(ModelSensorPlatformSummary, "measurement_blob").label("measurement_blob"))
+
+            rows = CRUD().db_stream_fields_using_filter_expression(
+                filter_expressions,
+                fields,
+                ModelSensorPlatformSummary,
+                [ModelSensorPlatform, ModelSensorPlatformTypePlatform],
+                order_by=[ModelSensorPlatformSummary.sensor_id, ModelSensorPlatformSummary.timestamp],
+            )
+            # read the first row before responding so that an empty export is still a 404
+            first_row = next(rows, None)
+            if first_row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No sensor summaries found for the given parameters.",
+                )
+            if file_format == "parquet":
+                response = StreamingResponse(generate_sensor_summary_arrow(chain([first_row], rows), columns, "parquet"), media_type=PARQUET_MEDIA_TYPE)
+                response.headers["Content-Disposition"] = "attachment; filename=sensor_summaries.parquet"
+            else:
+                response = StreamingResponse(generate_sensor_summary_arrow(chain([first_row], rows), columns, "arrow"), media_type=ARROW_STREAM_MEDIA_TYPE)
+                response.headers["Content-Disposition"] = "attachment; filename=sensor_summaries.arrows"
+            return response
+
+        # the export is streamed so only the conditional headers apply, the body is not cached
+        return conditional_response(request, ModelSensorPlatformSummary, filter_expressions, render, cache=False, metadata=SENSOR_METADATA_COLUMNS)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+def get_measurement_column_union(filter_expressions: list[any]) -> list[str]:
+    """finds every measurement column stored in the sensor summaries that match the filters, without reading the measurements
+    :param filter_expressions: filter expressions of the export
+    :return: ordered list of measurement columns"""
+    keys = CRUD().db_get_fields_using_filter_expression(filter_expressions, [measurementKeysProjection("measurement_key")], ModelSensorPlatformSummary)
+    # legacy rows can not be read by postgres (see measurementDataIsLegacy) so their columns are read by the api
+    legacy_rows = CRUD().db_get_fields_using_filter_expression(filter_expressions + [measurementDataIsLegacy()], [ModelSensorPlatformSummary.measurement_data], ModelSensorPlatformSummary)
+    blob_prefixes = CRUD().db_get_fields_using_filter_expression(
+        filter_expressions + [ModelSensorPlatformSummary.measurement_blob.isnot(None)],
+        [func.substring(ModelSensorPlatformSummary.measurement_blob, 1, HEADER_PREFIX_BYTES).label("blob_prefix")],
+        ModelSensorPlatformSummary,
+    )
+    legacy_keys = chain.from_iterable(measurement_json_columns(row.measurement_data) for row in legacy_rows)
+    return measurement_column_union(chain((row.measurement_key for row in keys), legacy_keys), [bytes(row.blob_prefix) for row in blob_prefixes])
+
+
 #################################################################################################################################
 #                                                  Hidden Routes                                                                 #
 #################################################################################################################################
@@ -379,6 +732,7 @@ def add_sensorSummary(sensorSummary: SchemaSensorSummary):
         geom=sensorSummary.geom,
         measurement_count=sensorSummary.measurement_count,
         measurement_data=sensorSummary.measurement_data,
+        measurement_blob=sensorSummary.measurement_blob,
         stationary=sensorSummary.stationary,
     )
 
@@ -405,6 +759,7 @@ def update_sensorSummary(sensorSummary: SchemaSensorSummary):
         "geom": sensorSummary.geom,
         "measurement_count": sensorSummary.measurement_count,
         "measurement_data": sensorSummary.measurement_data,
+        "measurement_blob": sensorSummary.measurement_blob,
         "stationary": sensorSummary.stationary,
     }
 
@@ -434,3 +789,52 @@ def upsert_sensorSummary(sensorSummary: SchemaSensorSummary):
     # sensorSummary.geom = convertWKBtoWKT(sensorSummary.geom)
 
     # return sensorSummary
+
+
+# used for background tasks
+def upsert_sensorSummaries(sensorSummaries: list[SchemaSensorSummary]) -> list:
+    """upserts a batch of sensor summaries with one INSERT ... ON CONFLICT DO UPDATE statement
+    :param sensorSummaries: sensor summaries to upsert, a later summary of the same sensor and day replaces an earlier one
+    :return: sensor_id and timestamp of every sensor summary that was written"""
+    rows = {(sensorSummary.timestamp, sensorSummary.sensor_id): sensorSummary.dict() for sensorSummary in sensorSummaries}
+    return CRUD().db_bulk_upsert(ModelSensorPlatformSummary, list(rows.values()), index_elements=["timestamp", "sensor_id"], update_values={"time_updated": func.now()})
+
+
+# used for background tasks
+def append_sensorSummaries(sensorSummaries: list[SchemaSensorSummary]) -> list:
+    """appends the readings of each sensor summary that are newer than the latest reading of the stored summary of the same sensor and day.
+    Only the new readings are written, summaries without a stored row are inserted and summaries that can not be appended to their stored row replace it
+    :param sensorSummaries: sensor summaries to append, a later summary of the same sensor and day replaces an earlier one
+    :return: sensor_id and timestamp of every sensor summary whose readings are stored (including those without new readings)"""
+    rows = {(sensorSummary.timestamp, int(sensorSummary.sensor_id)): sensorSummary for sensorSummary in sensorSummaries}
+    if not rows:
+        return []
+
+    fields = [ModelSensorPlatformSummary.timestamp, ModelSensorPlatformSummary.sensor_id, ModelSensorPlatformSummary.measurement_blob, measurementLastTimestamp()]
+    filter_expressions = [tuple_(ModelSensorPlatformSummary.timestamp, ModelSensorPlatformSummary.sensor_id).in_(list(rows))]
+    stored = {(row.timestamp, row.sensor_id): row for row in CRUD().db_get_fields_using_filter_expression(filter_expressions, fields)}
+
+    inserts, deltas, unchanged = [], [], []
+    for key, sensorSummary in rows.items():
+        if key not in stored:
+            inserts.append(sensorSummary)
+            continue
+        try:
+            delta = sensor_summary_delta(sensorSummary, stored[key])
+        except ValueError:
+            inserts.append(sensorSummary)
+            continue
+        if delta is None:
+            unchanged.append(stored[key])
+        else:
+            deltas.append(delta)
+
+    written = upsert_sensorSummaries(inserts) if inserts else []
+    if deltas:
+        written += CRUD().db_bulk_upsert(
+            ModelSensorPlatformSummary,
+            [delta.dict() for delta in deltas],
+            index_elements=["timestamp", "sensor_id"],
+            update_values=lambda excluded: append_update_values(ModelSensorPlatformSummary, excluded),
+        )
+    return list(written) + unchanged
@@ -0,0 +1,163 @@
+"""Apache Parquet and Arrow IPC exports of the sensor summaries.
+
+Readings are written as typed columns (sensor_id, type_name, Timestamp and one float column per measurement) so that
+analysts can load an export straight into pandas without parsing json. Each batch of summary rows becomes a parquet
+row group or an arrow record batch that is sent as soon as it is written, so the export is never held in memory.
+"""
+
+import io
+from typing import Iterable, Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from routers.services.enums import SensorMeasurementsColumns
+from routers.services.formatting import deserializeMeasurementColumns
+from routers.services.query_building import measurementColumnsProjection
+from sensor_api_wrappers.data_transfer_object.measurement_codec import decode_measurements, is_columnar
+
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def arrow_schema(columns: list[str]) -> pa.Schema:
+    """builds the schema of an export
+    :param columns: measurement columns (excluding Timestamp)
+    :return: arrow schema"""
+    fields = [
+        pa.field("sensor_id", pa.int32(), nullable=False),
+        pa.field("type_name", pa.dictionary(pa.int32(), pa.string())),
+        pa.field(SensorMeasurementsColumns.TIMESTAMP.value, pa.timestamp("s", tz="UTC"), nullable=False),
+    ]
+    return pa.schema(fields + [pa.field(col, pa.float64()) for col in columns])
+
+
+def export_columns(columns: list[str]) -> list[str]:
+    """the measurement columns of an export, the location columns are always included so readings can be mapped
+    :param columns: requested measurement columns
+    :return: measurement columns (excluding Timestamp)"""
+    location_columns = [SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value]
+    return [col for col in dict.fromkeys(columns + location_columns) if col != SensorMeasurementsColumns.TIMESTAMP.value]
+
+
+def export_measurement_projection(columns: list[str]) -> any:
+    """builds the measurement_data projection of an export, it keeps the location columns that are added to every export
+    so that json rows have the same columns as columnar rows
+    :param columns: requested measurement columns
+    :return: labelled expression to use in place of the measurement_data column (see measurementColumnsProjection)"""
+    return measurementColumnsProjection(export_columns(columns))
+
+
+def float_array(values: any) -> pa.Array:
+    """converts the values of a measurement column to a float array, values that are not numbers become null
+    :param values: list or numpy array of values (NaN is null)
+    :return: float64 arrow array"""
+    try:
+        return pa.array(values, type=pa.float64(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        return pa.array([value if isinstance(value, (int, float)) and not isinstance(value, bool) else None for value in values], type=pa.float64(), from_pandas=True)
+
+
+def summary_columns(row: any, columns: list[str]) -> tuple[int, dict]:
+    """reads the readings of a sensor summary row as columns
+    :param row: sensor summary row with measurement_data and measurement_blob fields
+    :param columns: measurement columns (excluding Timestamp)
+    :return: tuple of the number of readings and a dictionary of the Timestamp and measurement columns"""
+    timestamp_column = SensorMeasurementsColumns.TIMESTAMP.value
+    measurement_blob = row.get("measurement_blob")
+
+    if measurement_blob is not None and is_columnar(measurement_blob):
+        arrays = decode_measurements(measurement_blob)
+        length = len(arrays[timestamp_column])
+        return length, {col: arrays[col] if col in arrays else [None] * length for col in [timestamp_column] + columns}
+
+    values = deserializeMeasurementColumns(row["measurement_data"], [timestamp_column] + columns)
+    length = len(values[timestamp_column])
+    return length, {col: values[col] if col in values else [None] * length for col in [timestamp_column] + columns}
+
+
+def summaries_to_record_batch(rows: list, columns: list[str], schema: pa.Schema) -> pa.RecordBatch:
+    """converts sensor summary rows to a record batch with one row per reading
+    :param rows: sensor summary rows with sensor_id, type_name, measurement_data and measurement_blob fields
+    :param columns: measurement columns (excluding Timestamp)
+    :param schema: schema of the export (see arrow_schema)
+    :return: record batch"""
+    timestamp_column = SensorMeasurementsColumns.TIMESTAMP.value
+    sensor_ids, type_names, chunks = [], [], {col: [] for col in [timestamp_column] + columns}
+
+    for row in rows:
+        row = row._mapping
+        length, row_columns = summary_columns(row, columns)
+        sensor_ids.append(pa.repeat(row["sensor_id"], length))
+        type_names.append(pa.repeat(row.get("type_name"), length))
+        chunks[timestamp_column].append(pa.array(row_columns[timestamp_column], type=pa.int64()))
+        for col in columns:
+            chunks[col].append(float_array(row_columns[col]))
+
+    arrays = [
+        pa.concat_arrays(sensor_ids).cast(pa.int32()),
+        pa.concat_arrays([array.cast(pa.string()) for array in type_names]).dictionary_encode().cast(schema.field("type_name").type),
+        pa.concat_arrays(chunks[timestamp_column]).cast(pa.timestamp("s", tz="UTC")),
+    ] + [pa.concat_arrays(chunks[col]) for col in columns]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def generate_sensor_summary_arrow(rows: Iterable[any], columns: list[str], file_format: str = "parquet", batch_size: int = 100) -> Iterator[bytes]:
+    """Streams sensor summaries as parquet or as an arrow IPC stream, one row group (or record batch) for every batch of summary rows
+
+    Args:
+        rows (Iterable[any]): sensor summary rows with sensor_id, type_name, measurement_data and measurement_blob fields
+        columns (list[str]): measurement columns to write after the sensor_id, type_name and Timestamp columns
+        file_format (str): parquet or arrow
+        batch_size (int): number of sensor summary rows written to each row group
+    Yields:
+        bytes: the next part of the file
+    """
+    columns = export_columns(columns)
+    schema = arrow_schema(columns)
+
+    sink = ChunkedSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd") if file_format == "parquet" else pa.ipc.new_stream(sink, schema)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            writer.write_batch(summaries_to_record_batch(batch, columns, schema))
+            batch = []
+            yield sink.flush_chunks()
+
+    if batch:
+        writer.write_batch(summaries_to_record_batch(batch, columns, schema))
+    writer.close()
+    yield sink.flush_chunks()
+
+
+class ChunkedSink(io.RawIOBase):
+    """write only file that hands over what has been written so far.
+    The position keeps counting across flushes because the parquet footer stores the offset of every row group."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        # the writers close the sink, the written chunks are still flushed afterwards
+        pass
+
+    def flush_chunks(self) -> bytes:
+        """:return: the bytes written since the last flush"""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
@@ -1,6 +1,9 @@
+from typing import Callable, Union
+
 from fastapi import HTTPException, status
 from psycopg2.errors import UniqueViolation
 from routers.services.crud.abstractCRUD import abstractbaseCRUD
+from sqlalchemy.dialects.postgresql import insert
 
 # error handling
 from sqlalchemy.exc import IntegrityError
@@ -29,3 +32,44 @@ class Create(abstractbaseCRUD):
             self.db.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
         return data
+
+    def db_replace(self, model: any, filter_expressions: list, rows: list[dict]):
+        """Replace the rows matching the filter expressions with new rows in a single transaction
+        :param model: database model
+        :param filter_expressions: filter expressions of the rows to replace
+        :param rows: data of the new rows
+        :return: number of rows added"""
+        try:
+            self.db.query(model).filter(*filter_expressions).delete(synchronize_session=False)
+            self.db.add_all([model(**data) for data in rows])
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        return len(rows)
+
+    def db_bulk_upsert(self, model: any, rows: list[dict], index_elements: list[str], update_values: Union[dict, Callable[[any], dict]] = None) -> list:
+        """Insert rows with a single INSERT ... ON CONFLICT DO UPDATE statement and one commit
+        :param model: database model
+        :param rows: data of the rows (a row can only appear once for each key)
+        :param index_elements: columns of the unique constraint, e.g the primary key
+        :param update_values: additional values to set when a row is updated (e.g {"time_updated": func.now()}),
+            or a function of the excluded (proposed) row that returns them
+        :return: the index_elements of every row that was inserted or updated"""
+        if not rows:
+            return []
+        try:
+            statement = insert(model).values(rows)
+            update_columns = [column for column in rows[0] if column not in index_elements]
+            if callable(update_values):
+                update_values = update_values(statement.excluded)
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={**{column: statement.excluded[column] for column in update_columns}, **(update_values or {})},
+            ).returning(*[getattr(model, column) for column in index_elements])
+            result = self.db.execute(statement).all()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        return result
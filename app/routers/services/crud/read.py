@@ -1,4 +1,7 @@
+from typing import Iterator
+
 from core.models import Users as ModelUser
+from db.database import SessionLocal
 from fastapi import HTTPException, status
 from routers.services.crud.abstractCRUD import abstractbaseCRUD
 from routers.services.formatting import convertWKBtoWKT
@@ -70,7 +73,15 @@ class Read(abstractbaseCRUD):
         return result
 
     def db_get_fields_using_filter_expression(
-        self, filter_expressions: list = None, fields: list = None, model: any = None, join_models: list = None, first: bool = False, page: int = None, limit: int = None
+        self,
+        filter_expressions: list = None,
+        fields: list = None,
+        model: any = None,
+        join_models: list = None,
+        first: bool = False,
+        page: int = None,
+        limit: int = None,
+        order_by: list = None,
     ):
         """Get rows from the database with joins and custom fields
         :param filter_expressions: filter expressions
@@ -79,7 +90,8 @@ class Read(abstractbaseCRUD):
         :param join_models: models to join
         :param first: return only the first row or all rows
         :param page: page number (optional)
-        :param limit: number of rows per page (optional)
+        :param limit: number of rows per page (optional), without a page the first limit rows are returned (used for keyset pagination)
+        :param order_by: columns to order the rows by (optional)
         :return: rows"""
         try:
             query = self.db.query(*fields)
@@ -87,10 +99,14 @@ class Read(abstractbaseCRUD):
                 query = query.select_from(model).join(*join_models, isouter=True)
             if filter_expressions is not None:
                 query = query.filter(*filter_expressions)
+            if order_by is not None:
+                query = query.order_by(*order_by)
             if first:
                 result = query.first()
             elif page is not None and limit is not None:
                 result = query.offset((page - 1) * limit).limit(limit).all()
+            elif limit is not None:
+                result = query.limit(limit).all()
             else:
                 result = query.all()
         except Exception as e:
@@ -99,6 +115,36 @@ class Read(abstractbaseCRUD):
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not retrieve all rows")
         return result
 
+    def db_stream_fields_using_filter_expression(
+        self, filter_expressions: list = None, fields: list = None, model: any = None, join_models: list = None, order_by: list = None, batch_size: int = 500
+    ) -> Iterator[any]:
+        """Stream rows from the database with joins and custom fields using a server-side cursor.
+        Rows are fetched from the cursor in batches of batch_size so memory use does not depend on the number of rows.
+        A dedicated session is used because the generator outlives the request handler that created it.
+        :param filter_expressions: filter expressions
+        :param fields: fields to return
+        :param model: model to query
+        :param join_models: models to join
+        :param order_by: columns to order the rows by (optional)
+        :param batch_size: number of rows fetched from the cursor at a time
+        :return: iterator of rows"""
+        db = SessionLocal()
+        try:
+            query = db.query(*fields)
+            if model is not None and join_models is not None:
+                query = query.select_from(model).join(*join_models, isouter=True)
+            if filter_expressions is not None:
+                query = query.filter(*filter_expressions)
+            if order_by is not None:
+                query = query.order_by(*order_by)
+            yield from query.execution_options(stream_results=True, max_row_buffer=batch_size).yield_per(batch_size)
+        except Exception as e:
+            db.rollback()
+            print(e)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not stream rows")
+        finally:
+            db.close()
+
     def order_columns(self, model: any, result: any):
         """Order the columns of the result
         :param model: model to order
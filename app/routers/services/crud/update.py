@@ -1,6 +1,7 @@
 from fastapi import HTTPException, status
 from psycopg2.errors import UniqueViolation
 from routers.services.crud.abstractCRUD import abstractbaseCRUD
+from sqlalchemy import bindparam, select, tuple_, update
 
 # error handling
 from sqlalchemy.exc import IntegrityError
@@ -30,3 +31,42 @@ class Update(abstractbaseCRUD):
             self.db.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
         return data
+
+    def db_claim(self, model: any, filter_expressions: list, order_by: list, limit: int, data: dict) -> list:
+        """Claim rows with a single UPDATE ... WHERE key IN (SELECT ... FOR UPDATE SKIP LOCKED) statement and one commit.
+        Rows locked by another transaction are skipped, so concurrent callers never claim the same row and do not wait for each other
+        :param model: database model
+        :param filter_expressions: filter expressions of the rows that can be claimed
+        :param order_by: columns to order the rows by
+        :param limit: maximum number of rows to claim
+        :param data: values to set on the claimed rows
+        :return: the claimed rows"""
+        try:
+            key = list(model.__table__.primary_key.columns)
+            claimable = select(*key).where(*filter_expressions).order_by(*order_by).limit(limit).with_for_update(skip_locked=True)
+            statement = update(model).where(tuple_(*key).in_(claimable)).values(data).returning(*model.__table__.columns)
+            result = self.db.execute(statement).all()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        return result
+
+    def db_bulk_update(self, model: any, key_columns: list[str], value_columns: list[str], rows: list[dict]):
+        """Update many rows with one executemany statement and one commit, a row that no longer matches its key columns is left unchanged
+        :param model: database model
+        :param key_columns: columns that identify each row (e.g the primary key and a column that must not have changed since the row was read)
+        :param value_columns: columns to set, a key column can be set as well (e.g to keep the value of an onupdate column)
+        :param rows: values of the key and value columns of each row"""
+        if not rows:
+            return
+        try:
+            # the bound parameters are prefixed as sqlalchemy reserves the column names for the values of the update
+            statement = (
+                update(model).where(*[getattr(model, column) == bindparam(f"key_{column}") for column in key_columns]).values({column: bindparam(f"value_{column}") for column in value_columns})
+            )
+            self.db.execute(statement, [{**{f"key_{column}": row[column] for column in key_columns}, **{f"value_{column}": row[column] for column in value_columns}} for row in rows])
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -83,6 +83,25 @@ class averagingMethod(str, Enum):
     max = "max"
 
 
+class rollupResolution(str, Enum):
+    hourly = "H"
+    daily = "D"
+    monthly = "M"
+
+
+class ingestionJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class reencodingTaskStatus(str, Enum):
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
 class userColumns(str, Enum):
     uid = "uid"
     email = "email"
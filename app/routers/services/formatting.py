@@ -1,12 +1,17 @@
+import csv
 import datetime as dt
+import io
+from itertools import repeat
 from math import log10
-from typing import Tuple
+from typing import Any, Iterable, Iterator, Tuple
 
 import shapely.wkt
 from core.schema import GeoJsonExport
 from fastapi import HTTPException, status
 from geoalchemy2.shape import WKBElement, from_shape, to_shape
 from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.measurement_codec import decode_measurements, is_columnar, read_column_names
+from sensor_api_wrappers.data_transfer_object.measurement_json import measurement_json_columns
 from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
 
 
@@ -139,29 +144,53 @@ def format_sensor_joined_data(result: any):
     return results
 
 
-def format_sensor_summary_to_csv(query_result: any, columns: list[str]) -> str:
-    """Format the sensor data as CSV
+def generate_sensor_summary_csv(rows: Iterable[any], columns: list[str], batch_size: int = 500) -> Iterator[str]:
+    """Streams sensor summaries as CSV, one chunk for every batch of summary rows so the export is never held in memory
 
     Args:
-        query_result (any): The query result to format
-        columns (list[str]): List of columns to include in the CSV (default is None, which means all columns)
+        rows (Iterable[any]): sensor summary rows with sensor_id, measurement_data and measurement_blob fields
+        columns (list[str]): measurement columns to write after the sensor_id and Timestamp columns
+        batch_size (int): number of sensor summary rows written to each chunk
+    Yields:
+        str: CSV text, the first chunk starts with the header
+    """
+    timestamp_column = SensorMeasurementsColumns.TIMESTAMP.value
+    record_columns = [timestamp_column] + [col for col in columns if col != timestamp_column]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["sensor_id"] + record_columns)
+
+    for count, row in enumerate(rows, start=1):
+        row = row._mapping
+        values = deserializeMeasurementColumns(row["measurement_data"], record_columns, measurement_blob=row.get("measurement_blob"))
+        length = len(next(iter(values.values()), []))
+        writer.writerows(zip(repeat(row["sensor_id"], length), *[values.get(col, repeat(None, length)) for col in record_columns]))
+
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+
+def measurement_column_union(keys: Iterable[str], blob_prefixes: Iterable[bytes] = ()) -> list[str]:
+    """Combines the measurement columns of many sensor summaries into one ordered list of columns
+
+    Args:
+        keys (Iterable[str]): measurement columns of the json stored summaries (may contain duplicates)
+        blob_prefixes (Iterable[bytes]): start of the measurement_blob of the columnar stored summaries
     Returns:
-        str: The formatted CSV string
+        list[str]: the columns in the order of SensorMeasurementsColumns, any other columns are sorted after them
     """
-    try:
-        df = SensorReadable.JsonStringToDataframe(query_result[0]["measurement_data"], boundingBox=None)
-        if columns:
-            # filter the dataframe to only include the specified columns
-            df = df[[col for col in columns if col in df.columns]]
-
-        # if "timestamp" column exists, use it otherwise use the index
-        if SensorMeasurementsColumns.TIMESTAMP.value in df.columns:
-            return df.set_index(SensorMeasurementsColumns.TIMESTAMP.value).to_csv(index=True, header=True)
-        else:
-            return df.to_csv(index=True, header=True)
+    found = set(keys)
+    for blob_prefix in blob_prefixes:
+        found.update(read_column_names(blob_prefix))
+    found.discard(SensorMeasurementsColumns.TIMESTAMP.value)
 
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not format results as CSV: {e}")
+    known = [col.value for col in SensorMeasurementsColumns if col.value in found]
+    return known + sorted(found.difference(known))
 
 
 def format_sensor_summary_data(query_result: any, deserialize: bool = True, columns: list[str] = None, format_sensor_metadata: bool = False) -> list[dict]:
@@ -175,35 +204,50 @@ def format_sensor_summary_data(query_result: any, deserialize: bool = True, colu
     Returns:
         list: A list of formatted sensor summary data as dictionaries
     """
-    results = []
-    for row in query_result:
-        row_as_dict = dict(row._mapping)
+    return [format_sensor_summary_row(row, deserialize, columns, format_sensor_metadata) for row in query_result]
 
-        try:
-            if format_sensor_metadata and "sensor_metadata" in row_as_dict and row_as_dict["sensor_metadata"] is not None and len(columns) > 0:
-                # filter the sensor metadata to only include the specified columns
-                if "tableSchema" in row_as_dict["sensor_metadata"] and "columns" in row_as_dict["sensor_metadata"]["tableSchema"]:
-                    filtered_columns = []
-                    for column in row_as_dict["sensor_metadata"]["tableSchema"]["columns"]:
-                        if "name" in column and column["name"] in columns:
-                            filtered_columns.append(column)
-                    row_as_dict["sensor_metadata"]["tableSchema"]["columns"] = filtered_columns
-        except Exception as e:
-            pass  # if any error occurs, just return the full metadata without filtering
 
-        if "geom" in row_as_dict:
-            row_as_dict["geom"] = convertWKBtoWKT(row_as_dict["geom"])
+def format_sensor_summary_row(row: any, deserialize: bool = True, columns: list[str] = None, format_sensor_metadata: bool = False) -> dict:
+    """Format a single sensor summary row, used directly when streaming rows from a server-side cursor
 
-        if "timestamp" in row_as_dict:
-            row_as_dict["timestamp_UTC"] = row_as_dict.pop("timestamp")
+    Args:
+        row (any): The row to format
+        deserialize (bool): Whether to deserialize the measurement data (default is True)
+        columns (list[str]): List of columns to include in the result (default is None, which means all columns)
+        format_sensor_metadata (bool): Whether to format the sensor metadata (default is False)
+    Returns:
+        dict: The formatted sensor summary row
+    """
+    row_as_dict = dict(row._mapping)
+
+    try:
+        if format_sensor_metadata and "sensor_metadata" in row_as_dict and row_as_dict["sensor_metadata"] is not None and len(columns) > 0:
+            # filter the sensor metadata to only include the specified columns
+            if "tableSchema" in row_as_dict["sensor_metadata"] and "columns" in row_as_dict["sensor_metadata"]["tableSchema"]:
+                filtered_columns = []
+                for column in row_as_dict["sensor_metadata"]["tableSchema"]["columns"]:
+                    if "name" in column and column["name"] in columns:
+                        filtered_columns.append(column)
+                row_as_dict["sensor_metadata"]["tableSchema"]["columns"] = filtered_columns
+    except Exception as e:
+        pass  # if any error occurs, just return the full metadata without filtering
 
-        if "measurement_data" in row_as_dict and deserialize:
-            # convert the json string to a python dict
-            row_as_dict["measurement_data"] = deserializeMeasurementData(row_as_dict["measurement_data"], columns=columns)
+    if "geom" in row_as_dict:
+        row_as_dict["geom"] = convertWKBtoWKT(row_as_dict["geom"])
 
-        results.append(row_as_dict)
+    if "timestamp" in row_as_dict:
+        row_as_dict["timestamp_UTC"] = row_as_dict.pop("timestamp")
 
-    return results
+    # columnar rows are returned in the same shape as json rows
+    measurement_blob = row_as_dict.pop("measurement_blob", None)
+
+    if "measurement_data" in row_as_dict and deserialize:
+        # convert the json string to a python dict
+        row_as_dict["measurement_data"] = deserializeMeasurementData(row_as_dict["measurement_data"], columns=columns, measurement_blob=measurement_blob)
+    elif "measurement_data" in row_as_dict and measurement_blob is not None:
+        row_as_dict["measurement_data"] = SensorReadable.ColumnarToJsonString(measurement_blob)
+
+    return row_as_dict
 
 
 def JsonToSensorReadable(results: list) -> list[tuple[SensorReadable, str]]:
@@ -214,7 +258,12 @@ def JsonToSensorReadable(results: list) -> list[tuple[SensorReadable, str]]:
     # group sensors by id into a dictionary dict[sensor_id] = dict{json_ : measurement data, "boundingBox": geom}
     sensor_dict = {}
     for sensorSummary in results:
-        data_dict = {"sensor_type": None, "json_": sensorSummary["measurement_data"], "boundingBox": sensorSummary["geom"] if sensorSummary["stationary"] == True else None}
+        data_dict = {
+            "sensor_type": None,
+            "json_": sensorSummary["measurement_data"],
+            "blob": sensorSummary.get("measurement_blob"),
+            "boundingBox": sensorSummary["geom"] if sensorSummary["stationary"] == True else None,
+        }
 
         # if type_name key exists in sensorSummary, add it to the data_dict, otherwise remove it from the data_dict
         if "type_name" in sensorSummary:
@@ -244,25 +293,55 @@ def sensorSummariesToGeoJson(results: list, averaging_methods: list[str], averag
 
     sensors = JsonToSensorReadable(results)
 
+    # the averages of every sensor are computed in one grouped pass
+    measurement_columns = SensorReadable.panel_averages([sensor for sensor, _ in sensors], averaging_methods, averaging_frequency)
+
     geoJsons = []
-    for sensor, sensorTypeString in sensors:
-        geoJsons.append(GeoJsonExport(sensorid=sensor.id, sensorType=sensorTypeString, geojson=sensor.to_geojson(averaging_methods, averaging_frequency)))
+    for (sensor, sensorTypeString), columns in zip(sensors, measurement_columns):
+        geoJsons.append(GeoJsonExport(sensorid=sensor.id, sensorType=sensorTypeString, geojson=sensor.averages_to_geojson(columns, averaging_methods)))
 
     return geoJsons
 
 
-def deserializeMeasurementData(measurement_data: str, columns: list[str]) -> dict:
-    """deserializes the measurement data
+def deserializeMeasurementData(measurement_data: Any, columns: list[str], measurement_blob: bytes = None) -> list[dict]:
+    """deserializes the measurement data into a list of records (one per timestamp) without building a dataframe
     Args:
-        measurement_data (str): the measurement data in JSON string format
+        measurement_data (Any): the measurement data in JSON string format (or an already parsed dictionary)
         columns (list[str]): list of columns to include in the result
+        measurement_blob (bytes): the measurement data in the columnar format, used instead of measurement_data when provided
 
-    :return: dictionary of deserialized measurement data"""
-    df = SensorReadable.JsonStringToDataframe(measurement_data, boundingBox=None)
-    df.drop(columns=["boundingBox"], inplace=True)
+    :return: list of records, the Timestamp column is first unless columns sets the order"""
+    values = deserializeMeasurementColumns(measurement_data, columns, measurement_blob=measurement_blob)
+    keys = list(values)
+    return [dict(zip(keys, row)) for row in zip(*values.values())]
 
-    if columns:
-        # filter the dataframe to only include the specified columns
-        df = df[[col for col in columns if col in df.columns]]
 
-    return df.to_dict(orient="records")  # use timestamps since they use less data
+def deserializeMeasurementColumns(measurement_data: Any, columns: list[str], measurement_blob: bytes = None) -> dict[str, list]:
+    """deserializes the measurement data straight into columns (see measurement_json_columns)
+    Args:
+        measurement_data (Any): the measurement data in JSON string format (or an already parsed dictionary)
+        columns (list[str]): list of columns to include in the result
+        measurement_blob (bytes): the measurement data in the columnar format, used instead of measurement_data when provided
+
+    :return: dictionary of the values of each column, missing values are None. The Timestamp column is first unless columns sets the order"""
+    if measurement_blob is not None and is_columnar(measurement_blob):
+        return columnarToColumns(measurement_blob, columns)
+    return measurement_json_columns(measurement_data, columns)
+
+
+def columnarToColumns(measurement_blob: bytes, columns: list[str] = None) -> dict[str, list]:
+    """converts a columnar measurement blob into lists of values
+    :param measurement_blob: columnar encoded bytes (see measurement_codec)
+    :param columns: list of columns to include in the result
+    :return: dictionary of the values of each column"""
+    arrays = decode_measurements(measurement_blob)
+    keys = [col for col in columns if col in arrays] if columns else list(arrays)
+
+    values = {}
+    for key in keys:
+        column = arrays[key].tolist()
+        if arrays[key].dtype.kind == "f":
+            # NaN marks a missing value in the columnar format
+            column = [None if value != value else value for value in column]
+        values[key] = column
+    return values
@@ -0,0 +1,89 @@
+"""Append-only merge of sensor summaries into the summaries already stored for the same sensor and day.
+
+The cron ingestion fetches the whole of yesterday and today on every run. Rather than rewriting the stored day, only
+the readings newer than the latest stored reading are kept (the delta) and they are appended to the stored row:
+json measurement_data is merged with jsonb || and a columnar measurement_blob gets the delta concatenated as a new
+segment, so the stored readings are never sent back to the api, decoded or re-encoded.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from core.schema import SensorSummary as SchemaSensorSummary
+from routers.services.enums import SensorMeasurementsColumns
+from routers.services.query_building import measurementDataAsJsonb
+from sensor_api_wrappers.data_transfer_object.measurement_codec import decode_measurements, encode_measurements, read_column_names, read_last_timestamp
+from sqlalchemy import Text, and_, case, cast, func, literal_column, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import JSON
+
+
+def last_stored_timestamp(row: any) -> int:
+    """returns the timestamp of the latest reading of a stored sensor summary
+    :param row: stored row with the measurement_blob and last_json_timestamp (see measurementLastTimestamp) fields
+    :return: latest unix timestamp or None if the row has no readings"""
+    if row.measurement_blob is not None:
+        return read_last_timestamp(row.measurement_blob)
+    return row.last_json_timestamp
+
+
+def sensor_summary_delta(sensorSummary: SchemaSensorSummary, row: any) -> SchemaSensorSummary:
+    """keeps the readings of a sensor summary that are newer than the latest reading of the stored summary.
+    The geometry of the sensor summary is kept as is, the stored geometry is extended with it when the delta is appended
+    :param sensorSummary: sensor summary of a whole day
+    :param row: stored row of the same sensor and day with the measurement_blob and last_json_timestamp fields
+    :return: sensor summary of the newer readings or None if there are none
+    :raises ValueError: if the delta can not be appended to the stored row, so that the stored row has to be replaced"""
+    stored_columnar = row.measurement_blob is not None
+    if stored_columnar != (sensorSummary.measurement_blob is not None):
+        raise ValueError("the stored sensor summary has a different storage format")
+
+    last_timestamp = last_stored_timestamp(row)
+    if last_timestamp is None:
+        raise ValueError("the stored sensor summary has no readings")
+
+    if stored_columnar:
+        columns = decode_measurements(sensorSummary.measurement_blob)
+        # the header of the first segment has to list every column of the blob
+        if not set(columns).issubset(read_column_names(row.measurement_blob)):
+            raise ValueError("the sensor summary has columns that the stored sensor summary does not have")
+
+        timestamps = columns.pop(SensorMeasurementsColumns.TIMESTAMP.value)
+        newer = timestamps > last_timestamp
+        measurement_count = int(np.count_nonzero(newer))
+        if measurement_count == 0:
+            return None
+        df = pd.DataFrame({name: values[newer] for name, values in columns.items()}, index=pd.Index(timestamps[newer], name=SensorMeasurementsColumns.TIMESTAMP.value))
+        return sensorSummary.copy(update={"measurement_count": measurement_count, "measurement_blob": encode_measurements(df)})
+
+    readings = json.loads(sensorSummary.measurement_data)
+    newer = {key: reading for key, reading in readings.items() if int(key) > last_timestamp}
+    if not newer:
+        return None
+    return sensorSummary.copy(update={"measurement_count": len(newer), "measurement_data": json.dumps(newer, allow_nan=False)})
+
+
+def append_update_values(model: any, excluded: any) -> dict:
+    """builds the values that append a delta to the stored row in an INSERT ... ON CONFLICT DO UPDATE statement.
+    Every expression reads the stored row from before the update. Only rows with a last_json_timestamp are appended to,
+    legacy rows that are not strict json have none (see measurementLastTimestamp) so they are replaced by the whole day
+    :param model: SensorSummaries model
+    :param excluded: the excluded (proposed) row of the statement, which holds the delta
+    :return: dictionary of column name to update expression"""
+    stationary = and_(model.stationary, excluded.stationary)
+    merged_readings = measurementDataAsJsonb().op("||")(cast(excluded.measurement_data.op("#>>")(literal_column("'{}'")), JSONB))
+    return {
+        # the merged readings are stored as a json encoded string like the rest of measurement_data (null for columnar rows)
+        "measurement_data": type_coerce(func.to_json(cast(merged_readings, Text)), JSON),
+        # the delta is a complete segment of its own (null for json rows)
+        "measurement_blob": model.measurement_blob.op("||")(excluded.measurement_blob),
+        "measurement_count": model.measurement_count + excluded.measurement_count,
+        "stationary": stationary,
+        # a stationary sensor keeps its stationary box, otherwise the bounding box covers the stored and the new readings
+        "geom": case(
+            (stationary, excluded.geom),
+            else_=func.ST_Envelope(func.ST_Union(func.coalesce(model.geom, excluded.geom), func.coalesce(excluded.geom, model.geom))),
+        ),
+        "time_updated": func.now(),
+    }
@@ -0,0 +1,221 @@
+"""Durable queue of the data ingestion tasks.
+
+A scheduled data ingestion task is split into work units, one for each sensor and day, which are stored in the
+IngestionJobs table and run by separate worker processes (see ingestion_worker.py) rather than by the API process.
+Workers claim units with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can run side by side without
+claiming the same unit, and each claim holds a lease: the units of a worker that crashed or was restarted are claimed
+again once their lease has expired. A unit that raised an error is queued again until it has been attempted
+INGESTION_JOB_MAX_ATTEMPTS times.
+
+The settings are read from the environment:
+    INGESTION_JOB_LEASE_SECONDS: seconds a worker has to finish the units it claimed (default 1800)
+    INGESTION_JOB_MAX_ATTEMPTS: number of times a unit is attempted before it is marked as failed (default 3)
+"""
+
+import datetime as dt
+from os import environ as env
+
+from core.models import IngestionJobs as ModelIngestionJob
+from core.models import SensorPlatforms as ModelSensorPlatform
+from routers.services.crud.crud import CRUD
+from routers.services.enums import ingestionJobStatus
+from sqlalchemy import and_, func, or_
+
+SECONDS_IN_DAY = 86400
+INGESTION_JOB_LEASE_SECONDS = int(env.get("INGESTION_JOB_LEASE_SECONDS", 1800))
+INGESTION_JOB_MAX_ATTEMPTS = int(env.get("INGESTION_JOB_MAX_ATTEMPTS", 3))
+# number of units inserted with each statement
+ENQUEUE_BATCH_SIZE = 1000
+
+UNFINISHED_STATUSES = [ingestionJobStatus.queued.value, ingestionJobStatus.running.value]
+
+
+def to_timestamp(date: dt.datetime) -> int:
+    """:return: unix timestamp of a naive datetime in UTC"""
+    return int(date.replace(tzinfo=dt.timezone.utc).timestamp())
+
+
+def ingestion_jobs(task_id: str, sensors: list[dict], startDate: dt.datetime, endDate: dt.datetime, incremental: bool = False, notify: bool = False, resume: bool = False) -> list[dict]:
+    """creates the work units of a data ingestion task, one for each sensor and day from the start date up to the end date (exclusive).
+    A task whose start and end date are the same day has one unit for each sensor
+    :param task_id: id of the task
+    :param sensors: sensors of the task (rows returned by get_sensor_dict)
+    :param startDate: start date of the data to be ingested
+    :param endDate: end date of the data to be ingested
+    :param incremental: if true then only the new readings are appended to the stored sensor summaries
+    :param notify: if true then the firebase notification of the task is updated when it finishes
+    :param resume: if true then each sensor resumes from its time_updated: the days since it was last updated are added to the task and that day is only fetched from time_updated
+    :return: rows of the IngestionJobs table"""
+    first_day = to_timestamp(startDate) // SECONDS_IN_DAY * SECONDS_IN_DAY
+    end = max(to_timestamp(endDate), first_day + 1)
+
+    jobs = []
+    for sensor in sensors:
+        last_update = to_timestamp(sensor["time_updated"]) if resume and sensor.get("time_updated") is not None else None
+        day = first_day
+        if last_update is not None and last_update < first_day:
+            day = last_update // SECONDS_IN_DAY * SECONDS_IN_DAY
+
+        while day < end:
+            fetch_start = last_update if last_update is not None and day < last_update < day + SECONDS_IN_DAY else day
+            jobs.append(
+                {
+                    "task_id": task_id,
+                    "sensor_id": sensor["id"],
+                    "timestamp": day,
+                    "fetch_start": fetch_start,
+                    "incremental": incremental,
+                    "notify": notify,
+                    "status": ingestionJobStatus.queued.value,
+                    "attempts": 0,
+                    "message": None,
+                    "worker": None,
+                    "lease_expires": None,
+                }
+            )
+            day += SECONDS_IN_DAY
+    return jobs
+
+
+def failed_ingestion_job(task_id: str, sensor_id: int, message: str) -> dict:
+    """creates a unit that has already failed, so that a sensor that was skipped is included in the log of the task
+    :param task_id: id of the task
+    :param sensor_id: sensor id
+    :param message: reason the sensor was skipped
+    :return: row of the IngestionJobs table"""
+    day = to_timestamp(dt.datetime.utcnow()) // SECONDS_IN_DAY * SECONDS_IN_DAY
+    return {
+        "task_id": task_id,
+        "sensor_id": sensor_id,
+        "timestamp": day,
+        "fetch_start": day,
+        "incremental": False,
+        "notify": False,
+        "status": ingestionJobStatus.failed.value,
+        "attempts": 0,
+        "message": message,
+        "worker": None,
+        "lease_expires": None,
+    }
+
+
+def enqueue_ingestion_jobs(jobs: list[dict]) -> int:
+    """adds work units to the queue, a unit that is already in the queue is reset
+    :param jobs: rows of the IngestionJobs table
+    :return: number of units added"""
+    for i in range(0, len(jobs), ENQUEUE_BATCH_SIZE):
+        CRUD().db_bulk_upsert(ModelIngestionJob, jobs[i : i + ENQUEUE_BATCH_SIZE], ["task_id", "sensor_id", "timestamp"])
+    return len(jobs)
+
+
+def claim_ingestion_jobs(worker: str, limit: int) -> list:
+    """claims the oldest queued units and the running units whose lease has expired
+    :param worker: name of the worker
+    :param limit: maximum number of units to claim
+    :return: the claimed units, the attempts of a unit include this claim"""
+    now = func.now()
+    return CRUD().db_claim(
+        ModelIngestionJob,
+        [
+            or_(
+                ModelIngestionJob.status == ingestionJobStatus.queued.value,
+                and_(ModelIngestionJob.status == ingestionJobStatus.running.value, ModelIngestionJob.lease_expires < now),
+            )
+        ],
+        [ModelIngestionJob.time_created, ModelIngestionJob.timestamp],
+        limit,
+        {
+            ModelIngestionJob.status: ingestionJobStatus.running.value,
+            ModelIngestionJob.worker: worker,
+            ModelIngestionJob.attempts: ModelIngestionJob.attempts + 1,
+            ModelIngestionJob.lease_expires: now + dt.timedelta(seconds=INGESTION_JOB_LEASE_SECONDS),
+        },
+    )
+
+
+def finish_ingestion_job(job: any, worker: str, status: str, message: str = None):
+    """sets the final status of a unit. Nothing is changed if the unit was claimed by another worker in the meantime (its lease expired)
+    :param job: claimed unit
+    :param worker: name of the worker
+    :param status: done or failed
+    :param message: error message"""
+    CRUD().db_update(
+        ModelIngestionJob,
+        [ModelIngestionJob.task_id == job.task_id, ModelIngestionJob.sensor_id == job.sensor_id, ModelIngestionJob.timestamp == job.timestamp, ModelIngestionJob.worker == worker],
+        {ModelIngestionJob.status: status, ModelIngestionJob.message: message, ModelIngestionJob.lease_expires: None},
+    )
+
+
+def retry_ingestion_job(job: any, worker: str, message: str):
+    """queues a unit that raised an error again, or marks it as failed once it has been attempted INGESTION_JOB_MAX_ATTEMPTS times
+    :param job: claimed unit
+    :param worker: name of the worker
+    :param message: error message"""
+    status = ingestionJobStatus.queued.value if job.attempts < INGESTION_JOB_MAX_ATTEMPTS else ingestionJobStatus.failed.value
+    finish_ingestion_job(job, worker, status, message)
+
+
+def unfinished_ingestion_job_count(task_id: str) -> int:
+    """:return: number of queued and running units of a task"""
+    (count,) = CRUD().db_get_fields_using_filter_expression(
+        [ModelIngestionJob.task_id == task_id, ModelIngestionJob.status.in_(UNFINISHED_STATUSES)], [func.count(ModelIngestionJob.sensor_id)], first=True
+    )
+    return count
+
+
+def get_ingestion_task_jobs(task_id: str) -> list:
+    """:return: the units of a task and the serial numbers of their sensors"""
+    return CRUD().db_get_fields_using_filter_expression(
+        filter_expressions=[ModelIngestionJob.task_id == task_id],
+        fields=[
+            ModelIngestionJob.sensor_id,
+            ModelSensorPlatform.serial_number,
+            ModelIngestionJob.timestamp,
+            ModelIngestionJob.notify,
+            ModelIngestionJob.status,
+            ModelIngestionJob.attempts,
+            ModelIngestionJob.message,
+            ModelIngestionJob.worker,
+        ],
+        model=ModelIngestionJob,
+        join_models=[ModelSensorPlatform],
+        order_by=[ModelIngestionJob.timestamp, ModelIngestionJob.sensor_id],
+    )
+
+
+def get_recent_ingestion_jobs(since: dt.datetime) -> list:
+    """:return: the task id and status of the units created since a date"""
+    return CRUD().db_get_fields_using_filter_expression(
+        filter_expressions=[ModelIngestionJob.time_created >= since], fields=[ModelIngestionJob.task_id, ModelIngestionJob.status], order_by=[ModelIngestionJob.task_id]
+    )
+
+
+def ingestion_task_status(task_id: str, jobs: list) -> dict:
+    """summarises the progress of a task
+    :param task_id: id of the task
+    :param jobs: units of the task (see get_ingestion_task_jobs)
+    :return: number of units in each status and the units that failed"""
+    counts = {status.value: 0 for status in ingestionJobStatus}
+    for job in jobs:
+        counts[job.status] += 1
+    return {
+        "task_id": task_id,
+        "finished": len(jobs) > 0 and all(job.status not in UNFINISHED_STATUSES for job in jobs),
+        "jobs": len(jobs),
+        **counts,
+        "failed_jobs": [{"sensor_id": job.sensor_id, "timestamp": job.timestamp, "attempts": job.attempts, "message": job.message} for job in jobs if job.status == ingestionJobStatus.failed.value],
+    }
+
+
+def ingestion_task_log(jobs: list) -> dict:
+    """creates the log of a finished task in the format of the data ingestion logs
+    :param jobs: units of the task (see get_ingestion_task_jobs)
+    :return: log_dict[timestamp][sensor_id] = {"serial_number": serial_number, "status": status, "message": message}"""
+    log_dict = {}
+    for job in jobs:
+        entry = {"serial_number": job.serial_number, "status": job.status == ingestionJobStatus.done.value}
+        # if message is None then don't include it in the log
+        if job.message is not None:
+            entry["message"] = job.message
+        log_dict.setdefault(job.timestamp, {})[job.sensor_id] = entry
+    return log_dict
@@ -0,0 +1,140 @@
+"""Re-encoding of the legacy measurement_data of the sensor summaries as strict json.
+
+Older sensor summaries were stored as python dictionary strings (single quotes, None, NaN, see measurement_json), which
+had to be rewritten on every read before they could be parsed. A re-encoding task walks the sensor summaries that may
+hold legacy measurement_data in primary key order, MEASUREMENT_REENCODING_BATCH_SIZE rows at a time, and rewrites the
+rows that are not strict json. After every batch the key of its last row is saved as the cursor of the task in the
+MeasurementReencodingTasks table, so the progress of a task can be read while it runs and a task that was interrupted
+(e.g the api was restarted) is resumed from its cursor rather than from the start.
+
+A row is only rewritten if it has not been written since it was read (its time_updated is unchanged), so a day that is
+ingested again while the task runs is never overwritten with older readings. The time_updated of a rewritten row is
+kept as its readings have not changed, which also keeps the cached responses of the row valid.
+
+The settings are read from the environment:
+    MEASUREMENT_REENCODING_BATCH_SIZE: number of sensor summaries read at a time (default 500)
+"""
+
+from os import environ as env
+
+from core.models import MeasurementReencodingTasks as ModelMeasurementReencodingTask
+from core.models import SensorSummaries as ModelSensorPlatformSummary
+from fastapi import HTTPException
+from routers.services.crud.crud import CRUD
+from routers.services.enums import reencodingTaskStatus
+from routers.services.query_building import keysetPaginationOrder, measurementDataIsLegacy
+from sensor_api_wrappers.data_transfer_object.measurement_json import reencode_measurement_json
+from sqlalchemy import tuple_
+
+MEASUREMENT_REENCODING_BATCH_SIZE = int(env.get("MEASUREMENT_REENCODING_BATCH_SIZE", 500))
+
+
+def reencoded_rows(rows: list) -> tuple[list[dict], list[str]]:
+    """rewrites the legacy measurement_data of a batch of sensor summaries as strict json
+    :param rows: sensor summaries with the timestamp, sensor_id, time_updated and measurement_data fields
+    :return: values of the rewritten rows (see CRUD.db_bulk_update) and the errors of the rows that could not be parsed"""
+    updates, errors = [], []
+    for row in rows:
+        try:
+            measurement_data = reencode_measurement_json(row.measurement_data)
+        except ValueError as e:
+            errors.append(f"sensor {row.sensor_id} at {row.timestamp}: {e}")
+            continue
+        if measurement_data is not None:
+            updates.append({"timestamp": row.timestamp, "sensor_id": row.sensor_id, "time_updated": row.time_updated, "measurement_data": measurement_data})
+    return updates, errors
+
+
+def create_measurement_reencoding_task(task_id: str):
+    """adds a task that starts from the first sensor summary
+    :param task_id: id of the task"""
+    CRUD().db_add(ModelMeasurementReencodingTask, {"task_id": task_id, "rows_checked": 0, "rows_rewritten": 0, "rows_failed": 0, "status": reencodingTaskStatus.running.value})
+
+
+def get_measurement_reencoding_task(task_id: str) -> any:
+    """:return: the progress of a task, None if the task does not exist"""
+    return CRUD().db_get_fields_using_filter_expression([ModelMeasurementReencodingTask.task_id == task_id], list(ModelMeasurementReencodingTask.__table__.columns), first=True)
+
+
+def update_measurement_reencoding_task(task_id: str, data: dict):
+    """saves the progress of a task
+    :param task_id: id of the task
+    :param data: values to set"""
+    CRUD().db_update(ModelMeasurementReencodingTask, [ModelMeasurementReencodingTask.task_id == task_id], data)
+
+
+def legacy_measurement_data_batch(cursor: tuple[int, int], batch_size: int) -> list:
+    """reads the next sensor summaries that may hold legacy measurement_data
+    :param cursor: timestamp and sensor id of the last sensor summary of the previous batch, None for the first batch
+    :param batch_size: maximum number of sensor summaries to read
+    :return: sensor summaries with the timestamp, sensor_id, time_updated and measurement_data fields"""
+    filter_expressions = [ModelSensorPlatformSummary.measurement_data.isnot(None), measurementDataIsLegacy()]
+    if cursor is not None:
+        filter_expressions.append(tuple_(ModelSensorPlatformSummary.timestamp, ModelSensorPlatformSummary.sensor_id) > tuple_(*cursor))
+
+    return CRUD().db_get_fields_using_filter_expression(
+        filter_expressions,
+        [ModelSensorPlatformSummary.timestamp, ModelSensorPlatformSummary.sensor_id, ModelSensorPlatformSummary.time_updated, ModelSensorPlatformSummary.measurement_data],
+        limit=batch_size,
+        order_by=keysetPaginationOrder(),
+    )
+
+
+def run_measurement_reencoding(task_id: str, batch_size: int = MEASUREMENT_REENCODING_BATCH_SIZE):
+    """rewrites the legacy measurement_data of the sensor summaries, starting after the cursor of the task.
+    Running a task again (e.g after it was interrupted or failed) resumes it from its cursor
+    :param task_id: id of the task
+    :param batch_size: number of sensor summaries read at a time"""
+    task = get_measurement_reencoding_task(task_id)
+    cursor = (task.cursor_timestamp, task.cursor_sensor_id) if task.cursor_timestamp is not None else None
+    (checked, rewritten, failed, message) = (task.rows_checked, task.rows_rewritten, task.rows_failed, None)
+    update_measurement_reencoding_task(task_id, {ModelMeasurementReencodingTask.status: reencodingTaskStatus.running.value, ModelMeasurementReencodingTask.message: None})
+
+    try:
+        while True:
+            rows = legacy_measurement_data_batch(cursor, batch_size)
+            if not rows:
+                break
+
+            (updates, errors) = reencoded_rows(rows)
+            # the time_updated of a row is both part of its key and kept as it was
+            CRUD().db_bulk_update(ModelSensorPlatformSummary, ["timestamp", "sensor_id", "time_updated"], ["measurement_data", "time_updated"], updates)
+
+            cursor = (rows[-1].timestamp, rows[-1].sensor_id)
+            (checked, rewritten, failed) = (checked + len(rows), rewritten + len(updates), failed + len(errors))
+            message = errors[-1] if errors else message
+            update_measurement_reencoding_task(
+                task_id,
+                {
+                    ModelMeasurementReencodingTask.cursor_timestamp: cursor[0],
+                    ModelMeasurementReencodingTask.cursor_sensor_id: cursor[1],
+                    ModelMeasurementReencodingTask.rows_checked: checked,
+                    ModelMeasurementReencodingTask.rows_rewritten: rewritten,
+                    ModelMeasurementReencodingTask.rows_failed: failed,
+                    ModelMeasurementReencodingTask.message: message,
+                },
+            )
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        error = str(e.detail) if isinstance(e, HTTPException) else str(e)
+        print(f"measurement reencoding task {task_id} failed: {error}")
+        update_measurement_reencoding_task(task_id, {ModelMeasurementReencodingTask.status: reencodingTaskStatus.failed.value, ModelMeasurementReencodingTask.message: error})
+        return
+
+    update_measurement_reencoding_task(task_id, {ModelMeasurementReencodingTask.status: reencodingTaskStatus.done.value})
+
+
+def measurement_reencoding_status(task: any) -> dict:
+    """:return: the progress of a task as a dictionary"""
+    return {
+        "task_id": task.task_id,
+        "status": task.status,
+        "cursor": {"timestamp": task.cursor_timestamp, "sensor_id": task.cursor_sensor_id},
+        "rows_checked": task.rows_checked,
+        "rows_rewritten": task.rows_rewritten,
+        "rows_failed": task.rows_failed,
+        "message": task.message,
+        "time_created": task.time_created,
+        "time_updated": task.time_updated,
+    }
@@ -1,25 +1,35 @@
+import base64
+import binascii
+
 from core.models import SensorSummaries as ModelSensorPlatformSummary
 from fastapi import HTTPException, status
+from routers.services.enums import SensorMeasurementsColumns
 from routers.services.formatting import convertWKTtoWKB
+from sqlalchemy import BigInteger, Text, case, cast, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
+
+# strict json written by pandas never has single quotes or NaN and Infinity values, so the other rows are not cast to jsonb
+LEGACY_MEASUREMENT_DATA_PATTERN = "'|NaN|Infinity"
 
 
 ############################################################################################################
 #                                   Spatial helper functions                                               #
 ############################################################################################################
 # adding search filters
-def searchQueryFilters(filter_expressions: list[any], spatial_query_type: str, geom: str, sensor_ids: list[str]) -> list[any]:
+def searchQueryFilters(filter_expressions: list[any], spatial_query_type: str, geom: str, sensor_ids: list[str], model: any = ModelSensorPlatformSummary) -> list[any]:
     """applies search filter_expressions to the query
     :param filter_expressions: list of filter_expressions to apply
     :param spatial_query_type: type of geometry filter query to use (intersects, contains, within)
     :param geom: geometry to filter by
     :param sensor_ids: list of sensor ids to filter by
+    :param model: model with the sensor_id and geom columns to filter (SensorSummaries by default)
     :return: list of filter_expressions to apply to the query"""
 
     if sensor_ids:
-        filter_expressions.append(ModelSensorPlatformSummary.sensor_id.in_(sensor_ids))
+        filter_expressions.append(model.sensor_id.in_(sensor_ids))
 
     if spatial_query_type and geom is not None:
-        spatialQueryBuilder(filter_expressions, ModelSensorPlatformSummary, "geom", spatial_query_type, geom)
+        spatialQueryBuilder(filter_expressions, model, "geom", spatial_query_type, geom)
 
     return filter_expressions
 
@@ -75,3 +85,99 @@ def joinQueryBuilder(fields: any, model: any, columns: list, join_columns: dict
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     return fields
+
+
+############################################################################################################
+#                                   Measurement data projection                                            #
+############################################################################################################
+def measurementColumnsProjection(columns: list[str], label: str = "measurement_data") -> any:
+    """builds a select expression that only returns the requested columns of each reading in measurement_data,
+    so that unused measurements are filtered out by postgres rather than being sent to the api.
+
+    The result is a json object keyed by timestamp e.g {"1695427200": {"PM2.5": 1.2}}, rows stored in the
+    columnar format (measurement_blob) have no measurement_data and return null. Legacy rows that are not strict
+    json return their measurement_data unchanged, their columns are projected by the api (see measurement_json_columns).
+
+    :param columns: measurement columns to keep (Timestamp is the key of each reading so it is always kept)
+    :param label: label of the returned column
+    :return: labelled expression to use in place of the measurement_data column"""
+    keys = [col for col in columns if col != SensorMeasurementsColumns.TIMESTAMP.value]
+
+    readings = func.jsonb_each(measurementDataAsJsonb()).table_valued("key", "value")
+    values = func.jsonb_each(readings.c.value).table_valued("key", "value")
+
+    projected_reading = (
+        select(func.coalesce(func.jsonb_object_agg(values.c.key, values.c.value), cast(literal_column("'{}'"), JSONB))).select_from(values).where(values.c.key.in_(keys)).scalar_subquery()
+    )
+    projected_readings = select(func.jsonb_object_agg(readings.c.key, projected_reading)).select_from(readings).scalar_subquery()
+    return case((measurementDataIsLegacy(), cast(ModelSensorPlatformSummary.measurement_data, JSONB)), else_=projected_readings).label(label)
+
+
+def measurementKeysProjection(label: str = "key") -> any:
+    """builds a select expression that returns one row per measurement column of each sensor summary.
+    Every reading of a day shares the same columns so only the first reading is inspected.
+    Legacy rows that are not strict json return no rows (see measurementDataIsLegacy)
+    :param label: label of the returned column
+    :return: labelled set returning expression"""
+    readings = func.jsonb_each(measurementDataAsJsonb()).table_valued("key", "value")
+    first_reading = select(readings.c.value).select_from(readings).limit(1).scalar_subquery()
+    return func.jsonb_object_keys(first_reading).label(label)
+
+
+def measurementLastTimestamp(label: str = "last_json_timestamp") -> any:
+    """builds a select expression that returns the timestamp of the latest reading in measurement_data,
+    the readings are keyed by timestamp so only the keys are read. Rows stored in the columnar format and legacy rows
+    that are not strict json return null.
+    :param label: label of the returned column
+    :return: labelled scalar subquery"""
+    keys = func.jsonb_object_keys(measurementDataAsJsonb()).column_valued("key")
+    return select(func.max(cast(keys, BigInteger))).scalar_subquery().label(label)
+
+
+def measurementDataIsLegacy() -> any:
+    """legacy measurement_data (python dictionary strings or json with NaN values, see measurement_json) can not be cast to jsonb
+    :return: filter expression that is true for the rows that may hold legacy measurement_data"""
+    return cast(ModelSensorPlatformSummary.measurement_data, Text).op("~")(LEGACY_MEASUREMENT_DATA_PATTERN)
+
+
+def measurementDataAsJsonb() -> any:
+    """measurement_data is stored as a json encoded string, #>> '{}' unwraps it (and returns json objects unchanged).
+    Legacy rows are null rather than failing the whole query (see measurementDataIsLegacy)
+    :return: measurement_data as a jsonb expression"""
+    return case((~measurementDataIsLegacy(), cast(ModelSensorPlatformSummary.measurement_data.op("#>>")(literal_column("'{}'")), JSONB)))
+
+
+############################################################################################################
+#                                   Keyset pagination                                                      #
+############################################################################################################
+def encodePageCursor(timestamp: int, sensor_id: int) -> str:
+    """encodes the primary key of the last row of a page as an opaque continuation token
+    :param timestamp: timestamp of the last row
+    :param sensor_id: sensor id of the last row
+    :return: url safe cursor"""
+    return base64.urlsafe_b64encode(f"{timestamp}:{sensor_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decodePageCursor(cursor: str) -> tuple[int, int]:
+    """decodes a continuation token returned by encodePageCursor
+    :param cursor: cursor
+    :return: tuple of the timestamp and sensor id of the last row of the previous page"""
+    try:
+        timestamp, sensor_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii").split(":")
+        return int(timestamp), int(sensor_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keysetPaginationFilter(cursor: str, model: any = ModelSensorPlatformSummary) -> any:
+    """filters the rows after the cursor. The row comparison follows the (timestamp, sensor_id) primary key,
+    so each page is read with a range scan of the primary key index however deep the page is.
+    :param cursor: cursor returned by encodePageCursor
+    :param model: model with the timestamp and sensor_id columns (SensorSummaries by default)
+    :return: filter expression"""
+    return tuple_(model.timestamp, model.sensor_id) > tuple_(*decodePageCursor(cursor))
+
+
+def keysetPaginationOrder(model: any = ModelSensorPlatformSummary) -> list[any]:
+    """:return: order of the rows for keyset pagination (the primary key order)"""
+    return [model.timestamp, model.sensor_id]
@@ -0,0 +1,180 @@
+"""HTTP conditional requests and an in-process cache of rendered sensor summary responses.
+
+Every response is validated against the rows it was built from: the ETag is derived from the request, the number of
+matching rows, their latest time_updated and a checksum of the sensor metadata joined to them. A request whose
+If-None-Match (or If-Modified-Since, which only follows the rows) still matches gets a 304, and a rendered response is
+only served from the cache while its ETag is current. The ETag check is the only invalidation: the data ingestion runs
+in separate worker processes (see ingestion_worker) so it can not reach the cache of an api process, and stale
+responses are dropped the next time they are requested or evicted when the cache is full.
+"""
+
+import datetime as dt
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+from os import environ as env
+from typing import Callable
+
+from fastapi import Request, Response, status
+from routers.services.crud.crud import CRUD
+from sqlalchemy import Text, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+# maximum size of the cache, 0 disables caching (conditional requests still work)
+RESPONSE_CACHE_MAX_MB = float(env.get("RESPONSE_CACHE_MAX_MB", 64))
+# a single response can use at most this fraction of the cache
+MAX_ENTRY_FRACTION = 0.25
+
+
+class CachedResponse:
+    """a rendered response and the ETag of the data it was built from"""
+
+    def __init__(self, etag: str, body: bytes, media_type: str, headers: dict):
+        self.etag = etag
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers
+
+    def to_response(self) -> Response:
+        """:return: a new response with the cached body"""
+        return Response(content=self.body, media_type=self.media_type, headers=self.headers)
+
+
+class ResponseCache:
+    """size bounded least recently used cache of rendered responses"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str, etag: str) -> CachedResponse:
+        """returns the cached response of a key if it was rendered from the current version of the data
+        :param key: cache key
+        :param etag: current ETag of the data
+        :return: cached response or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.etag != etag:
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        """adds a response to the cache, evicting the least recently used responses to make room
+        :param key: cache key
+        :param entry: response to cache"""
+        if len(entry.body) > self.max_bytes * MAX_ENTRY_FRACTION:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        """removes every cached response"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key: str):
+        self.size -= len(self.entries.pop(key).body)
+
+
+response_cache = ResponseCache(int(RESPONSE_CACHE_MAX_MB * 1024 * 1024))
+
+
+def cache_key(request: Request) -> str:
+    """normalises a request into a cache key, the query parameters are sorted so their order does not matter
+    :param request: request
+    :return: cache key"""
+    return request.url.path + "?" + "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+
+
+def metadata_checksum(columns: list) -> any:
+    """builds a scalar subquery of the checksum of columns of a metadata table (e.g the sensor types joined to the sensor summaries),
+    metadata tables are small and have no time_updated column so every row is read
+    :param columns: columns of one table, the first column orders the rows (e.g the primary key)
+    :return: scalar subquery of the md5 checksum"""
+    rows = func.string_agg(cast(func.json_build_array(*columns), Text), aggregate_order_by(literal("\n"), columns[0]))
+    return select(func.md5(rows)).scalar_subquery()
+
+
+def data_version(model: any, filter_expressions: list, metadata: list[list] = None) -> tuple[int, dt.datetime, list[str]]:
+    """returns the number of rows that match the filters, their latest time_updated and the checksum of the metadata joined to them
+    :param model: model with a time_updated column
+    :param filter_expressions: filter expressions of the query
+    :param metadata: columns of each metadata table joined to the rows (see metadata_checksum)
+    :return: tuple of the row count, latest time_updated and the checksum of each metadata table"""
+    checksums = [metadata_checksum(columns).label(f"metadata_{i}") for i, columns in enumerate(metadata or [])]
+    result = CRUD().db_get_fields_using_filter_expression(filter_expressions, [func.count().label("count"), func.max(model.time_updated).label("last_updated")] + checksums, first=True)
+    return result.count, result.last_updated, [getattr(result, checksum.name) for checksum in checksums]
+
+
+def make_etag(key: str, count: int, last_updated: dt.datetime, metadata_checksums: list[str] = None) -> str:
+    """:return: a strong ETag of a request and the version of the data it reads"""
+    version = "|".join([key, str(count), last_updated.isoformat() if last_updated else "None"] + [str(checksum) for checksum in metadata_checksums or []])
+    return '"' + hashlib.sha1(version.encode("utf-8")).hexdigest() + '"'
+
+
+def is_not_modified(request: Request, etag: str, last_updated: dt.datetime) -> bool:
+    """checks the conditional headers of a request, If-None-Match takes precedence over If-Modified-Since
+    :param request: request
+    :param etag: current ETag
+    :param last_updated: latest time_updated of the data
+    :return: True if the client already has the current version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_updated is not None:
+        try:
+            return last_updated.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(request: Request, model: any, filter_expressions: list, render: Callable[[], Response], cache: bool = True, metadata: list[list] = None) -> Response:
+    """returns a 304 if the client has the current version of the data, then a cached response if there is one,
+    otherwise renders the response (and caches it if it is not streamed)
+    :param request: request
+    :param model: model with a time_updated column that the response is built from
+    :param filter_expressions: filter expressions of the query
+    :param render: function that builds the response
+    :param cache: False to skip the response cache
+    :param metadata: columns of each metadata table that the response includes (see metadata_checksum)
+    :return: response"""
+    key = cache_key(request)
+    count, last_updated, metadata_checksums = data_version(model, list(filter_expressions), metadata)
+    etag = make_etag(key, count, last_updated, metadata_checksums)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_updated is not None:
+        headers["Last-Modified"] = format_datetime(last_updated.astimezone(dt.timezone.utc), usegmt=True)
+
+    if is_not_modified(request, etag, last_updated):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    cache = cache and response_cache.max_bytes > 0
+    if cache:
+        cached = response_cache.get(key, etag)
+        if cached is not None:
+            return cached.to_response()
+
+    response = render()
+    response.headers.update(headers)
+
+    # streamed responses have no body to cache
+    if cache and response.status_code == status.HTTP_200_OK and hasattr(response, "body"):
+        response_cache.put(key, CachedResponse(etag, response.body, response.media_type, headers))
+    return response
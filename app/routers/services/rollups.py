@@ -0,0 +1,297 @@
+"""Hourly, daily and monthly rollups of the sensor summaries.
+
+The rollups store the mean, min, max, median and count of every measurement column and the location extent of each
+period, so that long date ranges can be exported without parsing the per minute measurement_data of every day.
+They are refreshed by the data ingestion tasks after the sensor summaries of a day are written, the monthly rollups
+are combined from the daily rollups.
+"""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from core.models import SensorPlatforms as ModelSensorPlatform
+from core.models import SensorPlatformTypes as ModelSensorPlatformTypePlatform
+from core.models import SensorSummaries as ModelSensorPlatformSummary
+from core.models import SensorSummaryRollups as ModelSensorSummaryRollup
+from core.schema import GeoJsonExport
+from routers.services.crud.crud import CRUD
+from routers.services.enums import SensorMeasurementsColumns, rollupResolution
+from routers.services.formatting import convertWKBtoWKT
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+from sqlalchemy import and_, or_
+
+ROLLUP_METHODS = ["mean", "min", "max", "median", "count"]
+SECONDS_IN_DAY = 86400
+
+# monthly rollups are keyed by the start of the month
+PANDAS_FREQUENCY = {rollupResolution.hourly.value: "H", rollupResolution.daily.value: "D", rollupResolution.monthly.value: "MS"}
+
+# maximum number of days that can be requested at each resolution
+MAX_DAYS = {rollupResolution.hourly.value: 366, rollupResolution.daily.value: 1830, rollupResolution.monthly.value: None}
+
+
+def compute_rollups(sensor: SensorReadable, resolution: str, stationary: bool) -> list[dict]:
+    """aggregates the readings of a sensor into rollup rows
+    :param sensor: sensor with a date indexed dataframe of readings (as returned by SensorReadable.from_json_list)
+    :param resolution: H, D or M
+    :param stationary: True if the sensor is stationary
+    :return: list of rollup rows (one for each period with readings)"""
+    if sensor.df.empty:
+        return []
+
+    frequency = PANDAS_FREQUENCY[resolution]
+    readings = sensor.df.groupby(pd.Grouper(freq=frequency)).size()
+
+    averaged = SensorReadable(sensor.id, sensor.df)
+    measurement_columns = averaged.ConvertDFToAverages(ROLLUP_METHODS, frequency)
+    df = averaged.df.loc[readings.index[readings > 0]]
+
+    latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+    extent = {
+        "min_latitude": df[(latitude, "min")],
+        "max_latitude": df[(latitude, "max")],
+        "min_longitude": df[(longitude, "min")],
+        "max_longitude": df[(longitude, "max")],
+    }
+    extent = {key: column.astype(object).where(column.notna(), None).tolist() for key, column in extent.items()}
+
+    statistics = {}
+    for col in measurement_columns:
+        for method in ROLLUP_METHODS:
+            column = df[(col, method)]
+            statistics[(col, method)] = column.astype(object).where(column.notna(), None).tolist()
+
+    rows = []
+    for i, (timestamp, count, boundingBox) in enumerate(zip((df.index.asi8 // 10**9).tolist(), readings.loc[df.index].tolist(), df[("boundingBox", "first")].tolist())):
+        row = {key: values[i] for key, values in extent.items()}
+        row.update(
+            {
+                "sensor_id": int(sensor.id),
+                "resolution": resolution,
+                "timestamp": timestamp,
+                "measurement_count": count,
+                "measurement_statistics": {col: {method: statistics[(col, method)][i] for method in ROLLUP_METHODS} for col in measurement_columns},
+                "stationary": stationary,
+                "geom": boundingBox if stationary else extent_polygon(row),
+            }
+        )
+        rows.append(row)
+    return rows
+
+
+def extent_polygon(row: dict) -> str:
+    """converts the location extent of a rollup row to a WKT polygon
+    :param row: rollup row with min/max latitude and longitude
+    :return: WKT polygon, or None if there is no location data or the extent is not an area"""
+    min_lat, max_lat, min_long, max_long = row["min_latitude"], row["max_latitude"], row["min_longitude"], row["max_longitude"]
+    if None in (min_lat, max_lat, min_long, max_long) or min_lat == max_lat or min_long == max_long:
+        return None
+    return f"POLYGON(({min_long} {min_lat}, {min_long} {max_lat}, {max_long} {max_lat}, {max_long} {min_lat}, {min_long} {min_lat}))"
+
+
+def month_range(timestamp: int) -> tuple[int, int]:
+    """returns the start and end timestamp of the month of a timestamp
+    :param timestamp: UTC timestamp
+    :return: tuple of the start of the month and the start of the next month"""
+    start = dt.datetime.fromtimestamp(timestamp, tz=dt.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + dt.timedelta(days=32)).replace(day=1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def combine_rollups(rows: list, resolution: str, timestamp: int) -> dict:
+    """combines rollups into the rollup of a longer period, e.g the daily rollups of a month into the monthly rollup.
+    The mean, min, max and count of each measurement column are exact. Medians can not be combined, so the median is the
+    median of the medians of the rollups weighted by their count.
+    :param rows: rollup rows of a sensor with the columns of the SensorSummaryRollups table
+    :param resolution: resolution of the combined rollup (H, D or M)
+    :param timestamp: start of the period of the combined rollup
+    :return: rollup row"""
+    measurement_columns = list(dict.fromkeys(col for row in rows for col in row.measurement_statistics))
+    statistics = {}
+    for col in measurement_columns:
+        values = [row.measurement_statistics[col] for row in rows if col in row.measurement_statistics]
+        counted = [value for value in values if value["count"]]
+        count = sum(value["count"] for value in counted)
+        statistics[col] = {
+            "mean": sum(value["mean"] * value["count"] for value in counted) / count if count else None,
+            "min": min((value["min"] for value in counted), default=None),
+            "max": max((value["max"] for value in counted), default=None),
+            "median": weighted_median([value["median"] for value in counted], [value["count"] for value in counted]),
+            "count": count,
+        }
+
+    rollup = {
+        "min_latitude": min((row.min_latitude for row in rows if row.min_latitude is not None), default=None),
+        "max_latitude": max((row.max_latitude for row in rows if row.max_latitude is not None), default=None),
+        "min_longitude": min((row.min_longitude for row in rows if row.min_longitude is not None), default=None),
+        "max_longitude": max((row.max_longitude for row in rows if row.max_longitude is not None), default=None),
+    }
+    stationary_boxes = [row.geom for row in rows if row.stationary]
+    rollup.update(
+        {
+            "sensor_id": int(rows[0].sensor_id),
+            "resolution": resolution,
+            "timestamp": timestamp,
+            "measurement_count": sum(row.measurement_count for row in rows),
+            "measurement_statistics": statistics,
+            "stationary": len(stationary_boxes) > 0,
+            "geom": stationary_boxes[0] if stationary_boxes else extent_polygon(rollup),
+        }
+    )
+    return rollup
+
+
+def weighted_median(values: list[float], weights: list[int]) -> float:
+    """returns the weighted median of values
+    :param values: values
+    :param weights: weight of each value
+    :return: weighted median, None if there are no values"""
+    if not values:
+        return None
+    order = np.argsort(values, kind="stable")
+    cumulative = np.cumsum(np.asarray(weights, dtype=float)[order])
+    return float(np.asarray(values, dtype=float)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def refresh_sensor_rollups(sensor_id: int, timestamps: list[int]):
+    """recomputes the rollups of the days that were written for a sensor.
+    The hourly and daily rollups of those days are replaced from their sensor summaries, then the monthly rollup of each
+    affected month is combined from the month's daily rollups (see combine_rollups) so the other days are not read again.
+    :param sensor_id: sensor id
+    :param timestamps: timestamps of the sensor summaries that were written"""
+    days = sorted({timestamp - timestamp % SECONDS_IN_DAY for timestamp in timestamps})
+    if not days:
+        return
+    months = sorted({month_range(day) for day in days})
+
+    query_result = CRUD().db_get_fields_using_filter_expression(
+        filter_expressions=[
+            ModelSensorPlatformSummary.sensor_id == sensor_id,
+            or_(*[and_(ModelSensorPlatformSummary.timestamp >= day, ModelSensorPlatformSummary.timestamp < day + SECONDS_IN_DAY) for day in days]),
+        ],
+        fields=[ModelSensorPlatformSummary.measurement_data, ModelSensorPlatformSummary.measurement_blob, ModelSensorPlatformSummary.geom, ModelSensorPlatformSummary.stationary],
+    )
+    values = [
+        {"json_": row.measurement_data, "blob": row.measurement_blob, "boundingBox": convertWKBtoWKT(row.geom) if row.stationary else None}
+        for row in query_result
+        if row.measurement_data is not None or row.measurement_blob is not None
+    ]
+    stationary = any(row.stationary for row in query_result)
+    written_days = SensorReadable.from_json_list(sensor_id, values) if values else SensorReadable(sensor_id, pd.DataFrame(index=pd.DatetimeIndex([])))
+    day_ranges = or_(*[and_(ModelSensorSummaryRollup.timestamp >= day, ModelSensorSummaryRollup.timestamp < day + SECONDS_IN_DAY) for day in days])
+
+    for resolution in [rollupResolution.hourly.value, rollupResolution.daily.value]:
+        CRUD().db_replace(
+            ModelSensorSummaryRollup,
+            [ModelSensorSummaryRollup.sensor_id == sensor_id, ModelSensorSummaryRollup.resolution == resolution, day_ranges],
+            compute_rollups(written_days, resolution, stationary),
+        )
+
+    for month_start, month_end in months:
+        daily_rollups = CRUD().db_get_fields_using_filter_expression(
+            filter_expressions=[
+                ModelSensorSummaryRollup.sensor_id == sensor_id,
+                ModelSensorSummaryRollup.resolution == rollupResolution.daily.value,
+                ModelSensorSummaryRollup.timestamp >= month_start,
+                ModelSensorSummaryRollup.timestamp < month_end,
+            ],
+            fields=[column for column in ModelSensorSummaryRollup.__table__.columns if column.name != "time_updated"],
+        )
+        CRUD().db_replace(
+            ModelSensorSummaryRollup,
+            [ModelSensorSummaryRollup.sensor_id == sensor_id, ModelSensorSummaryRollup.resolution == rollupResolution.monthly.value, ModelSensorSummaryRollup.timestamp == month_start],
+            [combine_rollups(daily_rollups, rollupResolution.monthly.value, month_start)] if daily_rollups else [],
+        )
+
+
+def rollup_filters(resolution: str, timestampStart: int, timestampEnd: int, filter_expressions: list = None) -> list:
+    """builds the filter expressions of the rollups of a resolution between two timestamps
+    :param resolution: H, D or M
+    :param timestampStart: start timestamp (inclusive)
+    :param timestampEnd: end timestamp (inclusive)
+    :param filter_expressions: additional filter expressions (e.g sensor ids and spatial filters)
+    :return: list of filter expressions"""
+    if resolution == rollupResolution.monthly.value:
+        # include the month that the start date falls in
+        timestampStart = month_range(timestampStart)[0]
+
+    return [
+        ModelSensorSummaryRollup.resolution == resolution,
+        ModelSensorSummaryRollup.timestamp >= timestampStart,
+        ModelSensorSummaryRollup.timestamp <= timestampEnd,
+    ] + (filter_expressions or [])
+
+
+def get_rollups(resolution: str, timestampStart: int, timestampEnd: int, filter_expressions: list = None) -> list:
+    """reads the rollups of a resolution between two timestamps
+    :param resolution: H, D or M
+    :param timestampStart: start timestamp (inclusive)
+    :param timestampEnd: end timestamp (inclusive)
+    :param filter_expressions: additional filter expressions (e.g sensor ids and spatial filters)
+    :return: rollup rows with the sensor type name, ordered by sensor and timestamp"""
+    fields = [column for column in ModelSensorSummaryRollup.__table__.columns if column.name != "time_updated"]
+    fields.append(getattr(ModelSensorPlatformTypePlatform, "name").label("type_name"))
+
+    filter_expressions = rollup_filters(resolution, timestampStart, timestampEnd, filter_expressions)
+    query_result = CRUD().db_get_fields_using_filter_expression(filter_expressions, fields, ModelSensorSummaryRollup, [ModelSensorPlatform, ModelSensorPlatformTypePlatform])
+    return sorted(query_result, key=lambda row: (row.sensor_id, row.timestamp))
+
+
+def format_rollup_row(row: any, averaging_methods: list[str] = None, columns: list[str] = None) -> dict:
+    """formats a rollup row for the json response
+    :param row: rollup row
+    :param averaging_methods: statistics to include (default is all)
+    :param columns: measurement columns to include (default is all)
+    :return: formatted row"""
+    row_as_dict = dict(row._mapping)
+    row_as_dict["geom"] = convertWKBtoWKT(row_as_dict["geom"])
+    row_as_dict["timestamp_UTC"] = row_as_dict.pop("timestamp")
+    row_as_dict["measurement_statistics"] = {
+        col: {method: value for method, value in statistics.items() if not averaging_methods or method in averaging_methods}
+        for col, statistics in row_as_dict["measurement_statistics"].items()
+        if not columns or col in columns
+    }
+    return row_as_dict
+
+
+def rollups_to_geojson(rows: list, averaging_methods: list[str], resolution: str) -> list[GeoJsonExport]:
+    """converts rollup rows to a geojson for each sensor, in the same format as SensorReadable.to_geojson
+    :param rows: rollup rows ordered by sensor (see get_rollups)
+    :param averaging_methods: statistics to include as properties
+    :param resolution: H, D or M
+    :return: list of geojsons"""
+    latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+
+    sensors = {}
+    for row in rows:
+        sensors.setdefault(row.sensor_id, []).append(row)
+
+    geojsons = []
+    for sensor_id, sensor_rows in sensors.items():
+        measurement_columns = list(dict.fromkeys(col for row in sensor_rows for col in row.measurement_statistics))
+        frame = {
+            (latitude, "min"): [row.min_latitude for row in sensor_rows],
+            (latitude, "max"): [row.max_latitude for row in sensor_rows],
+            (longitude, "min"): [row.min_longitude for row in sensor_rows],
+            (longitude, "max"): [row.max_longitude for row in sensor_rows],
+            ("boundingBox", "first"): [convertWKBtoWKT(row.geom) if row.stationary else None for row in sensor_rows],
+        }
+        for col in measurement_columns:
+            for method in averaging_methods:
+                frame[(col, method)] = [row.measurement_statistics.get(col, {}).get(method) for row in sensor_rows]
+
+        index = pd.to_datetime([row.timestamp for row in sensor_rows], unit="s")
+        if resolution == rollupResolution.monthly.value:
+            # the raw export labels monthly averages with the end of the month
+            index = index + pd.offsets.MonthEnd(0)
+
+        df = pd.DataFrame(frame, index=index)
+        for column in df.columns:
+            if column[0] != "boundingBox":
+                df[column] = pd.to_numeric(df[column], errors="coerce")
+
+        geojson = SensorReadable(sensor_id, df).averages_to_geojson(measurement_columns, averaging_methods)
+        geojsons.append(GeoJsonExport(sensorid=sensor_id, sensorType=sensor_rows[0].type_name, geojson=geojson))
+
+    return geojsons
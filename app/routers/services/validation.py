@@ -43,3 +43,21 @@ def validate_json_file_size(file_size: int) -> None:
             return False
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Invalid FILESIZE_LIMIT in .env: {e}")
+
+
+def estimate_query_result_size(query_result: list) -> int:
+    """estimates the size in bytes of a query result from the length of its values.
+    sys.getsizeof only measures the list object itself and not the rows it holds.
+    Args:
+        query_result (list): The rows returned by the query.
+    Returns:
+        int: The estimated size of the rows in bytes.
+    """
+    size = 0
+    for row in query_result:
+        for value in row:
+            if isinstance(value, (str, bytes, bytearray)):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size
@@ -0,0 +1,121 @@
+"""Local on-disk cache of immutable vendor archive files (e.g the daily Sensor.Community csv archives).
+
+Files are content addressed: the body of a download is stored once under the sha256 of its content in ``objects/``
+and ``index/`` maps the sha256 of each url to the content hash, so identical files are only stored once.
+The total size of the objects is kept under a budget by evicting the least recently used objects after each write. The
+files that are still to be read can be kept from eviction, so the cache can go over its budget until they are read.
+
+The settings are read from the environment:
+    ARCHIVE_CACHE_DIR: directory of the cache (default: sensor_archive_cache in the temp directory)
+    ARCHIVE_CACHE_MAX_MB: size budget of the cache in MB, 0 disables it (default 512)
+"""
+
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+from os import environ as env
+
+
+class ArchiveCache:
+    """Content addressed file cache with a size budget and least recently used eviction"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """Initialises the cache
+        :param directory: directory of the cache, it is created if it does not exist
+        :param max_bytes: size budget of the cached files in bytes"""
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.objects = self.directory / "objects"
+        self.index = self.directory / "index"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_env() -> "ArchiveCache":
+        """creates the cache configured by the environment
+        :return: cache or None if the cache is disabled"""
+        max_bytes = int(float(env.get("ARCHIVE_CACHE_MAX_MB", 512)) * 1024 * 1024)
+        if max_bytes <= 0:
+            return None
+        return ArchiveCache(env.get("ARCHIVE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sensor_archive_cache")), max_bytes)
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, url: str, keep: set = None) -> pathlib.Path:
+        """looks up the cached file of a url and marks it as recently used
+        :param url: url of the file
+        :param keep: set of paths that must not be evicted, the path of the cached file is added to it
+        :return: path of the cached file or None if the url is not cached"""
+        index_path = self.index / self._hash(url.encode())
+        try:
+            path = self.objects / index_path.read_text()
+        except FileNotFoundError:
+            return None
+        # the file is kept under the lock, so it can not be evicted between the lookup and being kept
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # the file was evicted
+                index_path.unlink(missing_ok=True)
+                return None
+            if keep is not None:
+                keep.add(path)
+        return path
+
+    def put(self, url: str, content: bytes, keep: set = None) -> pathlib.Path:
+        """stores the content of a url, then evicts the least recently used files if the cache is over its budget
+        :param url: url of the file
+        :param content: body of the file
+        :param keep: set of paths that must not be evicted, the path of the cached file is added to it
+        :return: path of the cached file"""
+        content_hash = self._hash(content)
+        path = self.objects / content_hash
+        keep = set() if keep is None else keep
+        with self._lock:
+            keep.add(path)
+        # files are written under a temporary name and renamed, so a reader never sees a partially written file
+        self._atomic_write(path, content)
+        self._atomic_write(self.index / self._hash(url.encode()), content_hash.encode())
+        self.evict(keep=keep)
+        return path
+
+    def _atomic_write(self, path: pathlib.Path, content: bytes):
+        """writes a file and renames it into place
+        :param path: path of the file
+        :param content: content of the file"""
+        (handle, tmp_path) = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            pathlib.Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    def evict(self, keep: set = frozenset()):
+        """removes the least recently used files until the cache is within its budget. Index entries of removed files are dropped on lookup
+        :param keep: paths of the files that must not be removed (e.g the files that are still to be read)"""
+        with self._lock:
+            files = []
+            for path in self.objects.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if not path.name.startswith(".tmp-"):
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files, key=lambda file: file[0]):
+                if total <= self.max_bytes:
+                    break
+                if path in keep:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
@@ -1,11 +1,13 @@
 # data fetching dependacies
 import datetime as dt
 import json
-from typing import Iterator
+from typing import BinaryIO, Iterator
 
 import requests
 from sensor_api_wrappers.concrete.products.airGradient_sensor import AirGradientSensor
+from sensor_api_wrappers.http_client import vendor_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
+from sensor_api_wrappers.upload_stream import spool_csv_by_day
 
 # lookup_id = 163763
 # sensor_id = 2020:airgradient
@@ -46,7 +48,7 @@ class AirGradientFactory(SensorFactory):
 
         for sensor_id in sensor_dict.keys():
             try:
-                response = requests.get(
+                response = vendor_session().get(
                     f"https://api.airgradient.com/public/api/v1/locations/{sensor_id}/measures/raw?token={self.api_key}&from={start_str}&to={end_str}",
                     headers={"Content-Type": "application/json"},
                 )
@@ -98,6 +100,23 @@ class AirGradientFactory(SensorFactory):
             except Exception as e:
                 yield AirGradientSensor(sensor_id, dataframe=None, error=str(e))
 
+    def get_sensors_from_file_stream(self, sensor_dict: dict[str, str], file: BinaryIO) -> Iterator[AirGradientSensor]:
+        """Fetches data from a large csv file, which is parsed in chunks (see spool_csv_by_day), and returns built AirGradient sensor objects.
+        Args:
+            sensor_dict (dict[str, str]): A dictionary of sensor ids.
+            file (BinaryIO): The csv file containing sensor data.
+
+        Yields:
+            AirGradientSensor: AirGradientSensor objects with one day of data of each sensor.
+        """
+        try:
+            for df in spool_csv_by_day(file, AirGradientSensor.prepare_csv_measurements):
+                for sensor_id in sensor_dict.keys():
+                    yield AirGradientSensor(sensor_id, dataframe=df.copy(), error=None)
+        except Exception as e:
+            for sensor_id in sensor_dict.keys():
+                yield AirGradientSensor(sensor_id, dataframe=None, error=str(e))
+
 
 # if __name__ == "__main__":
 #     import os
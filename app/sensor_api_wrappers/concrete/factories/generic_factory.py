@@ -19,6 +19,7 @@ from typing import Iterator
 
 import requests
 from sensor_api_wrappers.concrete.products.generic_sensor import GenericSensor
+from sensor_api_wrappers.http_client import create_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
 
 
@@ -42,7 +43,7 @@ class GenericFactory(SensorFactory):
         # self.auth_url = auth_url
         # self.auth_url_params = kwargs.get("auth_url_params", {})
         # self.api_url_params = kwargs.get("api_url_params", {})
-        self.__session = requests.Session()  # to be used for all requests to maintain session state
+        self.__session = create_session()  # to be used for all requests to maintain session state
 
     def login(self) -> str:
         """Logs into the API and retrieves an authentication token or session if no api_key is provided"""
@@ -3,14 +3,29 @@ import datetime as dt
 import io
 import json
 import pathlib
+import tempfile
 import time as t
 import zipfile
-from typing import Iterator, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Tuple
 
 import requests
 from core.exception_utils import APITimeoutException
 from sensor_api_wrappers.concrete.products.plume_sensor import PlumeSensor
+from sensor_api_wrappers.http_client import create_session, vendor_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
+from sensor_api_wrappers.upload_stream import readable_file
+
+# number of measurement windows of a sensor that are requested at the same time
+PLUME_WINDOW_CONCURRENCY = 4
+# the measures endpoint returns up to 2000 measurements (about 2 days of data) per request
+PLUME_WINDOW_SIZE = 2000
+# first and largest delay in seconds between two polls of an export task
+EXPORT_POLL_INITIAL_DELAY = 0.5
+EXPORT_POLL_MAX_DELAY = 8
+# zip files larger than this (in bytes) are spooled to disk while they are downloaded
+ZIP_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+ZIP_CHUNK_SIZE = 1024 * 1024
 
 
 class PlumeFactory(SensorFactory):
@@ -40,8 +55,9 @@ class PlumeFactory(SensorFactory):
         :return: Logged in session
         """
         if self.__session is None:
-            session = requests.Session()
-            res = requests.post(
+            # the session keeps the bearer token, the measurement windows share it so keep a pooled connection for each of them
+            session = create_session(pool_maxsize=PLUME_WINDOW_CONCURRENCY)
+            res = vendor_session().post(
                 f"https://www.googleapis.com/identitytoolkit/v3/relyingparty/verifyPassword?" f"key={self.API_KEY}",
                 data={"email": self.email, "password": self.password, "returnSecureToken": True},
                 headers={"referer": "https://dashboard-flow.plumelabs.com/"},
@@ -190,35 +206,35 @@ class PlumeFactory(SensorFactory):
     ##measurement data - json export
     def get_sensor_measurement_data(self, sensorId: str, start: dt.datetime, end: dt.datetime) -> List:
         """Downloads the sensor data from the Plume API and converts to List of JSON measurements.
+        The date range is paged with an offset for every 2 days of data, the pages are requested concurrently over the logged in session.
         :param sensorId: sensor lookup id
         :param start: start time of the data
         :param end: end time of the data
-        :return: list of JSON measurement objects"""
+        :return: list of JSON measurement objects (one list for each page, in order)"""
 
         difference = end - start
-        dataList = []
-        offset = 0
-        for i in range(difference.days + 1):
-            # apply offset for every 2 days of data
-            if (i - 1) % 2 == 0:
-                # don't apply offset for first iteration
-                if i > 1:
-                    offset += 2000
-                res = self.__session.get(
-                    "https://api-preprod.plumelabs.com/2.0/user/organizations/{org}/sensors/{sensorId}/measures?start_date={start}&end_date={end}&offset={offset}".format(
-                        org=self.org,
-                        sensorId=sensorId,
-                        start=int(start.timestamp()),
-                        end=int(end.timestamp()),
-                        offset=offset,
-                    )
-                )
-                dataList.append(res.json()["measures"])
+        offsets = [window * PLUME_WINDOW_SIZE for window in range((difference.days + 1) // 2)]
 
-        if len(dataList) <= 0:
+        if len(offsets) <= 0:
             raise Exception("No data found for sensor: " + sensorId)
 
-        return dataList
+        def get_window(offset: int) -> list:
+            res = self.__session.get(
+                "https://api-preprod.plumelabs.com/2.0/user/organizations/{org}/sensors/{sensorId}/measures?start_date={start}&end_date={end}&offset={offset}".format(
+                    org=self.org,
+                    sensorId=sensorId,
+                    start=int(start.timestamp()),
+                    end=int(end.timestamp()),
+                    offset=offset,
+                )
+            )
+            return res.json()["measures"]
+
+        if len(offsets) == 1:
+            return [get_window(offsets[0])]
+
+        with ThreadPoolExecutor(max_workers=min(PLUME_WINDOW_CONCURRENCY, len(offsets)), thread_name_prefix="plume-window") as executor:
+            return list(executor.map(get_window, offsets))
 
     ##Location data - csv export
     def get_sensor_location_data(self, sensors: list[str], start: dt.datetime, end: dt.datetime, link: str) -> List[PlumeSensor]:
@@ -245,7 +261,7 @@ class PlumeFactory(SensorFactory):
         :param start: start time of the data
         :param end: end time of the data
         :param include_measurements: boolean to include measurements in the zip file
-        :param timeout: timeout for the request"""
+        :param timeout: number of seconds to wait for the export task to finish, it is polled with an exponential backoff"""
         task_id = self.__session.post(
             f"https://api-preprod.plumelabs.com/2.0/user/organizations/" f"{self.org}/sensors/export",
             json={
@@ -263,27 +279,51 @@ class PlumeFactory(SensorFactory):
                 "merged": include_measurements,
             },
         ).json()["id"]
-        for _ in range(timeout):
+        deadline = t.monotonic() + timeout
+        delay = EXPORT_POLL_INITIAL_DELAY
+        while True:
             # wait for Plume API to create zip
             link = self.__session.get(f"https://api-preprod.plumelabs.com/2.0/user/export-tasks/{task_id}").json()["link"]
             if link:
-                break
-            t.sleep(1)
-        else:
-            raise APITimeoutException("Plume API timed out when attempting to retrieve zip file link")
-        return link
+                return link
+            remaining = deadline - t.monotonic()
+            if remaining <= 0:
+                raise APITimeoutException("Plume API timed out when attempting to retrieve zip file link")
+            t.sleep(min(delay, remaining))
+            delay = min(delay * 2, EXPORT_POLL_MAX_DELAY)
 
     def extract_zip_from_link(self, link: str, include_measurements: bool):
-        """Download and extract zip into memory using link URL.
+        """Download and extract zip using link URL.
+        The body is streamed into a temporary file that only spills to disk for large exports, so the whole archive is never held in memory.
         :param link: url to sensor data zip file
         :param include_measurements: boolean to include measurements in the zip file
         :return: list of tuples containing sensor id and buffer"""
 
-        res = requests.get(link, stream=True)
-        if not res.ok:
-            raise IOError(f"Failed to download zip file from link: {link}")
-        zip_ = zipfile.ZipFile(io.BytesIO(res.content))
-        return PlumeFactory.extract_zip_content(zip_, include_measurements)
+        # the link is pre-signed so it is downloaded without the bearer token of the logged in session
+        archive = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_SIZE)
+        try:
+            res = vendor_session().get(link, stream=True)
+            with res:
+                if not res.ok:
+                    raise IOError(f"Failed to download zip file from link: {link}")
+                for chunk in res.iter_content(chunk_size=ZIP_CHUNK_SIZE):
+                    archive.write(chunk)
+        except Exception:
+            archive.close()
+            raise
+
+        archive.seek(0)
+        return PlumeFactory.extract_zip_archive(archive, include_measurements)
+
+    @staticmethod
+    def extract_zip_archive(archive: BinaryIO, include_measurements: bool) -> Iterator[Tuple[str, io.StringIO]]:
+        """Extract a downloaded zip file, the file is closed once all the sensors have been extracted.
+        :param archive: zip file
+        :param include_measurements: boolean to include measurements in the zip file
+        :return: sensor id, sensor data in a string buffer"""
+        # zipfile needs a seekable file, which SpooledTemporaryFile only is from python 3.11
+        with archive, zipfile.ZipFile(readable_file(archive)) as zip_:
+            yield from PlumeFactory.extract_zip_content(zip_, include_measurements)
 
     @staticmethod
     def extract_zip_content(zip_: zipfile.ZipFile, include_measurements: bool) -> Iterator[Tuple[str, io.StringIO]]:
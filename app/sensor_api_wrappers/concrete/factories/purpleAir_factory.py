@@ -3,15 +3,21 @@ import datetime as dt
 import io
 import json
 import pathlib
-import time as t
 import zipfile
+from collections import deque
 from io import StringIO
-from typing import Iterator, List, Tuple
+from typing import BinaryIO, Iterator, List, Tuple
 
-import requests
 from core.exception_utils import APITimeoutException
 from sensor_api_wrappers.concrete.products.purpleAir_sensor import PurpleAirSensor
+from sensor_api_wrappers.http_client import vendor_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
+from sensor_api_wrappers.rate_limiter import parse_retry_after, vendor_rate_limiter
+from sensor_api_wrappers.upload_stream import spool_csv_by_day
+
+# seconds PurpleAir is held when it is still loading data ("try again in 10 seconds") and the number of attempts of a sensor
+DATA_INITIALIZING_RETRY_SECONDS = 10
+DATA_INITIALIZING_ATTEMPTS = 3
 
 
 class PurpleAirFactory(SensorFactory):
@@ -28,7 +34,6 @@ class PurpleAirFactory(SensorFactory):
         self.token_url = token_url
         self.referer_url = referer_url
         self.api_key = api_key
-        self.retry_count = 0
 
     def login(self) -> str:
         """Fetch the API token from the provided URL.
@@ -36,7 +41,7 @@ class PurpleAirFactory(SensorFactory):
         if self.token_url is None:
             raise ValueError("Token URL must be provided to login.")
 
-        response = requests.get("https://map.purpleair.com/v1/token", headers={"referer": "https://map.purpleair.com"}, timeout=30)  # wait up to 30 seconds for the API to respond
+        response = vendor_session().get("https://map.purpleair.com/v1/token", headers={"referer": "https://map.purpleair.com"}, timeout=30)  # wait up to 30 seconds for the API to respond
         response.raise_for_status()  # raise an error if the request failed
         if response.status_code != 200:
             if self.api_key is None:
@@ -58,10 +63,13 @@ class PurpleAirFactory(SensorFactory):
         Yields:
             PlumeSensor: An instance of PlumeSensor for each sensor in the sensor_dict.
         """
-        lookupids = list(sensor_dict.keys())
+        # a sensor whose data is still loading is moved behind the other pending sensors
+        pending = deque(sensor_dict.keys())
+        attempts = {}
         startDate = None  # default start date
 
-        for sensor_lookupid in lookupids:
+        while pending:
+            sensor_lookupid = pending.popleft()
             # if the sensor has a time_updated field then use that as the start date
             if "time_updated" in sensor_dict[sensor_lookupid] and sensor_dict[sensor_lookupid]["time_updated"] is not None:
                 startDate = sensor_dict[sensor_lookupid]["time_updated"]
@@ -109,7 +117,7 @@ class PurpleAirFactory(SensorFactory):
                     "referer": self.referer_url,  # referer is required by the API
                     "x-api-token": self.api_key,  # Use the token retrieved earlier
                 }
-                res = requests.get(
+                res = vendor_session().get(
                     url=url,
                     timeout=30,  # wait up to 30 seconds for the API to respond
                     headers=headers,
@@ -117,16 +125,16 @@ class PurpleAirFactory(SensorFactory):
                 # wait for the API to respond
                 if res.status_code != 200:
                     if res.json()["error"] == "DataInitializingError":
-                        # if the API is still loading data then wait for 15 seconds and try again
-                        self.retry_count += 1
-                        if self.retry_count < 3:
-                            t.sleep(10)
-                            return self.get_sensors(sensor_dict, start, end)
+                        # if the API is still loading data then PurpleAir is held for every fetch job (the other vendors carry on) and the sensor is tried again later
+                        attempts[sensor_lookupid] = attempts.get(sensor_lookupid, 0) + 1
+                        if attempts[sensor_lookupid] < DATA_INITIALIZING_ATTEMPTS:
+                            retry_after = parse_retry_after(res.headers.get("Retry-After"))
+                            vendor_rate_limiter("purpleair").hold(DATA_INITIALIZING_RETRY_SECONDS if retry_after is None else retry_after)
+                            pending.append(sensor_lookupid)
+                            continue
                         else:
                             raise APITimeoutException(res.text)
                 else:
-                    # pop the sensor from the sensor_dict to avoid fetching it again
-                    sensor_dict.pop(sensor_lookupid, None)
                     yield PurpleAirSensor.from_csv(sensor_lookupid, res.text)
             # if the sensor has no data for the given time period then return an empty sensor
             except Exception as e:
@@ -153,6 +161,24 @@ class PurpleAirFactory(SensorFactory):
                 # if the sensor has no data for the given time period then return an empty sensor
                 yield PurpleAirSensor(sensor_lookupid, dataframe=None, error=str(e))
 
+    def get_sensors_from_file_stream(self, sensor_dict: dict[str, str], file: BinaryIO) -> Iterator[PurpleAirSensor]:
+        """Factory method for creating PurpleAir sensor objects from a large csv file, the file is parsed in chunks (see spool_csv_by_day).
+
+        Args:
+            sensor_dict (dict[str, str]): A dictionary where keys are sensor lookup IDs and values are stationary boxes.
+            file (BinaryIO): The file containing sensor data in CSV format.
+
+        Yields:
+            PurpleAirSensor: An instance of PurpleAirSensor for each day of data of each sensor in the sensor_dict.
+        """
+        try:
+            for df in spool_csv_by_day(file, lambda chunk: PurpleAirSensor.prepare_measurements(chunk, drop_empty_columns=False)):
+                for sensor_lookupid in sensor_dict.keys():
+                    yield PurpleAirSensor(sensor_lookupid, dataframe=df.copy(), error=None)
+        except Exception as e:
+            for sensor_lookupid in sensor_dict.keys():
+                yield PurpleAirSensor(sensor_lookupid, dataframe=None, error=str(e))
+
 
 # if __name__ == "__main__":
 #     from os import environ as env
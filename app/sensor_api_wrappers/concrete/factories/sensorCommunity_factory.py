@@ -1,11 +1,18 @@
 # data fetching dependacies
 import datetime as dt
-from typing import Iterator
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Union
 
 import requests
+from sensor_api_wrappers.archive_cache import ArchiveCache
 from sensor_api_wrappers.concrete.products.sensorCommunity_sensor import SensorCommunitySensor
+from sensor_api_wrappers.http_client import vendor_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
 
+# number of archive files downloaded at the same time
+ARCHIVE_CONCURRENCY = 8
+
 
 class SensorCommunityFactory(SensorFactory):
     def __init__(self, username: str, password: str):
@@ -15,57 +22,69 @@ class SensorCommunityFactory(SensorFactory):
         """
         self.username = username
         self.password = password
+        self.archive_cache = ArchiveCache.from_env()
 
     def login(self) -> requests.Session:
         """Logs into the SensorCommunity API and returns a session object"""
         pass
 
     def ExtractDataFromCsv(self, start: dt.datetime, end: dt.datetime, sensor_platform: dict[str, str]) -> dict[str, any]:
-        """Extract data from sensorCommunity archives from a start-end daterange for each sensors in sensor_platforms
+        """Extract data from sensorCommunity archives from a start-end daterange for each sensors in sensor_platforms.
+        The days of every sensor are downloaded concurrently. Archive days never change once published, so past days are kept in the local archive cache
+        and only downloaded once. The returned files are kept from eviction by the downloads of the same call, even when there are more days than the
+        cache budget
 
         :param start: the start date for extracting date
         :param end: the end date for extracting data (Can not be today's date)
         :param sensor_platform: a dicitonary of sensor id and sensor types (key-value)
-        :return: dictionary of sensor measurements
+        :return: dictionary of sensor measurements, each day is the path of the cached csv file (or its content if the cache is disabled)
         """
 
         difference = end - start
+        jobs = [(id_, start + dt.timedelta(days=i)) for id_ in sensor_platform for i in range(difference.days + 1)]
+        # cached files that are returned, they are read after every day is downloaded
+        keep = set()
 
-        measurement_dictionary = {}
-
-        for id_ in sensor_platform:
-            measurements = {}
-            sensortype = sensor_platform[id_].lower()
-
-            for i in range(difference.days + 1):
-                day = start + dt.timedelta(days=i)
-                timestamp = int(day.replace(tzinfo=dt.timezone.utc).timestamp())
-                day = day.strftime("%Y-%m-%d")
-
-                try:
-                    url = f"https://archive.sensor.community/{day}/{day}_{sensortype}_sensor_{id_}.csv"
-                    res = requests.get(url, stream=True)
+        with ThreadPoolExecutor(max_workers=ARCHIVE_CONCURRENCY, thread_name_prefix="sensorcommunity-archive") as executor:
+            files = list(executor.map(lambda job: self.get_archive_csv(job[0], sensor_platform[job[0]].lower(), job[1], keep), jobs))
 
-                    if res.ok:
-                        measurements[timestamp] = res.content
+        measurement_dictionary = {int(id_): {} for id_ in sensor_platform}
+        for (id_, day), file in zip(jobs, files):
+            if file is not None:
+                measurement_dictionary[int(id_)][int(day.replace(tzinfo=dt.timezone.utc).timestamp())] = file
 
-                    else:
-                        url = f"https://archive.sensor.community/{day}/_{sensortype}_sensor_{id_}_indoor.csv"
-                        res = requests.get(url, stream=True)
-
-                        if res.ok:
-                            measurements[timestamp] = res.content
+        return measurement_dictionary
 
-                        else:
-                            print(f"🛑: No sensor data available for sensor {id_}, ({sensortype}) on the day: {day} ")
-                            continue
+    def get_archive_csv(self, id_: str, sensortype: str, day: dt.datetime, keep: set = None) -> Union[pathlib.Path, bytes]:
+        """Gets the archive csv of a sensor for one day, from the local archive cache if it was downloaded before
+        :param id_: sensor id
+        :param sensortype: sensor type in lower case
+        :param day: day of the data
+        :param keep: set of cached files that must not be evicted, the returned file is added to it
+        :return: path of the cached csv file, the csv content if the cache is disabled or None if there is no data for the day"""
+        day_str = day.strftime("%Y-%m-%d")
+        urls = [f"https://archive.sensor.community/{day_str}/{day_str}_{sensortype}_sensor_{id_}.csv", f"https://archive.sensor.community/{day_str}/_{sensortype}_sensor_{id_}_indoor.csv"]
+
+        if self.archive_cache is not None:
+            for url in urls:
+                path = self.archive_cache.get(url, keep)
+                if path is not None:
+                    return path
 
-                except requests.exceptions.ConnectionError:
-                    raise (ConnectionError)
+        try:
+            for url in urls:
+                res = vendor_session().get(url, stream=True)
+                if res.ok:
+                    # only days that have ended are published, so they are immutable and can be cached
+                    if self.archive_cache is not None and day.date() < dt.datetime.now(dt.timezone.utc).date():
+                        return self.archive_cache.put(url, res.content, keep)
+                    return res.content
 
-            measurement_dictionary[int(id_)] = measurements
+        except requests.exceptions.ConnectionError:
+            raise (ConnectionError)
 
-        return measurement_dictionary
+        print(f"🛑: No sensor data available for sensor {id_}, ({sensortype}) on the day: {day_str} ")
+        return None
 
     def get_columns_from_db(self) -> dict[str, str]:
         """
@@ -76,7 +95,7 @@ class SensorCommunityFactory(SensorFactory):
         try:
             payload = {"db": "feinstaub", "q": 'SHOW FIELD KEYS FROM "autogen"."feinstaub" ', "epoch": "ms"}
 
-            r = requests.get("https://api-rrd.madavi.de:3000/grafana/api/datasources/proxy/uid/hoUeJn4Gz/query", params=payload)
+            r = vendor_session().get("https://api-rrd.madavi.de:3000/grafana/api/datasources/proxy/uid/hoUeJn4Gz/query", params=payload)
 
             # convert to json
             r = r.json()
@@ -156,7 +175,7 @@ class SensorCommunityFactory(SensorFactory):
                     "q": f'SELECT {sensor_columns} FROM "autogen"."feinstaub" WHERE ("node" =~ /{"|".join(node_ids)}/) AND time >= \'{startDate}\' AND time <= \'{endDate}\'',
                     "epoch": "ms",
                 }
-                res = requests.get("https://api-rrd.madavi.de:3000/grafana/api/datasources/proxy/uid/hoUeJn4Gz/query", params=payload)
+                res = vendor_session().get("https://api-rrd.madavi.de:3000/grafana/api/datasources/proxy/uid/hoUeJn4Gz/query", params=payload)
                 yield SensorCommunitySensor.from_json(key, res.json())
 
             except Exception:
@@ -3,8 +3,8 @@ import datetime as dt
 import json
 from typing import Iterator
 
-import requests
 from sensor_api_wrappers.concrete.products.zephyr_sensor import ZephyrSensor
+from sensor_api_wrappers.http_client import vendor_session
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
 
 
@@ -25,7 +25,7 @@ class ZephyrFactory(SensorFactory):
     def fetch_lookup_ids(self) -> Iterator[str]:
         """Fetches sensor ids from Earth sense API"""
         try:
-            json_ = requests.get(f"https://data.earthsense.co.uk/zephyrsForUser/{self.username}/{self.password}").json()["usersZephyrs"]
+            json_ = vendor_session().get(f"https://data.earthsense.co.uk/zephyrsForUser/{self.username}/{self.password}").json()["usersZephyrs"]
         except json.JSONDecodeError:
             return []
         for key in json_:
@@ -51,7 +51,7 @@ class ZephyrFactory(SensorFactory):
                 startDate = start
             # then try to fetch the data for the given time period
             try:
-                res = requests.get(
+                res = vendor_session().get(
                     f"https://data.earthsense.co.uk/measurementdata/v1/{sensor_lookupid}/{startDate.strftime('%Y%m%d%H%M')}/{end.strftime('%Y%m%d%H%M')}/{slot}/{averaging_id}",
                     headers={"username": self.username, "userkey": self.password},
                 )
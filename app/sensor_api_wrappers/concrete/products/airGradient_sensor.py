@@ -96,8 +96,17 @@ class AirGradientSensor(SensorProduct, SensorWritable):
         Returns:
             AirGradientSensor: An AirGradientSensor object with the data loaded into a DataFrame.
         """
-        df = pd.read_csv(StringIO(csv_data))
+        return AirGradientSensor(sensor_id, dataframe=AirGradientSensor.prepare_csv_measurements(pd.read_csv(StringIO(csv_data))), error=None)
 
+    @staticmethod
+    def prepare_csv_measurements(df: pd.DataFrame) -> pd.DataFrame:
+        """Renames the columns of csv data to match other sensor platform types and adds the timestamp and location columns.
+        Rows are prepared independently so this can be applied to chunks of a csv file.
+        Args:
+            df (pd.DataFrame): csv data.
+        Returns:
+            pd.DataFrame: The prepared measurement dataframe.
+        """
         df.rename(
             columns={
                 "PM1 (μg/m³)": SensorMeasurementsColumns.PM1_RAW.value,
@@ -133,7 +142,7 @@ class AirGradientSensor(SensorProduct, SensorWritable):
         df[SensorMeasurementsColumns.LATITUDE.value] = np.nan
         df[SensorMeasurementsColumns.LONGITUDE.value] = np.nan
 
-        return AirGradientSensor(sensor_id, dataframe=df, error=None)
+        return df
 
 
 # 'particulatePM1Raw', 'particulatePM2.5Raw', 'particulatePM10Raw', 'ambTempC' are not being found in the final df
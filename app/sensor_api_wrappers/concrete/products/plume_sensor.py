@@ -2,7 +2,7 @@
 # csv data fetch
 import csv
 import io
-from typing import Any, List
+from typing import Any, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -10,6 +10,17 @@ from routers.services.enums import SensorMeasurementsColumns
 from sensor_api_wrappers.data_transfer_object.sensor_writeable import SensorWritable
 from sensor_api_wrappers.interfaces.sensor_product import SensorProduct
 
+# a measurement takes the nearest location at most this many seconds away (the measurements are a minute apart)
+PLUME_LOCATION_TOLERANCE = 60
+# measurement columns of the Plume API JSON and the column names they are renamed to
+PLUME_MEASUREMENT_COLUMNS = {
+    "no2": SensorMeasurementsColumns.NO2.value,
+    "voc": SensorMeasurementsColumns.VOC.value,
+    "pm1": SensorMeasurementsColumns.PM1.value,
+    "pm10": SensorMeasurementsColumns.PM10.value,
+    "pm25": SensorMeasurementsColumns.PM2_5.value,
+}
+
 
 class PlumeSensor(SensorProduct, SensorWritable):
     """Plume Sensor Product object designed to wrap the csv/json files returned by the Plume API.
@@ -38,52 +49,99 @@ class PlumeSensor(SensorProduct, SensorWritable):
         ]
 
     def join_dataframes(self, mdf: pd.DataFrame):
-        """Combines the measurement dataframe with the existing dataframe.
+        """Combines the measurement dataframe with the existing dataframe (see align_measurements).
         :param mdf: The measurement dataframe."""
+        timestamp, latitude, longitude = SensorMeasurementsColumns.TIMESTAMP.value, SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+        times = mdf[timestamp].to_numpy(dtype=np.int64)
+        order = np.argsort(times, kind="stable")
+
+        columns = mdf.columns.drop([timestamp, "timestamp", latitude, longitude], errors="ignore")
+        self.align_measurements(times[order], {column: mdf[column].to_numpy()[order] for column in columns})
+
+    def align_measurements(self, times: np.ndarray, measurements: dict[str, np.ndarray]):
+        """Aligns the measurements with the locations of the sensor. Each measurement takes the nearest location at most
+        PLUME_LOCATION_TOLERANCE seconds away, the locations that no measurement takes are kept as rows without measurements.
+        :param times: sorted unix timestamps of the measurements
+        :param measurements: values of each measurement column, in the order of the timestamps"""
+        timestamp, latitude, longitude = SensorMeasurementsColumns.TIMESTAMP.value, SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+        (location_times, locations) = self.sorted_locations()
+
+        # both sides are sorted by time, so every measurement is matched to its nearest location in a single pass
+        nearest = pd.merge_asof(
+            pd.DataFrame({timestamp: times}),
+            pd.DataFrame({timestamp: location_times, "location": np.arange(len(location_times))}),
+            on=timestamp,
+            direction="nearest",
+            tolerance=PLUME_LOCATION_TOLERANCE,
+        )["location"].to_numpy(dtype="float64")
+        found = ~np.isnan(nearest)
+        location_position = nearest[found].astype(np.int64)
+
+        unmatched = np.ones(len(location_times), dtype=bool)
+        unmatched[location_position] = False
+
+        # the measurements and the unmatched locations are interleaved by time
+        all_times = np.concatenate([times, location_times[unmatched]])
+        order = np.argsort(all_times, kind="stable")
+        no_measurements = np.full(np.count_nonzero(unmatched), np.nan)
+
+        columns = {timestamp: all_times[order]}
+        for column, values in measurements.items():
+            columns[column] = np.concatenate([values, no_measurements])[order]
+        for column, values in zip([latitude, longitude], locations):
+            aligned = np.full(len(times), np.nan)
+            aligned[found] = values[location_position]
+            columns[column] = np.concatenate([aligned, values[unmatched]])[order]
+
+        self.df = pd.DataFrame(columns, index=pd.DatetimeIndex(pd.to_datetime(columns[timestamp], unit="s"), name="datetime"))
+
+    def sorted_locations(self) -> Tuple[np.ndarray, list[np.ndarray]]:
+        """Reads the locations of the sensor dataframe, sorted by time with the first location of each second.
+        :return: unix timestamps of the locations and their latitudes and longitudes"""
+        latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+
+        # the location csv has lower case location columns
+        df = self.df if latitude in self.df.columns else self.df.rename(columns={"latitude": latitude, "longitude": longitude})
+        # the timestamp column of the location csv is exact, the index is rounded down to the minute
+        if "timestamp" in df.columns:
+            times = df["timestamp"].to_numpy(dtype=np.int64)
+        else:
+            times = ((df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
 
-        # drop timestamps for measurement dataframe
-        mdf.drop(columns="timestamp", inplace=True)
-        self.df = self.df.join(mdf, how="outer")
-
-        # fill in null timestamps by converting the index to timestamp
-        self.df["filled_timestamps"] = self.df.index.astype(np.int64) // 10**9
-        # merge timestamp and timestamps columns on null timestamps
-        self.df[SensorMeasurementsColumns.TIMESTAMP.value] = self.df[SensorMeasurementsColumns.TIMESTAMP.value].fillna(self.df["filled_timestamps"])
-        # drop filled_timestamps column
-        self.df.drop(columns="filled_timestamps", inplace=True)
-
-        # create a new datetime column using the timestamps in format YYYY-MM-DD HH:MM:SS
-        self.df["datetime"] = pd.to_datetime(self.df[SensorMeasurementsColumns.TIMESTAMP.value], unit="s")
-        # set the datetime column as the index
-        self.df.set_index("datetime", inplace=True)
-
-        # rename datetime column to date
-        self.df.rename(columns={"datetime": "date"}, inplace=True)
-
-        # convert timestamp column to int
-        self.df[SensorMeasurementsColumns.TIMESTAMP.value] = self.df[SensorMeasurementsColumns.TIMESTAMP.value].astype(int)
+        order = np.argsort(times, kind="stable")
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = times[order][1:] != times[order][:-1]
+        order = order[first]
 
-        # sort indexes
-        self.df.sort_index(inplace=True)
+        return times[order], [df[latitude].to_numpy(dtype="float64")[order], df[longitude].to_numpy(dtype="float64")[order]]
 
     # measurement data
     def add_measurements_json(self, data: list):
         """Extracts the measurement data from the Plume API JSON and adds it to the dataframe.
         :param data: The Plume API JSON data."""
-        dfList = []
-
-        for measurements in data:
-            temp_df = pd.DataFrame.from_records(measurements)
-            dfList.append(temp_df)
-
-        # concatenate all measurement dataframes and prepare dataframe.
-        # ignore_index=True to prevent duplicate index errors
-        df = pd.concat(dfList, ignore_index=True)
-        df = PlumeSensor.prepare_measurements(df)
-        self.join_dataframes(df)
+        (times, measurements) = PlumeSensor.measurement_columns(data)
+        self.align_measurements(times, measurements)
 
         self.df = self.df[self.data_columns]
 
+    @staticmethod
+    def measurement_columns(data: list) -> Tuple[np.ndarray, dict[str, np.ndarray]]:
+        """Reads the measurements of the Plume API JSON straight into columns, with the first measurement of each minute
+        (as prepare_measurements keeps them, this removes the extra hour recorded for daylight saving).
+        :param data: The Plume API JSON data, a list of measurement records for each page
+        :return: sorted unix timestamps of the measurements and the values of each measurement column"""
+        records = [record for measurements in data for record in measurements]
+        if not records:
+            raise ValueError("No measurements found for sensor")
+
+        times = np.array([record["date"] for record in records], dtype=np.int64)
+        # np.unique returns the first record of each minute, sorted by minute
+        (_, first) = np.unique(times // 60, return_index=True)
+
+        keys = {key for record in records for key in record}
+        measurements = {column: np.array([record.get(key) for record in records], dtype="float64")[first] for key, column in PLUME_MEASUREMENT_COLUMNS.items() if key in keys}
+        return times[first], measurements
+
     @staticmethod
     def prepare_measurements(df: pd.DataFrame) -> pd.DataFrame:
         """Prepares the measurement dataframe from the Plume API JSON to make it ready for merging with the locations dataframe.\n
@@ -92,17 +150,7 @@ class PlumeSensor(SensorProduct, SensorWritable):
         :return: The prepared measurement dataframe."""
 
         df.drop(["id"], axis=1, inplace=True)
-        df.rename(
-            columns={
-                "date": SensorMeasurementsColumns.TIMESTAMP.value,
-                "no2": SensorMeasurementsColumns.NO2.value,
-                "voc": SensorMeasurementsColumns.VOC.value,
-                "pm1": SensorMeasurementsColumns.PM1.value,
-                "pm10": SensorMeasurementsColumns.PM10.value,
-                "pm25": SensorMeasurementsColumns.PM2_5.value,
-            },
-            inplace=True,
-        )
+        df.rename(columns={"date": SensorMeasurementsColumns.TIMESTAMP.value, **PLUME_MEASUREMENT_COLUMNS}, inplace=True)
         df.insert(0, "date", pd.to_datetime(df[SensorMeasurementsColumns.TIMESTAMP.value], unit="s"))
         df["date"] = df["date"].dt.floor("Min")  # used to match datetime of measurement data to the datetime of location data
         df.set_index("date", drop=True, inplace=True)
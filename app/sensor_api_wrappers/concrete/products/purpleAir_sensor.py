@@ -46,11 +46,12 @@ class PurpleAirSensor(SensorProduct, SensorWritable):
             self.df = self.df[filter_columns]
 
     @staticmethod
-    def prepare_measurements(df: pd.DataFrame) -> pd.DataFrame:
+    def prepare_measurements(df: pd.DataFrame, drop_empty_columns: bool = True) -> pd.DataFrame:
         """Prepares the measurement dataframe for merging with the locations dataframe and renames columns to match other sensor platform types.
 
         Args:
             df (pd.DataFrame): The measurement dataframe.
+            drop_empty_columns (bool): drop the columns without any values, disabled for chunks of a file so that every chunk has the same columns
         Returns:
             pd.DataFrame: The prepared measurement dataframe.
         """
@@ -59,7 +60,8 @@ class PurpleAirSensor(SensorProduct, SensorWritable):
         df.dropna(how="all", inplace=True)
 
         # drop NaN columns
-        df.dropna(axis=1, how="all", inplace=True)
+        if drop_empty_columns:
+            df.dropna(axis=1, how="all", inplace=True)
 
         # drop sensor_index column
         if "sensor_index" in df.columns:
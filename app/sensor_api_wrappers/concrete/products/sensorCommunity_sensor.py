@@ -1,4 +1,7 @@
 import io
+import pathlib
+from itertools import groupby
+from typing import Any, Callable, Iterator
 
 import numpy as np
 import pandas as pd
@@ -70,29 +73,65 @@ class SensorCommunitySensor(SensorProduct, SensorWritable):
         :param intervalString: The interval string to resample the data by
         :return: A dataframe containing all the sensor data for the sensor platform
         """
-
         dfList = []
-
-        combinedDataframe = None
         # for each sensor in the sensorPlatform dictionary
         for sensorPairs in sensorPlatform.values():
             # for each dataframe dictionary in the sensor dictionary
             for dataframeDict in sensorPairs.values():
-                # for each dataframe in the dataframe dictionary
+                # resample each dataframe in the dataframe dictionary
                 for dataframe in dataframeDict.values():
-                    # append the dataframe to the list and resample the data
-                    dataframe = dataframe.resample(intervalString).nearest()
-                    dfList.append(dataframe)
-                    if combinedDataframe is None:
-                        combinedDataframe = dataframe
-                    else:
-                        combinedDataframe = combinedDataframe.combine_first(dataframe)
+                    dfList.append(dataframe.resample(intervalString).nearest())
+
+        # all the days are combined at once rather than folded into the combined dataframe one at a time
+        combinedDataframe = SensorCommunitySensor.combine_resampled(dfList)
 
         # drop null columns
         combinedDataframe.dropna(axis=1, how="all", inplace=True)
 
         return combinedDataframe
 
+    # @DeprecationWarning
+    @staticmethod
+    def StreamResampledDays(sensorPlatform: dict[str, dict[int, Any]], intervalString: str, read: Callable[[Any], pd.DataFrame] = None) -> Iterator[pd.DataFrame]:
+        """Resamples and combines the sensor data of a sensor platform a day at a time, in order of the day keys, so only the days that are being combined are read and held.
+        Each time is yielded once with the same values as ResampleDataAndSortIntoDays, provided the data of a day does not start before the data of the days before it.
+        :param sensorPlatform: A dictionary of sensor ids as the keys for a dictionary of day data with a unique timestamp key to identify each day of data
+        :param intervalString: The interval string to resample the data by
+        :param read: reads the dataframe of a day from its value in the sensor platform (default: the values are dataframes)
+        :return: iterator of the combined sensor data, in order of time
+        """
+        # every day of every sensor, the position of a day sets its precedence as in ResampleDataAndSortIntoDays
+        days = [(day, data) for sensorPairs in sensorPlatform.values() for dataframeDict in sensorPairs.values() for day, data in dataframeDict.items()]
+        order = sorted(range(len(days)), key=lambda position: days[position][0])
+
+        # resampled rows that may still be combined with the rows of a later day
+        pending = []
+        for _, positions in groupby(order, key=lambda position: days[position][0]):
+            resampled = []
+            for position in positions:
+                dataframe = days[position][1] if read is None else read(days[position][1])
+                resampled.append((position, dataframe.resample(intervalString).nearest()))
+
+            # the rows before the start of this day are complete
+            starts = [dataframe.index[0] for _, dataframe in resampled if len(dataframe.index)]
+            if starts and pending:
+                complete = [(position, dataframe.loc[dataframe.index < min(starts)]) for position, dataframe in pending]
+                pending = [(position, dataframe.loc[dataframe.index >= min(starts)]) for position, dataframe in pending]
+                if any(len(dataframe.index) for _, dataframe in complete):
+                    yield SensorCommunitySensor.combine_resampled([dataframe for _, dataframe in sorted(complete, key=lambda item: item[0])])
+            pending.extend(resampled)
+
+        if pending:
+            yield SensorCommunitySensor.combine_resampled([dataframe for _, dataframe in sorted(pending, key=lambda item: item[0])])
+
+    @staticmethod
+    def combine_resampled(dfList: list[pd.DataFrame]) -> pd.DataFrame:
+        """Combines resampled dataframes in one pass. Each value is the first non null value of the dataframes in the order of the list,
+        which is what folding the list with DataFrame.combine_first returns.
+        :param dfList: list of resampled dataframes, in order of precedence
+        :return: combined dataframe sorted by time"""
+        return pd.concat(dfList).groupby(level=0).first()
+
     # @DeprecationWarning
     @staticmethod
     def prepare_measurements(df: pd.DataFrame) -> pd.DataFrame:
@@ -166,20 +205,27 @@ class SensorCommunitySensor(SensorProduct, SensorWritable):
     @staticmethod
     def from_csv(id_: str, content: dict[int, bytes]) -> SensorWritable:
         """Creates a SensorCommunitySensor object from a dictionary of csv files.
-        :param content: dictionary of csv files with a unique timestamp key to identify each day of data
+        :param content: dictionary of csv files (their content or the path of the cached file) with a unique timestamp key to identify each day of data
         :return: Dataframe of sensor data
         """
-        sensorPlatform = {}
-        for data in content.values():
-            for timestamp, csvData in data.items():
-                file_ = io.BytesIO(csvData)
-                buffer = io.StringIO(file_.read().decode("UTF-8"))
+        # the days are read and combined one at a time
+        df = pd.concat(SensorCommunitySensor.StreamResampledDays({id_: content}, "145S", read=SensorCommunitySensor.read_archive_csv))
 
-                df = pd.read_csv(buffer, sep=";", parse_dates=True, index_col="timestamp")
-                df.drop(["sensor_id", "sensor_type", "location", "ratioP1", "ratioP2", "durP1", "durP2"], axis=1, inplace=True, errors="ignore")
-                data[timestamp] = df
-
-        sensorPlatform[id_] = content
+        # drop null columns
+        df.dropna(axis=1, how="all", inplace=True)
 
-        df = SensorCommunitySensor.prepare_measurements(SensorCommunitySensor.ResampleDataAndSortIntoDays(sensorPlatform, "145S"))
+        df = SensorCommunitySensor.prepare_measurements(df)
         return SensorCommunitySensor(id_, df, error=None)
+
+    # @DeprecationWarning
+    @staticmethod
+    def read_archive_csv(csvData: Any) -> pd.DataFrame:
+        """Reads the csv file of a day of an archive sensor.
+        :param csvData: content of the csv file or the path of the cached file
+        :return: dataframe of the day indexed by timestamp"""
+        # cached archive files are parsed straight from disk
+        buffer = csvData if isinstance(csvData, pathlib.Path) else io.BytesIO(csvData)
+
+        df = pd.read_csv(buffer, sep=";", parse_dates=True, index_col="timestamp", encoding="UTF-8")
+        df.drop(["sensor_id", "sensor_type", "location", "ratioP1", "ratioP2", "durP1", "durP2"], axis=1, inplace=True, errors="ignore")
+        return df
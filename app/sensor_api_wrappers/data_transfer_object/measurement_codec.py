@@ -0,0 +1,219 @@
+"""Compact binary columnar encoding for a day of sensor measurements.
+
+Layout of an encoded blob (everything after the magic bytes is zlib compressed)::
+
+    MAGIC | zlib( uint32 header length | header json | timestamp block | column blocks... )
+
+The header lists the number of rows and, for every column, its name, the numpy dtype it was stored with and the
+byte length of its block. Timestamps are stored as the first timestamp followed by the deltas between consecutive
+readings using the narrowest integer type that fits (a day of 1 minute data is stored as a single int64 and 1439 int8s).
+Float columns are stored as float32 when that is lossless, otherwise as float64. NaN marks a missing value.
+Columns that are not numeric are stored as a utf-8 json list so that nothing is lost.
+
+A blob can hold several encoded segments back to back (``MAGIC | zlib(...) | MAGIC | zlib(...)``), so readings that
+arrive later in the day are appended by concatenating their encoding onto the stored blob. Each segment only holds
+readings newer than the previous one and never adds a column the first segment does not have.
+"""
+
+import json
+import struct
+import zlib
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from routers.services.enums import SensorMeasurementsColumns
+
+MAGIC = b"AQC1"
+COMPRESSION_LEVEL = 6
+_HEADER_LENGTH = struct.Struct("<I")
+# zlib never shrinks the output below the input by more than a few bytes per block, so this many bytes from the start
+# of a blob always decompress to more than a header of a few hundred columns
+HEADER_PREFIX_BYTES = 16384
+_INTEGER_DTYPES = ["<i1", "<i2", "<i4", "<i8"]
+
+
+def is_columnar(blob: any) -> bool:
+    """checks if a value is a columnar encoded blob
+    :param blob: value to check
+    :return: True if the value starts with the columnar magic bytes"""
+    return isinstance(blob, (bytes, bytearray, memoryview)) and bytes(blob[: len(MAGIC)]) == MAGIC
+
+
+def _narrowest_integer_dtype(values: np.ndarray) -> str:
+    """returns the smallest little endian integer dtype that can hold all the values
+    :param values: integer array
+    :return: numpy dtype string"""
+    if values.size == 0:
+        return _INTEGER_DTYPES[0]
+    low, high = values.min(), values.max()
+    for dtype in _INTEGER_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return _INTEGER_DTYPES[-1]
+
+
+def _encode_float_column(values: np.ndarray) -> tuple[str, bytes]:
+    """encodes a float column as float32 if no precision is lost, otherwise as float64
+    :param values: float64 array
+    :return: tuple of dtype string and raw bytes"""
+    as_float32 = values.astype("<f4")
+    if np.array_equal(as_float32.astype("<f8"), values, equal_nan=True):
+        return "<f4", as_float32.tobytes()
+    return "<f8", values.astype("<f8").tobytes()
+
+
+def encode_measurements(df: pd.DataFrame) -> bytes:
+    """encodes a day of measurements into the compact columnar format.
+
+    The dataframe index must hold the unix timestamps of the readings (as produced by SensorWritable.dataframe_to_dict)
+
+    :param df: dataframe of measurements indexed by unix timestamp
+    :return: encoded bytes"""
+    timestamps = np.asarray(df.index, dtype="int64")
+    order = np.argsort(timestamps, kind="stable")
+    timestamps = timestamps[order]
+
+    deltas = np.diff(timestamps)
+    delta_dtype = _narrowest_integer_dtype(deltas)
+    timestamp_block = timestamps[:1].astype("<i8").tobytes() + deltas.astype(delta_dtype).tobytes()
+
+    header = {"rows": int(timestamps.size), "timestamp_delta_dtype": delta_dtype, "columns": []}
+    blocks = [timestamp_block]
+
+    for column in df.columns:
+        series = df[column].iloc[order]
+        numeric = pd.to_numeric(series, errors="coerce")
+        # a column is only stored as numbers if converting it did not discard any value
+        if series.dtype != object or numeric.notna().sum() == series.notna().sum():
+            dtype, block = _encode_float_column(numeric.to_numpy(dtype="float64", na_value=np.nan))
+        else:
+            dtype = "json"
+            block = json.dumps([None if pd.isna(value) else value for value in series.tolist()]).encode("utf-8")
+        header["columns"].append({"name": str(column), "dtype": dtype, "length": len(block)})
+        blocks.append(block)
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    payload = _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + b"".join(blocks)
+    return MAGIC + zlib.compress(payload, COMPRESSION_LEVEL)
+
+
+def _segments(blob: bytes) -> Iterator[memoryview]:
+    """decompresses each segment of a columnar blob
+    :param blob: encoded bytes
+    :return: iterator of the decompressed payload of each segment"""
+    if not is_columnar(blob):
+        raise ValueError("measurement blob is not in the columnar format")
+
+    remaining = bytes(blob)
+    while remaining:
+        if remaining[: len(MAGIC)] != MAGIC:
+            raise ValueError("measurement blob has a corrupt segment")
+        # the compressed stream ends where the next segment starts, zlib leaves anything after it in unused_data
+        decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(remaining[len(MAGIC) :])
+        if not decompressor.eof:
+            raise ValueError("measurement blob has a truncated segment")
+        remaining = decompressor.unused_data
+        yield memoryview(payload)
+
+
+def _read_header(payload: memoryview) -> tuple[dict, int]:
+    """reads the header of a decompressed segment
+    :param payload: decompressed segment
+    :return: tuple of the header and the offset of the timestamp block"""
+    (header_length,) = _HEADER_LENGTH.unpack_from(payload, 0)
+    offset = _HEADER_LENGTH.size
+    return json.loads(bytes(payload[offset : offset + header_length])), offset + header_length
+
+
+def _read_timestamps(payload: memoryview, header: dict, offset: int) -> tuple[np.ndarray, int]:
+    """reads the delta encoded timestamp block of a decompressed segment
+    :param payload: decompressed segment
+    :param header: header of the segment
+    :param offset: offset of the timestamp block
+    :return: tuple of the timestamps and the offset of the first column block"""
+    rows = header["rows"]
+    if rows == 0:
+        return np.empty(0, dtype="int64"), offset
+
+    first = np.frombuffer(payload, dtype="<i8", count=1, offset=offset)
+    offset += 8
+    delta_dtype = np.dtype(header["timestamp_delta_dtype"])
+    deltas = np.frombuffer(payload, dtype=delta_dtype, count=rows - 1, offset=offset)
+    offset += deltas.nbytes
+    timestamps = np.empty(rows, dtype="int64")
+    timestamps[0] = first[0]
+    np.cumsum(deltas, out=timestamps[1:], dtype="int64")
+    timestamps[1:] += first[0]
+    return timestamps, offset
+
+
+def decode_measurements(blob: bytes) -> dict[str, np.ndarray]:
+    """decodes a columnar blob straight into numpy arrays, without any json step for numeric columns.
+    The segments of the blob are joined in order, a column missing from a later segment is NaN (or None) for its readings.
+    :param blob: encoded bytes
+    :return: dictionary of column name to numpy array, the timestamps are stored under the Timestamp column name"""
+    segments = []
+    for payload in _segments(blob):
+        header, offset = _read_header(payload)
+        timestamps, offset = _read_timestamps(payload, header, offset)
+
+        columns = {SensorMeasurementsColumns.TIMESTAMP.value: timestamps}
+        for column in header["columns"]:
+            block = payload[offset : offset + column["length"]]
+            offset += column["length"]
+            if column["dtype"] == "json":
+                columns[column["name"]] = np.array(json.loads(bytes(block)), dtype=object)
+            else:
+                columns[column["name"]] = np.frombuffer(block, dtype=column["dtype"]).astype("float64")
+        segments.append(columns)
+
+    if len(segments) == 1:
+        return segments[0]
+
+    joined = {}
+    for name, values in segments[0].items():
+        parts = [values]
+        for columns in segments[1:]:
+            rows = columns[SensorMeasurementsColumns.TIMESTAMP.value].size
+            if name in columns:
+                parts.append(columns[name])
+            elif values.dtype == object:
+                parts.append(np.full(rows, None, dtype=object))
+            else:
+                parts.append(np.full(rows, np.nan))
+        joined[name] = np.concatenate(parts)
+    return joined
+
+
+def read_last_timestamp(blob: bytes) -> int:
+    """reads the timestamp of the latest reading of a columnar blob, only the timestamp blocks are decoded
+    :param blob: encoded bytes
+    :return: latest unix timestamp or None if the blob has no readings"""
+    last = None
+    for payload in _segments(blob):
+        header, offset = _read_header(payload)
+        timestamps, _ = _read_timestamps(payload, header, offset)
+        if timestamps.size:
+            last = int(timestamps.max()) if last is None else max(last, int(timestamps.max()))
+    return last
+
+
+def read_column_names(blob_prefix: bytes) -> list[str]:
+    """reads the column names from the header of a columnar blob, only the first HEADER_PREFIX_BYTES are needed.
+    Appended segments never add columns so the header of the first segment lists every column
+    :param blob_prefix: the start (or all) of an encoded blob
+    :return: list of column names, starting with the Timestamp column"""
+    if not is_columnar(blob_prefix):
+        raise ValueError("measurement blob is not in the columnar format")
+
+    # decompressing a truncated stream returns everything that could be decoded instead of raising
+    payload = zlib.decompressobj().decompress(bytes(blob_prefix)[len(MAGIC) :])
+    header_length = _HEADER_LENGTH.unpack_from(payload, 0)[0] if len(payload) >= _HEADER_LENGTH.size else None
+    if header_length is None or len(payload) < _HEADER_LENGTH.size + header_length:
+        raise ValueError("the blob prefix does not contain the whole header")
+
+    header = json.loads(payload[_HEADER_LENGTH.size : _HEADER_LENGTH.size + header_length])
+    return [SensorMeasurementsColumns.TIMESTAMP.value] + [column["name"] for column in header["columns"]]
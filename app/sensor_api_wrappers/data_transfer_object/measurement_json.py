@@ -0,0 +1,73 @@
+"""Strict reader of the json measurement_data of the sensor summaries.
+
+measurement_data holds the readings of a day as a json object keyed by unix timestamp, stored as a json encoded string::
+
+    {"1695427256": {"NO2": 0, "VOC": 144, "latitude": null}, "1695427316": {...}}
+
+Older rows were written as python dictionary strings (single quotes, None, NaN) which are not json. Those rows are
+rewritten as strict json by the re-encoding task (see routers/services/measurement_reencoding.py), so every row is read
+with a single orjson parse and no copy of the string. A row that has not been rewritten yet is read with the legacy
+parser, which is only used once the strict parse has failed.
+"""
+
+import json
+from itertools import chain
+from typing import Any
+
+import orjson
+from routers.services.enums import SensorMeasurementsColumns
+
+
+def load_measurement_json(measurement_data: Any) -> dict[str, dict]:
+    """parses the measurement_data column into a dictionary of readings keyed by timestamp
+    :param measurement_data: json string (or dictionary when postgres has already parsed or projected the measurements)
+    :return: dictionary of readings keyed by timestamp"""
+    if isinstance(measurement_data, dict):
+        return measurement_data
+    if measurement_data is None:
+        return {}
+    try:
+        return orjson.loads(measurement_data)
+    except (orjson.JSONDecodeError, TypeError):
+        return load_legacy_measurement_json(measurement_data)
+
+
+def load_legacy_measurement_json(measurement_data: Any) -> dict[str, dict]:
+    """parses measurement_data that is not strict json: json with NaN values or a python dictionary string
+    :param measurement_data: legacy measurement_data string
+    :return: dictionary of readings keyed by timestamp"""
+    try:
+        # json.loads accepts the NaN and Infinity values that orjson rejects
+        return json.loads(measurement_data)
+    except (json.JSONDecodeError, TypeError):
+        return json.loads(str(measurement_data).replace("'", '"').replace("None", "null"))
+
+
+def reencode_measurement_json(measurement_data: Any) -> str:
+    """rewrites legacy measurement_data as strict json, NaN values become null
+    :param measurement_data: stored measurement_data string
+    :return: strict json string, None if the measurement_data already is strict json (or is not a string)"""
+    if not isinstance(measurement_data, str):
+        return None
+    try:
+        orjson.loads(measurement_data)
+        return None
+    except orjson.JSONDecodeError:
+        return orjson.dumps(load_legacy_measurement_json(measurement_data)).decode("utf-8")
+
+
+def measurement_json_columns(measurement_data: Any, columns: list[str] = None) -> dict[str, list]:
+    """reads the readings of measurement_data straight into columns, without building a record or dataframe per reading
+    :param measurement_data: json string (or dictionary) of the measurements
+    :param columns: columns to return in this order, columns that no reading has are left out (default is every column)
+    :return: dictionary of the values of each column, the Timestamp column is first unless columns sets the order.
+    A reading without a column has None in that column"""
+    data = load_measurement_json(measurement_data)
+    timestamp_column = SensorMeasurementsColumns.TIMESTAMP.value
+    readings = list(data.values())
+
+    # union of the keys of every reading, in the order they first appear
+    available = dict.fromkeys(chain([timestamp_column], chain.from_iterable(readings)))
+    keys = [col for col in columns if col in available] if columns else list(available)
+
+    return {key: [int(timestamp) for timestamp in data] if key == timestamp_column else [reading.get(key) for reading in readings] for key in keys}
@@ -1,6 +1,4 @@
 # dependacies
-import json
-import math
 # Dependancies for Haversine formula
 from typing import Any, Iterator, Tuple
 
@@ -8,9 +6,36 @@ import numpy as np
 import pandas as pd
 from core.schema import SensorSummary as SchemaSensorSummary
 from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.measurement_codec import decode_measurements, is_columnar
+from sensor_api_wrappers.data_transfer_object.measurement_json import measurement_json_columns
 from sensor_api_wrappers.data_transfer_object.sensorDTO import SensorDTO
 
 
+AVERAGING_LOCATION_COLUMNS = (SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value, "boundingBox")
+
+
+def averaging_aggregations(measurement_columns: list[str], averaging_methods: list[str]) -> dict[str, list[str]]:
+    """:return: aggregations of the location columns (bounding box of each bucket) and of the measurement columns (averaging methods)"""
+    (latitude, longitude, boundingBox) = AVERAGING_LOCATION_COLUMNS
+    return {latitude: ["min", "max"], longitude: ["min", "max"], boundingBox: ["first"], **{col: list(averaging_methods) for col in measurement_columns}}
+
+
+def complete_buckets(averages: pd.DataFrame, averaging_frequency: str) -> pd.DataFrame:
+    """adds the empty buckets between the first and last bucket of a sensor, which grouping a panel of sensors leaves out
+    :param averages: averages of a sensor
+    :param averaging_frequency: frequency of the buckets
+    :return: averages with a row for every bucket, the counts of the empty buckets are 0"""
+    buckets = pd.date_range(averages.index[0], averages.index[-1], freq=averaging_frequency, name=averages.index.name)
+    if len(buckets) == len(averages.index):
+        return averages
+
+    averages = averages.reindex(buckets)
+    counts = [col for col in averages.columns if col[1] == "count"]
+    averages[counts] = averages[counts].fillna(0).astype("int64")
+    averages[("boundingBox", "first")] = averages[("boundingBox", "first")].astype(object).where(averages[("boundingBox", "first")].notna(), None)
+    return averages
+
+
 class SensorReadable(SensorDTO):
     """Readable Sensor Data Transfer Object, used to transfer and process data between api wrappers, main API and the database"""
 
@@ -30,28 +55,65 @@ class SensorReadable(SensorDTO):
         :param averaging_frequency: frequency to use for averaging (e.g. H for hourly, D for daily, M for monthly)
         :return: dataframe with the hourly summary of the data
         """
-        df = self.df
-        # subset location data from the dataframe
-        df_location = df[["latitude", "longitude", "boundingBox"]]
+        return SensorReadable.panel_averages([self], averaging_methods, averaging_frequency)[0]
 
-        # # calculate bounding box of the location data for each hour
-        df_location = df_location.groupby(pd.Grouper(freq=averaging_frequency)).agg({"latitude": ["min", "max"], "longitude": ["min", "max"], "boundingBox": ["first"]})
+    @staticmethod
+    def panel_averages(sensors: list["SensorReadable"], averaging_methods: list[str], averaging_frequency: str = "H") -> list[list[str]]:
+        """converts the dataframes of many sensors to averages, in the format of ConvertDFToAverages
 
-        # print(df_location.head(-1))
-        # # drop null values
-        # df_location = df_location.dropna()
+        The readings of the sensors that have the same measurement columns are stacked into one panel keyed by (sensor, date),
+        so every averaging method of every sensor is computed with a single grouped pass rather than a pass per sensor.
 
-        # subset sensor data from the dataframe
-        df_measurements = df.drop(columns=["latitude", "longitude", "boundingBox", "timestamp"])
-        measurements_columns = df_measurements.columns.to_list()
+        :param sensors: sensors with a datetime indexed dataframe, the dataframe of each sensor is replaced with its averages
+        :param averaging_methods: methods to use for averaging (e.g. mean, median, min, max)
+        :param averaging_frequency: frequency to use for averaging (e.g. H for hourly, D for daily, M for monthly)
+        :return: measurement columns of each sensor
+        """
+        frames = [sensor.averaging_frame() for sensor in sensors]
+        measurement_columns = [frame.columns[len(AVERAGING_LOCATION_COLUMNS) :].to_list() for frame in frames]
+
+        # sensors are only stacked with sensors of the same columns and dtypes, so their averages are those of the sensor on its own.
+        # A sensor without dated readings is averaged on its own
+        panels = {}
+        for i, frame in enumerate(frames):
+            panels.setdefault(tuple(frame.dtypes.items()) if frame.index.notna().any() else i, []).append(i)
+
+        for positions in panels.values():
+            aggregations = averaging_aggregations(measurement_columns[positions[0]], averaging_methods)
+            if len(positions) == 1:
+                sensors[positions[0]].df = frames[positions[0]].groupby(pd.Grouper(freq=averaging_frequency)).agg(aggregations)
+                continue
+
+            panel = pd.concat([frames[i] for i in positions], keys=positions, names=["sensor", "date"])
+            averages = panel.groupby([pd.Grouper(level="sensor"), pd.Grouper(level="date", freq=averaging_frequency)]).agg(aggregations)
+            for i, df in averages.groupby(level="sensor", sort=False):
+                df = df.droplevel("sensor")
+                df.index.name = frames[i].index.name
+                sensors[i].df = complete_buckets(df, averaging_frequency)
+
+        return measurement_columns
+
+    def averaging_frame(self) -> pd.DataFrame:
+        """prepares the object's dataframe for averaging: the location columns come first, followed by the measurement columns as numbers
+        :return: dataframe with the latitude, longitude, boundingBox and measurement columns"""
+        latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+
+        # older summaries were stored with lower case location and timestamp columns
+        df = self.df.rename(columns={"latitude": latitude, "longitude": longitude, "timestamp": SensorMeasurementsColumns.TIMESTAMP.value})
+        for column in [latitude, longitude]:
+            if column not in df.columns:
+                df[column] = np.nan
+        if "boundingBox" not in df.columns:
+            df["boundingBox"] = None
 
-        # calculate the averages  of the sensor data
-        df_measurements = df_measurements.groupby(pd.Grouper(freq=averaging_frequency)).agg(averaging_methods)
+        # subset location data from the dataframe
+        df_location = df[list(AVERAGING_LOCATION_COLUMNS)].astype({latitude: "float64", longitude: "float64"})
 
-        # merge the location and sensor data
-        self.df = pd.merge(df_location, df_measurements, left_index=True, right_index=True, how="outer")
+        # subset sensor data from the dataframe, columns of missing values are stored as objects so are converted to numbers
+        df_measurements = df.drop(columns=[*AVERAGING_LOCATION_COLUMNS, SensorMeasurementsColumns.TIMESTAMP.value], errors="ignore")
+        df_measurements = df_measurements.apply(pd.to_numeric, errors="coerce")
 
-        return measurements_columns
+        return pd.concat([df_location, df_measurements], axis=1)
 
     def generate_geojson_coords(self, min_long: float, min_lat: float, max_long: float, max_lat: float) -> list[list[float]]:
         """generate a geojson coordinate list from the min and max longitudes and latitudes
@@ -67,6 +129,46 @@ class SensorReadable(SensorDTO):
         else:
             return [[min_long, min_lat], [min_long, max_lat], [max_long, max_lat], [max_long, min_lat], [min_long, min_lat]]
 
+    def bounding_box_geometry(self, boundingBox: str) -> dict[str, Any]:
+        """converts a stationary bounding box polygon string to a geojson geometry
+        :param boundingBox: POLYGON((minx miny, minx Maxy, maxx Maxy, maxx miny, minx miny))
+        :return: geojson geometry"""
+        # extract the min and max coords from the polygon, removing any whitespace after the comma
+        coords = [x.strip() for x in boundingBox.split("(")[2].split(",")]
+        min_long, min_lat = (float(x) for x in coords[0].split(" "))
+        max_long, max_lat = (float(x) for x in coords[2].split(" "))
+        return {"type": "Polygon", "coordinates": [self.generate_geojson_coords(min_long, min_lat, max_long, max_lat)]}
+
+    def location_geometries(self) -> list[dict[str, Any]]:
+        """builds the geojson geometry of every row of the averaged dataframe from whole columns
+        :return: list of geojson geometries, one per row"""
+        latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+        min_lat = self.df[(latitude, "min")].to_numpy(dtype="float64")
+        max_lat = self.df[(latitude, "max")].to_numpy(dtype="float64")
+        min_long = self.df[(longitude, "min")].to_numpy(dtype="float64")
+        max_long = self.df[(longitude, "max")].to_numpy(dtype="float64")
+        # buckets without readings have a missing (NaN) bounding box
+        bounding_boxes = self.df[("boundingBox", "first")].astype(object).where(self.df[("boundingBox", "first")].notna(), None).to_numpy(dtype=object)
+
+        missing = np.isnan(min_lat)
+        point = ~missing & (min_lat == max_lat) & (min_long == max_long)
+
+        # a stationary sensor has the same bounding box for every row, so each polygon string is only parsed once
+        stationary_geometries = {box: self.bounding_box_geometry(box) for box in set(bounding_boxes.tolist()) if box is not None}
+
+        geometries = []
+        for i, (box, a, b, c, d) in enumerate(zip(bounding_boxes.tolist(), min_long.tolist(), min_lat.tolist(), max_long.tolist(), max_lat.tolist())):
+            if box is not None:
+                geometries.append(stationary_geometries[box])
+            elif missing[i]:
+                # TODO: after consulting with team, decide what to do with the empty bounding box (e.g. remove the feature, assign a default bounding box, etc.)
+                geometries.append({"type": "Polygon", "coordinates": [[]]})
+            elif point[i]:
+                geometries.append({"type": "Point", "coordinates": [a, b]})
+            else:
+                geometries.append({"type": "Polygon", "coordinates": [[[a, b], [a, d], [c, d], [c, b], [a, b]]]})
+        return geometries
+
     def to_geojson(self, averaging_methods: list[str], averaging_frequency: str = "H") -> dict[str, Any]:
         """Converts a dataframe to a geojson object
         :param df: dataframe to convert
@@ -75,87 +177,87 @@ class SensorReadable(SensorDTO):
         :return: geojson dictionary"""
 
         measurement_columns = self.ConvertDFToAverages(averaging_methods, averaging_frequency)
+        return self.averages_to_geojson(measurement_columns, averaging_methods)
 
-        geojson = {"type": "FeatureCollection", "features": []}
-
-        # loop through each row in the dataframe and convert each row to geojson feature format
-        for _, row in self.df.iterrows():
-            # feature
-            feature = {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": []}}
-
-            # check if a stationary bounding box is available from the data, otherwise generate one from the min and max longitudes and latitudes
-            if row["boundingBox"]["first"] is None:
-                # generate bounding box if coordinates are available else assign empty list
-                if math.isnan(row["latitude"]["min"]):
-                    bounding_box = []
-                    # TODO: after consulting with team, decide what to do with the empty bounding box (e.g. remove the feature, assign a default bounding box, etc.)
-
-                else:
-                    bounding_box = self.generate_geojson_coords(
-                        min_long=row["longitude"]["min"],
-                        min_lat=row["latitude"]["min"],
-                        max_long=row["longitude"]["max"],
-                        max_lat=row["latitude"]["max"],
-                    )
-
-                # if the bounding box has only one coordinate then change the geometry type to point
-                if len(bounding_box) == 1:
-                    # change the geometry type to point
-                    feature["geometry"]["type"] = "Point"
-                    bounding_box = bounding_box[0]
-                    # assign the bounding box to the feature
-                    feature["geometry"]["coordinates"] = bounding_box
-
-                else:
-                    # assign the bounding box to the feature
-                    feature["geometry"]["coordinates"] = [bounding_box]
-            else:
-                # extract the min and max coords from the polygon POLYGON(minx miny, minx Maxy, maxx Maxy, maxx miny, minx miny)
-                coords = row["boundingBox"]["first"].split("(")[2].split(",")
-                # remove any whitespace after the comma
-                coords = [x.strip() for x in coords]
-                min_long, min_lat = (float(x) for x in coords[0].split(" "))
-                max_long, max_lat = (float(x) for x in coords[2].split(" "))
-
-                feature["geometry"]["coordinates"] = [self.generate_geojson_coords(min_long, min_lat, max_long, max_lat)]
-
-            # add datetime to the feature
-            feature["properties"]["datetime_UTC"] = row.name
+    def averages_to_geojson(self, measurement_columns: list[str], averaging_methods: list[str]) -> dict[str, Any]:
+        """Converts an averaged dataframe (in the format returned by ConvertDFToAverages) to a geojson object
+        :param measurement_columns: measurement columns of the averaged dataframe
+        :param averaging_methods: averaging methods of the averaged dataframe (e.g. mean, median, min, max)
+        :return: geojson dictionary"""
 
-            # assign properties (measurement values) to the feature
-            for col in measurement_columns:
-                for method in averaging_methods:
-                    feature["properties"][col + "_" + method] = row[col][method] if not math.isnan(row[col][method]) else None
+        # property values are read a column at a time (missing values become None)
+        keys = ["datetime_UTC"]
+        values = [self.df.index.to_pydatetime().tolist()]
+        for col in measurement_columns:
+            for method in averaging_methods:
+                column = self.df[(col, method)]
+                keys.append(col + "_" + method)
+                values.append(column.astype(object).where(column.notna(), None).tolist())
 
-            geojson["features"].append(feature)
+        features = [{"type": "Feature", "properties": dict(zip(keys, properties)), "geometry": geometry} for properties, geometry in zip(zip(*values), self.location_geometries())]
 
-        return geojson
+        return {"type": "FeatureCollection", "features": features}
 
     @staticmethod
     def JsonStringToDataframe(jsonb: str, boundingBox: str) -> pd.DataFrame:
         """converts a jsonb string to a dataframe
-        :param jsonb: jsonb string
+        :param jsonb: jsonb string (or a dictionary when postgres has already projected the measurement columns)
         :param boundingBox: string of polygon
         :return: dataframe
         """
-        # Preparing the json string to be read into dataframe
-        my_json_string = str(jsonb)
-        my_json_string = my_json_string.replace("'", '"').replace("None", "null")
+        # the readings are read straight into columns by a strict json parse (see measurement_json)
+        columns = measurement_json_columns(jsonb)
+        timestamps = columns.pop(SensorMeasurementsColumns.TIMESTAMP.value)
 
-        # reading the JSON data using json.loads(json string)
-        # converting json dataset from dictionary to dataframe
-        dict_data = json.loads(my_json_string)
-        df = pd.DataFrame.from_dict(dict_data, orient="index")
+        df = pd.DataFrame(columns, index=pd.to_datetime(timestamps, unit="s", errors="coerce"))
+        df.insert(0, SensorMeasurementsColumns.TIMESTAMP.value, timestamps)
+        df.index.name = "date"
 
-        # TODO refactor into a function
-        # set column name as timestamp and datatype to integer
-        df.index.name = SensorMeasurementsColumns.TIMESTAMP.value
+        return SensorReadable.prepare_dataframe(df, boundingBox)
 
-        # add date col and set to index
-        df.insert(0, "date", pd.to_datetime(df.index, unit="s", errors="coerce"))
-        df.reset_index(inplace=True)
-        df.set_index("date", drop=True, inplace=True)
+    @staticmethod
+    def ColumnarToDataframe(blob: bytes, boundingBox: str) -> pd.DataFrame:
+        """converts a columnar measurement blob to a dataframe, the columns are decoded straight into numpy arrays
+        :param blob: columnar encoded bytes (see measurement_codec)
+        :param boundingBox: string of polygon
+        :return: dataframe
+        """
+        columns = decode_measurements(blob)
+        timestamps = columns[SensorMeasurementsColumns.TIMESTAMP.value]
+
+        df = pd.DataFrame(columns, index=pd.to_datetime(timestamps, unit="s", errors="coerce"))
+        df.index.name = "date"
+
+        return SensorReadable.prepare_dataframe(df, boundingBox)
+
+    @staticmethod
+    def ColumnarToJsonString(blob: bytes) -> str:
+        """converts a columnar measurement blob to the json string format used by the measurement_data column
+        :param blob: columnar encoded bytes (see measurement_codec)
+        :return: json string of the measurements keyed by timestamp
+        """
+        df = pd.DataFrame(decode_measurements(blob)).set_index(SensorMeasurementsColumns.TIMESTAMP.value)
+        return df.to_json(orient="index")
 
+    @staticmethod
+    def MeasurementDataToDataframe(measurement_data: Any, boundingBox: str, measurement_blob: bytes = None) -> pd.DataFrame:
+        """converts the stored measurements of a sensor summary to a dataframe, using the columnar blob when one is stored
+        :param measurement_data: jsonb string of the measurements (None for columnar rows)
+        :param boundingBox: string of polygon
+        :param measurement_blob: columnar encoded bytes of the measurements
+        :return: dataframe
+        """
+        if measurement_blob is not None and is_columnar(measurement_blob):
+            return SensorReadable.ColumnarToDataframe(measurement_blob, boundingBox)
+        return SensorReadable.JsonStringToDataframe(measurement_data, boundingBox)
+
+    @staticmethod
+    def prepare_dataframe(df: pd.DataFrame, boundingBox: str) -> pd.DataFrame:
+        """amends the dtypes of a date indexed measurement dataframe and adds the bounding box column
+        :param df: dataframe with a date index and a timestamp column
+        :param boundingBox: string of polygon
+        :return: dataframe
+        """
         # amend dtypes for timestamp, latitude and longitude
         # Define expected dtypes for columns if present
         dtype_map = {
@@ -183,12 +285,12 @@ class SensorReadable(SensorDTO):
     def from_json_list(sensor_id: str, values: list) -> Any:
         """Factory method to create SensorReadable from json list and bounding box geometry string.
         :param sensor_id: sensor id
-        :param values: list of dictionaries {json_: JSON string converted dataframes, boundingBox : bounding box geometry}
+        :param values: list of dictionaries {json_: JSON string converted dataframes, blob: optional columnar bytes, boundingBox : bounding box geometry}
         :return: SensorReadable
         """
         dfList = []
         for sensor_dict in values:
-            dfList.append(SensorReadable.JsonStringToDataframe(sensor_dict["json_"], sensor_dict["boundingBox"]))
+            dfList.append(SensorReadable.MeasurementDataToDataframe(sensor_dict["json_"], sensor_dict["boundingBox"], sensor_dict.get("blob")))
 
         df = pd.concat(dfList)
 
@@ -2,17 +2,32 @@
 import datetime as dt
 import json
 import math
-
-# Dependancies for Haversine formula
-from math import asin, cos, radians, sin, sqrt
-from typing import Any, Iterator, Tuple
+import re
+from functools import lru_cache
+from os import environ as env
+from typing import Any, Iterator, Tuple, Union
 
 import numpy as np
 import pandas as pd
 from core.schema import SensorSummary as SchemaSensorSummary
 from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.measurement_codec import encode_measurements
 from sensor_api_wrappers.data_transfer_object.sensorDTO import SensorDTO
 
+# numbers of a geometry string
+WKT_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+@lru_cache(maxsize=1024)
+def polygon_coordinates(geometryString: str) -> np.ndarray:
+    """parses the coordinates of a polygon string, cached as the stationary box of a sensor is the same for all of its days
+    :param geometryString: string of the geometry of the polygon (e.g POLYGON ((long lat, long lat, ...)) )
+    :return: read only array of (long, lat) rows
+    """
+    coordinates = np.array(WKT_NUMBER.findall(geometryString), dtype=float).reshape(-1, 2)
+    coordinates.flags.writeable = False
+    return coordinates
+
 
 class SensorWritable(SensorDTO):
     """Sensor Data Transfer Object, used to transfer and process data between api wrappers, main API and the database"""
@@ -29,6 +44,12 @@ class SensorWritable(SensorDTO):
         :return: json string of the dataframe"""
         return df.to_json(orient="index")
 
+    def to_columnar(self, df: pd.DataFrame) -> bytes:
+        """Converts the dataframe to the compact columnar binary format (see measurement_codec).
+        :param df: dataframe of sensor data indexed by timestamp
+        :return: compressed columnar bytes of the dataframe"""
+        return encode_measurements(df)
+
     def create_sensor_summaries(self, stationary_box: str) -> Iterator[SchemaSensorSummary]:
         """Creates a summary of the sensor data to be written to the database. skips generating a geometry if the sensor has a stationary box
         param stationary_box: geometry string of the stationary box
@@ -47,87 +68,130 @@ class SensorWritable(SensorDTO):
                     timestamp=int(dt.datetime.now().timestamp()), sensor_id=self.id, geom=None, measurement_count=0, measurement_data='{"message": "no data found"}', stationary=False
                 )
         else:
-            data_dict = self.dataframe_to_dict(self.df)
-            # sensor_summaries = []
-
-            for timestampKey in data_dict:
-                df = data_dict[timestampKey]
-                stationaryBool = False
-                if stationary_box is None:
-                    geometry_string = self.generate_geomertyString(df)
-                    # if there is no location data then yield an empty sensor summary with an error message
-                    if geometry_string is None:
-                        yield SchemaSensorSummary(
-                            timestamp=timestampKey,
-                            sensor_id=self.id,
-                            geom=None,
-                            measurement_count=0,
-                            measurement_data='{"message": "no location data found or an error occured while generating the geometry string"}',
-                            stationary=False,
-                        )
-                        continue
-
-                else:
-                    (df, geometry_string) = self.is_within_stationary_box(df, stationary_box, threshold=2)
-
-                    stationaryBool = True if geometry_string == stationary_box else False
+            # MEASUREMENT_STORAGE_FORMAT=columnar stores the measurements in measurement_blob instead of the json measurement_data
+            columnar = env.get("MEASUREMENT_STORAGE_FORMAT", "json").lower() == "columnar"
+            try:
+                (frame, keys, boundaries) = self.split_into_days(self.df)
+            except KeyError as e:
+                print(e)
+                return
+
+            # the geometries of all the days are created at once, the stationary box is only parsed once
+            (geometries, stationary) = self.day_geometries(frame, boundaries, stationary_box, threshold=2)
+
+            for i, timestampKey in enumerate(keys.tolist()):
+                # if there is no location data then yield an empty sensor summary with an error message
+                if geometries[i] is None:
+                    yield SchemaSensorSummary(
+                        timestamp=timestampKey,
+                        sensor_id=self.id,
+                        geom=None,
+                        measurement_count=0,
+                        measurement_data='{"message": "no location data found or an error occured while generating the geometry string"}',
+                        stationary=False,
+                    )
+                    continue
+
+                df = frame.iloc[boundaries[i] : boundaries[i + 1]].copy(deep=False)
+                if stationary[i]:
+                    df = self.move_to_centre(df, stationary_box)
 
                 sensorSummary = SchemaSensorSummary(
                     timestamp=timestampKey,
                     sensor_id=self.id,
-                    geom=geometry_string,
+                    geom=geometries[i],
                     measurement_count=len(df.index.values),
-                    measurement_data=self.to_json(df),
-                    stationary=stationaryBool,
+                    measurement_data=None if columnar else self.to_json(df),
+                    measurement_blob=self.to_columnar(df) if columnar else None,
+                    stationary=bool(stationary[i]),
                 )  # inserting row into temp array
                 yield sensorSummary  # assign new dataframe to coressponding key
 
-            # return sensor_summaries
+    def day_bounds(self, frame: pd.DataFrame, boundaries: np.ndarray) -> np.ndarray:
+        """computes the bounding box of the readings of every day at once
+        :param frame: dataframe of sensor data sorted by day (see split_into_days)
+        :param boundaries: position of the first reading of each day, followed by the end of the last day
+        :return: array of (min long, min lat, max long, max lat) rows, NaN for the days without location data
+        """
+        starts = boundaries[:-1]
+        bounds = np.full((len(starts), 4), np.nan)
+        columns = frame.columns
+        if len(frame.index) == 0 or SensorMeasurementsColumns.LATITUDE.value not in columns or SensorMeasurementsColumns.LONGITUDE.value not in columns:
+            return bounds
+
+        latitude = pd.to_numeric(frame[SensorMeasurementsColumns.LATITUDE.value], errors="coerce").to_numpy(dtype=float)
+        longitude = pd.to_numeric(frame[SensorMeasurementsColumns.LONGITUDE.value], errors="coerce").to_numpy(dtype=float)
+        # fmin and fmax skip missing coordinates, like the min and max of a dataframe
+        bounds[:, 0] = np.fmin.reduceat(longitude, starts)
+        bounds[:, 1] = np.fmin.reduceat(latitude, starts)
+        bounds[:, 2] = np.fmax.reduceat(longitude, starts)
+        bounds[:, 3] = np.fmax.reduceat(latitude, starts)
+        return bounds
+
+    def bounding_box_strings(self, bounds: np.ndarray) -> list[str]:
+        """generates the geometry strings of bounding boxes
+        :param bounds: array of (min long, min lat, max long, max lat) rows (see day_bounds)
+        :return: geometry string of each bounding box, None if it has no location data
+        """
+        bounds = bounds.copy()
+        # if there is only one location, then create a bounding box of 0.0001 degrees
+        single_location = (bounds[:, 0] == bounds[:, 2]) & (bounds[:, 1] == bounds[:, 3])
+        bounds[single_location] += [-0.0001, -0.0001, 0.0001, 0.0001]
+
+        # POLYGON(minx miny,minx Maxy,maxx Maxy,maxx miny,minx miny)
+        return [
+            None if math.isnan(min_y) else "POLYGON(({} {},{} {},{} {},{} {},{} {}))".format(min_x, min_y, min_x, max_y, max_x, max_y, max_x, min_y, min_x, min_y)
+            for (min_x, min_y, max_x, max_y) in bounds.tolist()
+        ]
+
+    def day_geometries(self, frame: pd.DataFrame, boundaries: np.ndarray, stationary_box: str = None, threshold: float = 2) -> Tuple[list[str], np.ndarray]:
+        """creates the geometry of every day at once. A day is within the stationary box if it has no location data or if the distance between
+        the centre of the box and its min or max coordinates is less than the threshold, otherwise its geometry is the bounding box of its readings
+        :param frame: dataframe of sensor data sorted by day (see split_into_days)
+        :param boundaries: position of the first reading of each day, followed by the end of the last day
+        :param stationary_box: geometry string of the stationary box, None if the sensor does not have one
+        :param threshold: threshold distance in km to check if the coordinates are within the stationary box, default is 2km
+        :return: geometry string of each day (None if it has no location data and there is no stationary box), whether each day is within the stationary box
+        """
+        bounds = self.day_bounds(frame, boundaries)
+        geometries = self.bounding_box_strings(bounds)
+        if stationary_box is None:
+            return geometries, np.zeros(len(geometries), dtype=bool)
+
+        (centerPoint_long, centerPoint_lat) = self.get_centre_of_polygon(stationary_box)
+        with np.errstate(invalid="ignore"):
+            stationary = (
+                np.isnan(bounds[:, 1])
+                | (self.haversine(centerPoint_long, centerPoint_lat, bounds[:, 0], bounds[:, 1]) < threshold)
+                | (self.haversine(centerPoint_long, centerPoint_lat, bounds[:, 2], bounds[:, 3]) < threshold)
+            )
+        return [stationary_box if is_stationary else geometry for geometry, is_stationary in zip(geometries, stationary.tolist())], stationary
+
+    def move_to_centre(self, df: pd.DataFrame, boxGeometry: str) -> pd.DataFrame:
+        """replaces the gps coordinates of the dataframe with the centre of the stationary box
+        :param df: dataframe of sensor data
+        :param boxGeometry: geometry string of the stationary box
+        :return: dataframe with the coordinates replaced
+        """
+        (centerPoint_long, centerPoint_lat) = self.get_centre_of_polygon(boxGeometry)
+        df[SensorMeasurementsColumns.LATITUDE.value] = centerPoint_lat
+        df[SensorMeasurementsColumns.LONGITUDE.value] = centerPoint_long
+        return df
 
     def generate_geomertyString(self, df: pd.DataFrame) -> str:
         """generates a geometry string from a dataframe of sensor data
         :param df: dataframe of sensor data
         :return: geometry string
         """
-        try:
-            if math.isnan(df[SensorMeasurementsColumns.LATITUDE.value].min()):
-                raise AssertionError("No location data found")
-
-            min_y = df[SensorMeasurementsColumns.LATITUDE.value].min()
-            max_y = df[SensorMeasurementsColumns.LATITUDE.value].max()
-
-            min_x = df[SensorMeasurementsColumns.LONGITUDE.value].min()
-            max_x = df[SensorMeasurementsColumns.LONGITUDE.value].max()
-
-            # if there is only one location, then create a bounding box of 0.0001 degrees
-            if min_y == max_y and min_x == max_x:
-                min_y -= 0.0001
-                max_y += 0.0001
-                min_x -= 0.0001
-                max_x += 0.0001
-
-            # POLYGON(minx miny,minx Maxy,maxx Maxy,maxx miny,minx miny)
-            geometry_string = "POLYGON(({} {},{} {},{} {},{} {},{} {}))".format(min_x, min_y, min_x, max_y, max_x, max_y, max_x, min_y, min_x, min_y)
-
-        except AssertionError:
-            geometry_string = None
-
-        return geometry_string
+        return self.bounding_box_strings(self.day_bounds(df, np.array([0, len(df.index)])))[0]
 
     def get_centre_of_polygon(self, geometryString: str) -> Tuple[float, float]:
         """gets the centre point of a polygon string, by averaging the x and y coordinates
         :param geometryString: string of the geometry of the polygon (e.g POLYGON ((long,lat)) )
         :return: tuple of the centre point (long,lat)
         """
-        latitude = np.array([])
-        longitude = np.array([])
-
-        for coordsPair in geometryString.split("POLYGON ((")[1].split("))")[0].split(", "):
-            long, lat = coordsPair.split(" ")
-            latitude = np.append(latitude, float(lat))
-            longitude = np.append(longitude, float(long))
-
-        return longitude.mean(), latitude.mean()
+        (longitude, latitude) = polygon_coordinates(geometryString).mean(axis=0)
+        return float(longitude), float(latitude)
 
     def is_within_stationary_box(self, df: pd.DataFrame, boxGeometry: str, threshold: float = 2) -> Tuple[pd.DataFrame, str]:
         """replaces the gps coordinates of the dataframe with the given coordinates if the distance between the two is less than 2km
@@ -138,85 +202,70 @@ class SensorWritable(SensorDTO):
         :param threshold: threshold distance in km to check if the coordinates are within the stationary box, default is 2km
         :return: dataframe, with the coordinates replaced only if the distance is less than 2km or if the coordinates are not valid/NaN. Bounding box string
         """
+        (geometries, stationary) = self.day_geometries(df, np.array([0, len(df.index)]), boxGeometry, threshold)
+        if stationary[0]:
+            df = self.move_to_centre(df, boxGeometry)
+        return df, geometries[0]
 
-        (centerPoint_long, centerPoint_lat) = self.get_centre_of_polygon(boxGeometry)
-
-        boundingBoxString = boxGeometry
-
-        # if the dataframe has no location data, then replace the dataframe with the given coordinates
-        if not df.columns.__contains__(SensorMeasurementsColumns.LATITUDE.value) or math.isnan(df[SensorMeasurementsColumns.LATITUDE.value].min()):
-            df[SensorMeasurementsColumns.LATITUDE.value] = centerPoint_lat
-            df[SensorMeasurementsColumns.LONGITUDE.value] = centerPoint_long
-        else:
-            # check if the center point is within the threshold of the min coordinates, if so then replace the coordinates with the stationary box coordinates
-            if self.haversine(centerPoint_long, centerPoint_lat, df[SensorMeasurementsColumns.LONGITUDE.value].min(), df[SensorMeasurementsColumns.LATITUDE.value].min()) < threshold:
-                df[SensorMeasurementsColumns.LATITUDE.value] = centerPoint_lat
-                df[SensorMeasurementsColumns.LONGITUDE.value] = centerPoint_long
-            # check if the center point is within the threshold of the max coordinates, if so then replace the coordinates with the stationary box coordinates
-            elif self.haversine(centerPoint_long, centerPoint_lat, df[SensorMeasurementsColumns.LONGITUDE.value].max(), df[SensorMeasurementsColumns.LATITUDE.value].max()) < threshold:
-                df[SensorMeasurementsColumns.LATITUDE.value] = centerPoint_lat
-                df[SensorMeasurementsColumns.LONGITUDE.value] = centerPoint_long
-            # if locations are not within the threshold then generate a new bounding box
-            else:
-                boundingBoxString = self.generate_geomertyString(df)
-
-        return df, boundingBoxString
-
-    def haversine(self, lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-        """Calculate the great circle distance in kilometers between two points on the earth (specified in decimal degrees)
+    def haversine(self, lon1: Union[float, np.ndarray], lat1: Union[float, np.ndarray], lon2: Union[float, np.ndarray], lat2: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """Calculate the great circle distance in kilometers between two points on the earth (specified in decimal degrees), or element wise between arrays of points
         :reference: https://stackoverflow.com/questions/4913349/haversine-formula-in-python-bearing-and-distance-between-two-gps-points
         :param lon1: longitude of point 1
         :param lat1: latitude of point 1
         :param lon2: longitude of point 2
         :param lat2: latitude of point 2
-        :return: Distance in km as a float
+        :return: Distance in km as a float, or an array of distances
         """
 
         # convert decimal degrees to radians
-        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+        lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
 
         # haversine formula
         dlon = lon2 - lon1
         dlat = lat2 - lat1
-        a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-        c = 2 * asin(sqrt(a))
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        c = 2 * np.arcsin(np.sqrt(a))
         r = 6372.8  # Radius of earth in kilometers. Use 3956 for miles. Determines return value units.
         return c * r
 
-    def dataframe_to_dict(self, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
-        """converts a dataframe to a dictionary of dataframes with timestamp keys.
-        :param df: dataframe to convert
-        :return: dictionary of dataframes with timestamp keys
+    def split_into_days(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """splits a dataframe into days in a single pass. The rows are put in date order (a stable sort, skipped if they already are)
+        and each day is the slice between its boundaries, so the readings of the days are not copied.
+        :param df: dataframe to split, indexed by date
+        :return: dataframe indexed by unix timestamp and sorted by day, the 'midnight' timestamps of the days,
+        the position of the first reading of each day followed by the end of the last day
         """
-        data = {}  # intialise empty dictionary to store each day of records
-
-        # using the dates which are already supplied. This strategy in the line below converts them and rounds down to date using 'd' flag
-        # This strategy (line below) will keep just the date
-        df.loc[:, "day"] = pd.to_datetime(df.index, dayfirst=True, errors="coerce").date
-
-        # remove any duplicate dates or only extract the unique ones
-        the_unique_dates = df["day"].unique()
-
-        # splitting the dataframe into separate days
-        # for each day in unique dates set:
-        for day in the_unique_dates:
-            try:
-                # In my code below I assign the subset of records to a new dataframe called dft
-                # create 'midnight' timestamps
-                timestampKey = int((pd.to_datetime(day, errors="coerce")).timestamp())
-
-                # select the records for this day
-                # TODO - this .copy() might be a problem since pandas is not thread safe
-                df_day_subset = df[df["day"] == day].copy(deep=False)
-
-                # drop the day column to save memory (we don't need this anymore)
-                df_day_subset.drop("day", axis=1, inplace=True)
-                df_day_subset.set_index(SensorMeasurementsColumns.TIMESTAMP.value, inplace=True)
-
-                data[timestampKey] = df_day_subset
-
-            except KeyError as e:
-                # TODO raise exception? or continue?
-                print(e)
+        frame = df.set_index(SensorMeasurementsColumns.TIMESTAMP.value)
+
+        # the day of a reading is the date of its index (the local date if the index has a timezone)
+        dates = pd.DatetimeIndex(pd.to_datetime(df.index, dayfirst=True, errors="coerce"))
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        # rows without a valid date can not be assigned to a day
+        valid = ~np.asarray(dates.isna())
+        if not valid.all():
+            frame = frame[valid]
+            dates = dates[valid]
+        # create 'midnight' timestamps of every reading at once
+        days = np.asarray((dates.normalize() - pd.Timestamp(0)) // pd.Timedelta(seconds=1), dtype=np.int64)
+        if len(days) > 1 and (days[1:] < days[:-1]).any():
+            order = np.argsort(days, kind="stable")
+            frame = frame.iloc[order]
+            days = days[order]
+
+        keys = np.unique(days)
+        return frame, keys, np.append(np.searchsorted(days, keys), len(days))
+
+    def dataframe_to_dict(self, df: pd.DataFrame) -> dict[int, pd.DataFrame]:
+        """splits a dataframe into days (see split_into_days)
+        :param df: dataframe to convert, indexed by date
+        :return: dictionary of dataframes indexed by unix timestamp, with the 'midnight' timestamp of their day as keys
+        """
+        try:
+            (frame, keys, boundaries) = self.split_into_days(df)
+        except KeyError as e:
+            print(e)
+            return {}
 
-        return data
+        # the shallow copy of each slice shares its data but can get columns of its own (e.g move_to_centre)
+        return {int(key): frame.iloc[start:end].copy(deep=False) for key, start, end in zip(keys, boundaries[:-1], boundaries[1:])}
@@ -0,0 +1,104 @@
+"""HTTP client shared by the sensor factories.
+
+Sessions keep a pool of keep-alive connections for each host, so the TLS handshake is only paid once per connection
+instead of once per request. Every request gets a default connect and read timeout, so a hung socket can not stall an
+ingestion task. Idempotent requests are retried on connection errors and on 5xx responses with an exponential
+backoff plus random jitter (so the concurrent fetch jobs of a vendor do not retry in lockstep), and a Retry-After
+header is respected. Requests are paced by the token bucket of their vendor, and 429 responses are retried once the
+bucket of the vendor allows it again (see rate_limiter.py).
+
+The settings are read from the environment:
+    VENDOR_HTTP_CONNECT_TIMEOUT: seconds to wait for a connection (default 5)
+    VENDOR_HTTP_READ_TIMEOUT: seconds to wait for data from the server (default 60)
+    VENDOR_HTTP_RETRIES: number of retries of a failed request (default 3)
+"""
+
+import random
+import threading
+from os import environ as env
+
+import requests
+from requests.adapters import HTTPAdapter
+from sensor_api_wrappers.rate_limiter import parse_retry_after, rate_limiter_for_url
+from urllib3.util.retry import Retry
+
+# number of hosts with a connection pool and number of connections kept alive in each pool
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 8
+# the nth retry waits backoff factor * 2^(n-1) seconds plus up to as much again of jitter
+BACKOFF_FACTOR = 0.5
+# 429 responses are retried by TimeoutHTTPAdapter, which holds the token bucket of the vendor
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+class JitteredRetry(Retry):
+    """Retry configuration that adds a random jitter to the exponential backoff"""
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that applies a default timeout to requests that do not set one and paces requests with the token bucket of their vendor"""
+
+    def __init__(self, *args, timeout: tuple[float, float], rate_limit_retries: int = 0, **kwargs):
+        self.timeout = timeout
+        self.rate_limit_retries = rate_limit_retries
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        rate_limiter = rate_limiter_for_url(request.url)
+        attempt = 0
+        while True:
+            rate_limiter.acquire()
+            response = super().send(request, **kwargs)
+            if response.status_code != 429:
+                rate_limiter.succeeded()
+                return response
+            # the vendor is held for every thread, not only for this request
+            rate_limiter.throttled(parse_retry_after(response.headers.get("Retry-After")))
+            if attempt >= self.rate_limit_retries:
+                return response
+            attempt += 1
+            response.close()
+
+
+def create_session(pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    """creates a session with pooled connections, default timeouts, retries and gzip negotiation.
+    Use a session of its own for a vendor that stores authentication headers on the session
+    :param pool_maxsize: number of connections kept alive for each host
+    :return: session"""
+    timeout = (float(env.get("VENDOR_HTTP_CONNECT_TIMEOUT", 5)), float(env.get("VENDOR_HTTP_READ_TIMEOUT", 60)))
+    total = int(env.get("VENDOR_HTTP_RETRIES", 3))
+    retries = JitteredRetry(
+        total=total,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        respect_retry_after_header=True,
+        # the last response is returned rather than raised so that the factories can handle vendor errors themselves
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(timeout=timeout, rate_limit_retries=total, max_retries=retries, pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+def vendor_session() -> requests.Session:
+    """returns the session shared by the sensor factories that do not keep authentication state on a session
+    :return: shared session"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
@@ -0,0 +1,155 @@
+"""Per vendor rate limiting of the requests made by the sensor factories.
+
+Each vendor api has a token bucket: a request takes a token, the tokens are refilled at the rate of the vendor and a
+full bucket allows a short burst. The buckets adapt to the vendors: a 429 (too many requests) response halves the rate
+of its vendor and holds the bucket for the time of the Retry-After header, so every thread that fetches from the vendor
+waits instead of only the thread that got the response, and each successful response recovers part of the configured
+rate. The buckets of the other vendors are not affected, so their fetch jobs keep running while a vendor is held.
+
+The settings are read from the environment:
+    VENDOR_RATE_LIMITS: requests per second of each vendor, e.g "purpleair=1,zephyr=2.5" (see DEFAULT_RATE_LIMITS)
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from os import environ as env
+from urllib.parse import urlsplit
+
+# requests per second of each vendor
+DEFAULT_RATE_LIMITS = {"plume": 5, "zephyr": 5, "sensorcommunity": 10, "purpleair": 1, "airgradient": 2, "generic": 5}
+# hosts of the vendor apis, the requests to other hosts are limited per host at the generic rate
+VENDOR_HOSTS = {
+    "api-preprod.plumelabs.com": "plume",
+    "data.earthsense.co.uk": "zephyr",
+    "archive.sensor.community": "sensorcommunity",
+    "api-rrd.madavi.de": "sensorcommunity",
+    "map.purpleair.com": "purpleair",
+    "api.purpleair.com": "purpleair",
+    "api.airgradient.com": "airgradient",
+}
+# seconds a vendor is held after a 429 response without a Retry-After header
+DEFAULT_RETRY_AFTER = 5
+# the rate of a vendor is never reduced below this fraction of its configured rate
+MIN_RATE_FRACTION = 0.05
+# fraction of the configured rate recovered after each successful response
+RECOVERY_FRACTION = 0.05
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread safe token bucket with an adaptive rate"""
+
+    def __init__(self, rate: float, burst: float = None, clock=time.monotonic, sleep=time.sleep):
+        """Initialises the bucket
+        :param rate: tokens added per second
+        :param burst: size of the bucket, defaults to one second of tokens (at least one token)
+        :param clock: monotonic clock in seconds
+        :param sleep: function used to wait for a token"""
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.held_until = 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """adds the tokens of the time since the last refill, no tokens are added while the bucket is held"""
+        start = max(self._updated, self.held_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def _wait_time(self, now: float) -> float:
+        return max(self.held_until - now, (1 - self.tokens) / self.rate, 0.0)
+
+    def delay(self) -> float:
+        """:return: seconds until a token is available"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return self._wait_time(now)
+
+    def acquire(self):
+        """takes a token, waits until one is available"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                wait = self._wait_time(now)
+                if wait <= 0:
+                    self.tokens -= 1
+                    return
+            self._sleep(wait)
+
+    def hold(self, seconds: float):
+        """stops handing out tokens for a time (e.g while the vendor is still loading data), the requests restart one at a time
+        :param seconds: seconds to hold the bucket"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.held_until = max(self.held_until, now + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+    def throttled(self, retry_after: float = None):
+        """records a 429 response: the rate is halved and the bucket is held
+        :param retry_after: seconds from the Retry-After header of the response"""
+        with self._lock:
+            self.rate = max(self.configured_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self.hold(DEFAULT_RETRY_AFTER if retry_after is None else retry_after)
+
+    def succeeded(self):
+        """records a successful response: part of the configured rate is recovered"""
+        with self._lock:
+            self.rate = min(self.configured_rate, self.rate + self.configured_rate * RECOVERY_FRACTION)
+
+
+def parse_retry_after(value: str) -> float:
+    """parses a Retry-After header
+    :param value: number of seconds or http date
+    :return: seconds to wait or None if the header is missing or invalid"""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limits() -> dict[str, float]:
+    """:return: requests per second of each vendor, the defaults updated with VENDOR_RATE_LIMITS"""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in env.get("VENDOR_RATE_LIMITS", "").split(","):
+        if "=" in item:
+            (vendor, rate) = item.split("=", 1)
+            limits[vendor.strip().lower()] = float(rate)
+    return limits
+
+
+def _bucket(key: str, vendor: str) -> TokenBucket:
+    if key not in _buckets:
+        with _buckets_lock:
+            if key not in _buckets:
+                _buckets[key] = TokenBucket(rate_limits().get(vendor, DEFAULT_RATE_LIMITS["generic"]))
+    return _buckets[key]
+
+
+def vendor_rate_limiter(vendor: str) -> TokenBucket:
+    """:return: the token bucket shared by the requests to a vendor"""
+    return _bucket(vendor, vendor)
+
+
+def rate_limiter_for_url(url: str) -> TokenBucket:
+    """:return: the token bucket of the vendor of a url, or of its host if it is not the api of a known vendor"""
+    host = urlsplit(url).hostname or ""
+    vendor = VENDOR_HOSTS.get(host)
+    return vendor_rate_limiter(vendor) if vendor else _bucket(host, "generic")
@@ -1,6 +1,8 @@
 import datetime as dt
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from os import environ as env
-from typing import Iterator
+from typing import BinaryIO, Callable, Iterator
 
 # sensor summary
 from core.schema import SensorPlatform as SchemaSensor
@@ -15,6 +17,13 @@ from sensor_api_wrappers.concrete.factories.zephyr_factory import ZephyrFactory
 from sensor_api_wrappers.interfaces.sensor_factory import SensorFactory
 
 
+# maximum number of sensors fetched at the same time from each vendor's api
+VENDOR_CONCURRENCY = {"plume": 1, "zephyr": 4, "sensorcommunity": 4, "purpleair": 2, "airgradient": 4, "generic": 2}
+
+# marks the end of a fetch job in the results queue of fetch_sensor_data_concurrently
+_JOB_DONE = object()
+
+
 class SensorPlatformFactoryWrapper:
     """Wrapper class for all the different sensor platform factories, which fetch sensor data from the different apis"""
 
@@ -58,7 +67,7 @@ class SensorPlatformFactoryWrapper:
         Returns:
             Iterator[SchemaSensorSummary]: An iterator yielding sensor summaries.
         """
-        # we use a copy because for some sensor platforms (purple air) we edit the dictionary on retry (pop off completed sensor tasks)
+        # the factories get a copy so that they can not change the dictionary of the caller
         for sensor in sensor_factory.get_sensors(sensor_dict.copy(), start, end, *args):
             if sensor is not None:
                 yield from sensor.create_sensor_summaries(sensor_dict[sensor.id]["stationary_box"])
@@ -83,47 +92,158 @@ class SensorPlatformFactoryWrapper:
             yield from self.fetch_data(self.scf, start, end, sensor_dict)
         elif "purpleair" in sensor_type.lower():
             self.paf.login()
-            # we use a copy because we edit the dictionary on retry (pop off completed sensor tasks)
             yield from self.fetch_data(self.paf, start, end, sensor_dict)
         elif "airgradient" in sensor_type.lower():
             yield from self.fetch_data(self.agf, start, end, sensor_dict)
         elif "generic" in sensor_type.lower():
-            # We need to group the generic sensors by sensor platform type, because if they are the same type, they can share the same factory instance
-            sensor_dicts = {}
-            for sensor_id, sensor_info in sensor_dict.items():
-                api_url = sensor_info["api_url"]
-                if api_url not in sensor_dicts:
-                    sensor_dicts[api_url] = {}
-                sensor_dicts[api_url][sensor_id] = {
-                    "stationary_box": sensor_info["stationary_box"],
-                    "authentication_url": sensor_info["authentication_url"],
-                    "api_url": api_url,
-                    "authentication_method": sensor_info["authentication_method"],
-                    "api_method": sensor_info["api_method"],
-                    "sensor_mappings": sensor_info["sensor_mappings"],
-                }
-
-            for api_url in sensor_dicts:
-                sensor_dictionary = sensor_dicts[api_url]
-                shared_sensor_config = sensor_dictionary[next(iter(sensor_dictionary))]  # get the first sensor's config
-                generic_sensor_factory = GenericFactory(
-                    auth_url=shared_sensor_config["authentication_url"],
-                    auth_method=shared_sensor_config["authentication_method"],
-                    api_url=shared_sensor_config["api_url"],
-                    api_method=shared_sensor_config["api_method"],
-                    api_key=shared_sensor_config["api_method"].get("api_key_value", None),
-                )
-                yield from self.fetch_data(generic_sensor_factory, start, end, sensor_dictionary)
+            for sensor_dictionary in self.group_generic_sensors(sensor_dict).values():
+                yield from self.fetch_data(self.create_generic_factory(sensor_dictionary), start, end, sensor_dictionary)
+        else:
+            raise ValueError(f"Unsupported sensor type: {sensor_type}")
+
+    def group_generic_sensors(self, sensor_dict: dict[str, dict]) -> dict[str, dict]:
+        """Groups the generic sensors by api url, sensors of the same sensor platform type share a factory instance
+
+        Args:
+            sensor_dict (dict[str, dict]): A dictionary of the data ingestion information for each generic sensor
+        Returns:
+            dict[str, dict]: A dictionary mapping each api url to the data ingestion information of its sensors.
+        """
+        sensor_dicts = {}
+        for sensor_id, sensor_info in sensor_dict.items():
+            api_url = sensor_info["api_url"]
+            if api_url not in sensor_dicts:
+                sensor_dicts[api_url] = {}
+            sensor_dicts[api_url][sensor_id] = {
+                "stationary_box": sensor_info["stationary_box"],
+                "authentication_url": sensor_info["authentication_url"],
+                "api_url": api_url,
+                "authentication_method": sensor_info["authentication_method"],
+                "api_method": sensor_info["api_method"],
+                "sensor_mappings": sensor_info["sensor_mappings"],
+            }
+        return sensor_dicts
+
+    def create_generic_factory(self, sensor_dictionary: dict[str, dict]) -> GenericFactory:
+        """Creates the factory of a group of generic sensors (see group_generic_sensors)
+
+        Args:
+            sensor_dictionary (dict[str, dict]): A dictionary of the data ingestion information for generic sensors with the same api url
+        Returns:
+            GenericFactory: A factory configured with the first sensor's config.
+        """
+        shared_sensor_config = sensor_dictionary[next(iter(sensor_dictionary))]  # get the first sensor's config
+        return GenericFactory(
+            auth_url=shared_sensor_config["authentication_url"],
+            auth_method=shared_sensor_config["authentication_method"],
+            api_url=shared_sensor_config["api_url"],
+            api_method=shared_sensor_config["api_method"],
+            api_key=shared_sensor_config["api_method"].get("api_key_value", None),
+        )
+
+    def create_fetch_jobs(self, sensor_type: str, start: dt.datetime, end: dt.datetime, sensor_dict: dict[str, dict]) -> tuple[str, list[Callable[[], Iterator[SchemaSensorSummary]]]]:
+        """Splits the data ingestion of a sensor type into jobs that can run concurrently.
+        Sensors are fetched one request after another by the factories, so each sensor is a separate job when the factory has no shared state.
+        Plume sensors are fetched together (the factory batches sensors into zip exports) and generic sensors are grouped by api url because each group shares a session.
+
+        Args:
+            sensor_type (str): The type of the sensor.
+            start (dt.datetime): The start date of the data to fetch.
+            end (dt.datetime): The end date of the data to fetch.
+            sensor_dict (dict[str, dict]): A dictionary of the data ingestion information for each sensor
+        Returns:
+            tuple[str, list[Callable]]: The vendor of the sensor type and the jobs, each job returns an iterator of sensor summaries.
+        """
+        if "plume" in sensor_type.lower():
+            self.pf.login()
+            return "plume", [lambda: self.fetch_data(self.pf, start, end, sensor_dict)]
+        elif "zephyr" in sensor_type.lower():
+            return "zephyr", self.create_sensor_fetch_jobs(self.zf, start, end, sensor_dict, "B")
+        elif "sensorcommunity" in sensor_type.lower():
+            return "sensorcommunity", self.create_sensor_fetch_jobs(self.scf, start, end, sensor_dict)
+        elif "purpleair" in sensor_type.lower():
+            self.paf.login()
+            return "purpleair", self.create_sensor_fetch_jobs(self.paf, start, end, sensor_dict)
+        elif "airgradient" in sensor_type.lower():
+            return "airgradient", self.create_sensor_fetch_jobs(self.agf, start, end, sensor_dict)
+        elif "generic" in sensor_type.lower():
+            return "generic", [
+                lambda sensor_dictionary=sensor_dictionary: self.fetch_data(self.create_generic_factory(sensor_dictionary), start, end, sensor_dictionary)
+                for sensor_dictionary in self.group_generic_sensors(sensor_dict).values()
+            ]
         else:
             raise ValueError(f"Unsupported sensor type: {sensor_type}")
 
-    def upload_user_input_sensor_data(self, sensor_type: str, sensor_dict: dict[str, str], file: bytes) -> Iterator[SchemaSensorSummary]:
+    def create_sensor_fetch_jobs(self, sensor_factory: SensorFactory, start: dt.datetime, end: dt.datetime, sensor_dict: dict[str, dict], *args) -> list[Callable[[], Iterator[SchemaSensorSummary]]]:
+        """Creates a fetch job for each sensor of a factory (see create_fetch_jobs)
+
+        Args:
+            sensor_factory (SensorFactory): The sensor factory to fetch data from.
+            start (dt.datetime): The start date of the data to fetch.
+            end (dt.datetime): The end date of the data to fetch.
+            sensor_dict (dict[str, dict]): A dictionary of the data ingestion information for each sensor
+            *args: Additional arguments to pass to the sensor factory's get_sensors method (for example, slot for zephyr sensors).
+        Returns:
+            list[Callable]: one job per sensor, each job returns an iterator of sensor summaries.
+        """
+        return [lambda lookupid=lookupid: self.fetch_data(sensor_factory, start, end, {lookupid: sensor_dict[lookupid]}, *args) for lookupid in sensor_dict]
+
+    def fetch_sensor_data_concurrently(self, sensor_dict: dict[str, dict], start: dt.datetime, end: dt.datetime) -> Iterator[tuple[str, SchemaSensorSummary]]:
+        """Fetches the sensor data of every sensor type at the same time and yields each sensor summary as soon as it is created.
+        Every vendor has its own worker pool (see VENDOR_CONCURRENCY) so a slow api does not hold up the others,
+        and the time to fetch all the sensors approaches the time of the slowest vendor rather than the sum of all of them.
+
+        Args:
+            sensor_dict (dict[str, dict]): A dictionary mapping each sensor type to the data ingestion information of its sensors
+            start (dt.datetime): The start date of the data to fetch.
+            end (dt.datetime): The end date of the data to fetch.
+        Returns:
+            Iterator[tuple[str, SchemaSensorSummary]]: An iterator yielding the sensor type and sensor summary, in the order the sensors finish.
+        Raises:
+            Exception: any error raised by a fetch job (after the jobs that are already running have been cancelled)
+        """
+        results = queue.Queue()
+
+        def run(sensor_type: str, job: Callable[[], Iterator[SchemaSensorSummary]]):
+            try:
+                for sensor_summary in job():
+                    results.put((sensor_type, sensor_summary))
+            except Exception as e:
+                results.put((sensor_type, e))
+            finally:
+                results.put(_JOB_DONE)
+
+        executors = {}
+        job_count = 0
+        try:
+            for sensor_type, sensor_type_dict in sensor_dict.items():
+                vendor, jobs = self.create_fetch_jobs(sensor_type, start, end, sensor_type_dict)
+                if vendor not in executors:
+                    executors[vendor] = ThreadPoolExecutor(max_workers=VENDOR_CONCURRENCY[vendor], thread_name_prefix=f"fetch-{vendor}")
+                for job in jobs:
+                    executors[vendor].submit(run, sensor_type, job)
+                    job_count += 1
+
+            while job_count > 0:
+                result = results.get()
+                if result is _JOB_DONE:
+                    job_count -= 1
+                elif isinstance(result[1], Exception):
+                    raise result[1]
+                else:
+                    yield result
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def upload_user_input_sensor_data(self, sensor_type: str, sensor_dict: dict[str, str], file: BinaryIO) -> Iterator[SchemaSensorSummary]:
         """Uploads user input sensor data from a file and returns sensor summaries.
+        The file is parsed in chunks and the summaries are yielded a day at a time, so memory use does not depend on the size of the file.
 
         Args:
             sensor_type (str): The type of the sensor.
             sensor_dict (dict[str, str]): A dictionary of the data ingestion information for each sensor, where keys are sensor lookup_ids and values are stationary boxes.
-            file (bytes): The file containing sensor data.
+            file (BinaryIO): The file containing sensor data.
         Returns:
             Iterator[SchemaSensorSummary]: An iterator yielding sensor summaries.
         """
@@ -134,11 +254,11 @@ class SensorPlatformFactoryWrapper:
         elif "sensorcommunity" in sensor_type.lower():
             raise Exception("SensorCommunity data upload is not supported because there is no bulk export feature in the SensorCommunity API for users")
         elif "purpleair" in sensor_type.lower():
-            for sensor in self.paf.get_sensors_from_file(sensor_dict, file):
+            for sensor in self.paf.get_sensors_from_file_stream(sensor_dict, file):
                 if sensor is not None:
                     yield from sensor.create_sensor_summaries(sensor_dict[sensor.id]["stationary_box"])
         elif "airgradient" in sensor_type.lower():
-            for sensor in self.agf.get_sensors_from_file(sensor_dict, file):
+            for sensor in self.agf.get_sensors_from_file_stream(sensor_dict, file):
                 if sensor is not None:
                     yield from sensor.create_sensor_summaries(sensor_dict[sensor.id]["stationary_box"])
         else:
@@ -0,0 +1,59 @@
+"""Bounded memory parsing of uploaded sensor data files.
+
+An uploaded csv is read in chunks of rows. Each chunk is prepared by the sensor product, split by (utc) day and
+appended to a spool file of its day, so the rows of a day can be spread over the whole file while only one chunk
+and then one day of readings is held in memory.
+"""
+
+import os
+import pickle
+import tempfile
+from typing import BinaryIO, Callable, Iterator
+
+import pandas as pd
+from routers.services.enums import SensorMeasurementsColumns
+
+# number of csv rows parsed at a time
+UPLOAD_CHUNK_ROWS = 50000
+SECONDS_IN_DAY = 86400
+
+
+def readable_file(file: BinaryIO) -> BinaryIO:
+    """returns a file object that pandas and zipfile can read.
+    SpooledTemporaryFile (used by starlette for uploads) only implements readable() and seekable() from python 3.11, so its underlying file is used instead
+    :param file: uploaded file
+    :return: file object"""
+    if isinstance(file, tempfile.SpooledTemporaryFile) and not hasattr(file, "readable"):
+        return file._file
+    return file
+
+
+def spool_csv_by_day(file: BinaryIO, prepare_chunk: Callable[[pd.DataFrame], pd.DataFrame], chunk_rows: int = UPLOAD_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """parses a csv file in chunks and yields the prepared readings of one day at a time, in date order
+    :param file: binary csv file
+    :param prepare_chunk: function that prepares a chunk of csv rows, the result must have the unix Timestamp column
+    :param chunk_rows: number of rows parsed at a time
+    :return: iterator of dataframes with the readings of one day"""
+    with tempfile.TemporaryDirectory(prefix="upload-") as spool_dir:
+        spool_files = {}
+        try:
+            for chunk in pd.read_csv(readable_file(file), chunksize=chunk_rows):
+                df = prepare_chunk(chunk)
+                days = df[SensorMeasurementsColumns.TIMESTAMP.value].to_numpy() // SECONDS_IN_DAY
+                for day, part in df.groupby(days, sort=False):
+                    if day not in spool_files:
+                        spool_files[day] = open(os.path.join(spool_dir, f"{day}.pickle"), "wb")
+                    pickle.dump(part, spool_files[day], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for spool_file in spool_files.values():
+                spool_file.close()
+
+        for day in sorted(spool_files):
+            parts = []
+            with open(os.path.join(spool_dir, f"{day}.pickle"), "rb") as spool_file:
+                while True:
+                    try:
+                        parts.append(pickle.load(spool_file))
+                    except EOFError:
+                        break
+            yield pd.concat(parts)
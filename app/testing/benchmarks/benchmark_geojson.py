@@ -0,0 +1,92 @@
+"""Benchmark of SensorReadable.to_geojson against the previous iterrows implementation.
+
+The input is a 90 day export of one minute readings for a moving sensor, averaged hourly (the largest export the
+/sensor-summary/as-geojson route allows for hourly data).
+
+Run from the app directory: python -m testing.benchmarks.benchmark_geojson
+"""
+
+import math
+import timeit
+
+import numpy as np
+import pandas as pd
+from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+
+DAYS = 90
+AVERAGING_METHODS = ["mean", "count", "min", "max"]
+REPEATS = 3
+
+
+def make_sensor() -> SensorReadable:
+    """builds a sensor with DAYS of one minute readings"""
+    rows = DAYS * 1440
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(1695427200, 1695427200 + rows * 60, 60)
+    df = pd.DataFrame(
+        {
+            SensorMeasurementsColumns.TIMESTAMP.value: timestamps,
+            SensorMeasurementsColumns.NO2.value: rng.random(rows) * 40,
+            SensorMeasurementsColumns.PM1.value: rng.random(rows) * 10,
+            SensorMeasurementsColumns.PM2_5.value: rng.random(rows) * 20,
+            SensorMeasurementsColumns.PM10.value: rng.random(rows) * 30,
+            SensorMeasurementsColumns.LATITUDE.value: 52.45 + rng.random(rows) / 100,
+            SensorMeasurementsColumns.LONGITUDE.value: -1.89 + rng.random(rows) / 100,
+            "boundingBox": None,
+        },
+        index=pd.to_datetime(timestamps, unit="s"),
+    )
+    return SensorReadable(1, df)
+
+
+def legacy_to_geojson(sensor: SensorReadable, averaging_methods: list[str], averaging_frequency: str = "H") -> dict:
+    """the iterrows implementation that to_geojson replaced"""
+    latitude, longitude = SensorMeasurementsColumns.LATITUDE.value, SensorMeasurementsColumns.LONGITUDE.value
+    measurement_columns = sensor.ConvertDFToAverages(averaging_methods, averaging_frequency)
+
+    geojson = {"type": "FeatureCollection", "features": []}
+    for _, row in sensor.df.iterrows():
+        feature = {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": []}}
+        if row["boundingBox"]["first"] is None:
+            if math.isnan(row[latitude]["min"]):
+                bounding_box = []
+            else:
+                bounding_box = sensor.generate_geojson_coords(min_long=row[longitude]["min"], min_lat=row[latitude]["min"], max_long=row[longitude]["max"], max_lat=row[latitude]["max"])
+            if len(bounding_box) == 1:
+                feature["geometry"]["type"] = "Point"
+                feature["geometry"]["coordinates"] = bounding_box[0]
+            else:
+                feature["geometry"]["coordinates"] = [bounding_box]
+        else:
+            coords = [x.strip() for x in row["boundingBox"]["first"].split("(")[2].split(",")]
+            min_long, min_lat = (float(x) for x in coords[0].split(" "))
+            max_long, max_lat = (float(x) for x in coords[2].split(" "))
+            feature["geometry"]["coordinates"] = [sensor.generate_geojson_coords(min_long, min_lat, max_long, max_lat)]
+
+        feature["properties"]["datetime_UTC"] = row.name
+        for col in measurement_columns:
+            for method in averaging_methods:
+                feature["properties"][col + "_" + method] = row[col][method] if not math.isnan(row[col][method]) else None
+        geojson["features"].append(feature)
+
+    return geojson
+
+
+def main():
+    sensor = make_sensor()
+
+    legacy = legacy_to_geojson(SensorReadable(sensor.id, sensor.df), AVERAGING_METHODS)
+    vectorized = SensorReadable(sensor.id, sensor.df).to_geojson(AVERAGING_METHODS)
+    assert legacy["features"] == vectorized["features"], "the vectorized geojson does not match the legacy output"
+
+    legacy_time = min(timeit.repeat(lambda: legacy_to_geojson(SensorReadable(sensor.id, sensor.df), AVERAGING_METHODS), number=1, repeat=REPEATS))
+    vectorized_time = min(timeit.repeat(lambda: SensorReadable(sensor.id, sensor.df).to_geojson(AVERAGING_METHODS), number=1, repeat=REPEATS))
+
+    print(f"{len(vectorized['features'])} hourly features from {len(sensor.df)} readings")
+    print(f"iterrows:   {legacy_time:.3f}s")
+    print(f"vectorized: {vectorized_time:.3f}s ({legacy_time / vectorized_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
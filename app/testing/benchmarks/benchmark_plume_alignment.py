@@ -0,0 +1,91 @@
+"""Benchmark of PlumeSensor.add_measurements_json against the previous minute join of the locations and measurements.
+
+The input is a week of one minute measurements for 100 moving sensors, each with a location fix about every 20 seconds
+(the Plume api returns the positions and the measurements of a sensor separately).
+
+Run from the app directory: python -m testing.benchmarks.benchmark_plume_alignment
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.concrete.products.plume_sensor import PlumeSensor
+
+SENSORS = 100
+DAYS = 7
+REPEATS = 3
+
+
+def make_locations(rng: np.random.Generator) -> pd.DataFrame:
+    """builds the location dataframe of a sensor, as PlumeSensor.from_csv reads it"""
+    timestamps = np.sort(rng.integers(1695427200, 1695427200 + DAYS * 86400, DAYS * 4320))
+    df = pd.DataFrame(
+        {
+            "timestamp": timestamps,
+            SensorMeasurementsColumns.LATITUDE.value: 52.45 + rng.random(len(timestamps)) / 100,
+            SensorMeasurementsColumns.LONGITUDE.value: -1.89 + rng.random(len(timestamps)) / 100,
+        },
+        index=pd.to_datetime(timestamps, unit="s").floor("Min"),
+    )
+    df.index.name = "date"
+    return df
+
+
+def make_measurements(rng: np.random.Generator) -> list:
+    """builds the measurement json of a sensor, a page for every two days as PlumeFactory.get_sensor_measurement_data returns them"""
+    records = [
+        {"id": i, "date": int(date), "no2": float(no2), "voc": float(voc), "pm1": 1.0, "pm10": 3.0, "pm25": 2.0}
+        for i, (date, no2, voc) in enumerate(zip(np.arange(1695427208, 1695427208 + DAYS * 86400, 60), rng.random(DAYS * 1440) * 40, rng.random(DAYS * 1440) * 200))
+    ]
+    return [records[page : page + 2880] for page in range(0, len(records), 2880)]
+
+
+def legacy_add_measurements_json(sensor: PlumeSensor, data: list):
+    """the minute join that the merge_asof alignment replaced"""
+    df = PlumeSensor.prepare_measurements(pd.concat([pd.DataFrame.from_records(measurements) for measurements in data], ignore_index=True))
+
+    # the measurement json has no timestamp column, so it is only dropped when present
+    df.drop(columns="timestamp", inplace=True, errors="ignore")
+    sensor.df = sensor.df.join(df, how="outer")
+    sensor.df["filled_timestamps"] = sensor.df.index.astype(np.int64) // 10**9
+    sensor.df[SensorMeasurementsColumns.TIMESTAMP.value] = sensor.df[SensorMeasurementsColumns.TIMESTAMP.value].fillna(sensor.df["filled_timestamps"])
+    sensor.df.drop(columns="filled_timestamps", inplace=True)
+    sensor.df["datetime"] = pd.to_datetime(sensor.df[SensorMeasurementsColumns.TIMESTAMP.value], unit="s")
+    sensor.df.set_index("datetime", inplace=True)
+    sensor.df[SensorMeasurementsColumns.TIMESTAMP.value] = sensor.df[SensorMeasurementsColumns.TIMESTAMP.value].astype(int)
+    sensor.df.sort_index(inplace=True)
+    sensor.df = sensor.df[sensor.data_columns]
+
+
+def run(add_measurements, inputs: list) -> list[PlumeSensor]:
+    """adds the measurements of every sensor to a copy of its locations"""
+    sensors = []
+    for i, (locations, data) in enumerate(inputs):
+        sensor = PlumeSensor(str(i), locations.copy(), error=None)
+        add_measurements(sensor, data)
+        sensors.append(sensor)
+    return sensors
+
+
+def main():
+    rng = np.random.default_rng(0)
+    inputs = [(make_locations(rng), make_measurements(rng)) for _ in range(SENSORS)]
+
+    aligned = run(PlumeSensor.add_measurements_json, inputs)
+    for sensor in aligned:
+        # every measurement is kept once, with the nearest location
+        assert not sensor.df.index.duplicated().any(), "the aligned dataframe has duplicated times"
+        assert sensor.df[SensorMeasurementsColumns.NO2.value].notna().sum() == DAYS * 1440, "measurements were lost or duplicated"
+
+    legacy_time = min(timeit.repeat(lambda: run(legacy_add_measurements_json, inputs), number=1, repeat=REPEATS))
+    aligned_time = min(timeit.repeat(lambda: run(PlumeSensor.add_measurements_json, inputs), number=1, repeat=REPEATS))
+
+    print(f"{SENSORS} sensors with {DAYS * 1440} measurements and about {DAYS * 4320} locations each")
+    print(f"minute join: {legacy_time:.3f}s")
+    print(f"merge_asof:  {aligned_time:.3f}s ({legacy_time / aligned_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 from unittest import TestLoader, TestSuite
 
 from HtmlTestRunner import HTMLTestRunner
+from testing.test_arrowExport import Test_arrowExport
+from testing.test_formatting import Test_formatting
+from testing.test_measurementCodec import Test_measurementCodec
 from testing.test_plumeFactory import Test_plumeFactory
 from testing.test_plumeSensor import Test_plumeSensor
 from testing.test_purpleAirFactory import Test_purpleAirFactory
 from testing.test_purpleAirSensor import Test_purpleAirSensor
+from testing.test_queryBuilding import Test_queryBuilding
+from testing.test_responseCache import Test_responseCache
+from testing.test_rollups import Test_rollups
 from testing.test_sensorCommunityFactory import Test_sensorCommunityFactory
 from testing.test_sensorCommunitySensor import Test_sensorCommunitySensor
 from testing.test_SensorPlatformFactoryWrapper import Test_SensorFactoryWrapper
@@ -25,9 +31,15 @@ test_8 = TestLoader().loadTestsFromTestCase(Test_purpleAirSensor)
 test_9 = TestLoader().loadTestsFromTestCase(Test_SensorFactoryWrapper)
 test_10 = TestLoader().loadTestsFromTestCase(Test_sensorReadable)
 test_11 = TestLoader().loadTestsFromTestCase(Test_sensorWriteable)
+test_12 = TestLoader().loadTestsFromTestCase(Test_measurementCodec)
+test_13 = TestLoader().loadTestsFromTestCase(Test_formatting)
+test_14 = TestLoader().loadTestsFromTestCase(Test_rollups)
+test_15 = TestLoader().loadTestsFromTestCase(Test_responseCache)
+test_16 = TestLoader().loadTestsFromTestCase(Test_queryBuilding)
+test_17 = TestLoader().loadTestsFromTestCase(Test_arrowExport)
 
 # run all tests in order
-suite = TestSuite([test_1, test_2, test_3, test_4, test_5, test_6, test_7, test_8, test_9, test_10, test_11])
+suite = TestSuite([test_1, test_2, test_3, test_4, test_5, test_6, test_7, test_8, test_9, test_10, test_11, test_12, test_13, test_14, test_15, test_16, test_17])
 
 runner = HTMLTestRunner(
     output="testing/output",
@@ -1,4 +1,5 @@
 import datetime as dt
+import time
 import unittest  # The test framework
 import warnings
 from unittest import TestCase
@@ -59,6 +60,34 @@ class Test_SensorFactoryWrapper(TestCase):
         self.assertIn("814", sensor_platforms)
         self.assertIn("821", sensor_platforms)
 
+    @staticmethod
+    def slow_get_sensors(sensor_dict: dict, start: dt.datetime, end: dt.datetime, *args):
+        """fetches each sensor in 0.2 seconds, like a vendor api"""
+        for lookupid in sensor_dict:
+            time.sleep(0.2)
+            sensor = Mock(id=lookupid)
+            sensor.create_sensor_summaries.return_value = [f"summary of {lookupid}"]
+            yield sensor
+
+    def test_fetch_sensor_data_concurrently(self):
+        sensor_dict = {
+            "Zephyr": {str(i): {"stationary_box": None} for i in range(4)},
+            "AirGradient": {f"ag{i}": {"stationary_box": None} for i in range(4)},
+        }
+        with patch.object(self.apiWrapper.zf, "get_sensors", side_effect=self.slow_get_sensors), patch.object(self.apiWrapper.agf, "get_sensors", side_effect=self.slow_get_sensors):
+            started = time.perf_counter()
+            summaries = list(self.apiWrapper.fetch_sensor_data_concurrently(sensor_dict, dt.datetime(2023, 9, 23), dt.datetime(2023, 9, 24)))
+            elapsed = time.perf_counter() - started
+
+        self.assertCountEqual(summaries, [(sensorType, f"summary of {lookupid}") for sensorType in sensor_dict for lookupid in sensor_dict[sensorType]])
+        # 8 sensors fetched one after another would take 1.6 seconds
+        self.assertLess(elapsed, 0.8)
+
+    def test_fetch_sensor_data_concurrently_raises_errors(self):
+        with patch.object(self.apiWrapper.zf, "get_sensors", side_effect=ConnectionError("api unavailable")):
+            with self.assertRaises(ConnectionError):
+                list(self.apiWrapper.fetch_sensor_data_concurrently({"Zephyr": {"814": {"stationary_box": None}}}, dt.datetime(2023, 9, 23), dt.datetime(2023, 9, 24)))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -56,12 +56,12 @@ class Test_airGradientFactory(TestCase):
         :param cls: The class object
         """
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_get_sensors(self, mocked_get):
         """Test the get_sensors method of the AirGradientFactory.
 
         Args:
-            mocked_get: Mocked requests.get method.
+            mocked_get: Mocked requests.Session.get method.
         """
 
         mocked_get.return_value.status_code = 200
@@ -14,6 +14,7 @@ from core.models import SensorPlatformTypes as ModelSensorPlatformTypePlatform
 from core.models import SensorSummaries as ModelSensorPlatformSummary
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
+from ingestion_worker import work_once
 from main import app
 from sensor_api_wrappers.concrete.factories.plume_factory import PlumeFactory
 from sensor_api_wrappers.concrete.products.airGradient_sensor import AirGradientSensor
@@ -233,6 +234,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
 
         with patch.object(SensorPlatformFactoryWrapper, "fetch_plume_data", return_value=[self.plume_summary]) as mock_fetch_plume_data:
             response = self.client.post("/api-task/schedule/ingest-bysensorid/27-09-2022/28-09-2022", params={"sensor_ids": [self.plume_sensor_id]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_plume_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
@@ -253,6 +256,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
         time.sleep(2)
         with patch.object(SensorPlatformFactoryWrapper, "fetch_zephyr_data", return_value=[self.zephyr_summary]) as mock_fetch_zephyr_data:
             response = self.client.post("/api-task/schedule/ingest-bysensorid/02-04-2023/03-04-2023", params={"sensor_ids": [self.zephyr_sensor_id]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_zephyr_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
@@ -273,6 +278,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
         time.sleep(2)
         with patch.object(SensorPlatformFactoryWrapper, "fetch_sensorCommunity_data", return_value=[self.sensorCommunity_summary]) as mock_fetch_sensorCommunity_data:
             response = self.client.post("/api-task/schedule/ingest-bysensorid/31-03-2023/01-04-2023", params={"sensor_ids": [self.sensorCommunity_sensor_id]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_sensorCommunity_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
@@ -294,6 +301,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
 
         with patch.object(SensorPlatformFactoryWrapper, "fetch_purpleAir_data", return_value=[self.purpleAir_summary]) as mock_fetch_purpleAir_data:
             response = self.client.post("/api-task/schedule/ingest-bysensorid/01-04-2023/02-04-2023", params={"sensor_ids": [self.purpleAir_sensor_id]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_purpleAir_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
@@ -315,6 +324,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
 
         with patch.object(SensorPlatformFactoryWrapper, "fetch_airGradient_data", return_value=[self.airGradient_summary]) as mock_fetch_airGradient_data:
             response = self.client.post("/api-task/schedule/ingest-bysensorid/01-04-2023/02-04-2023", params={"sensor_ids": [self.airGradient_sensor_id]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_airGradient_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
@@ -339,6 +350,8 @@ class Test_Api_7_BackgroundTasks(TestCase):
 
         with patch.object(SensorPlatformFactoryWrapper, "fetch_plume_data", return_value=[self.plume_summary]) as mock_fetch_plume_data:
             response = self.client.get(f"/api-task/cron/ingest-active-sensors/{self.plume_sensor_type_id}", headers={"cron-job-token": env["CRON_JOB_TOKEN"]})
+            # the task is run by an ingestion worker
+            work_once("test_worker")
             mock_fetch_plume_data.assert_called_once()
             self.assertEqual(response.status_code, 200)
             self.assertNotEqual(response, "No active sensors found")
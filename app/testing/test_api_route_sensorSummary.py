@@ -1,3 +1,4 @@
+import json
 import unittest
 import warnings
 import zipfile
@@ -6,9 +7,10 @@ from unittest import TestCase
 from core.models import SensorPlatforms as ModelSensorPlatform
 from core.models import SensorPlatformTypes as ModelSensorPlatformTypePlatform
 from core.models import SensorSummaries as ModelSensorPlatformSummary
+from core.schema import SensorSummary as SchemaSensorSummary
 from fastapi.testclient import TestClient
 from main import app
-from routers.sensorSummaries import upsert_sensorSummary
+from routers.sensorSummaries import upsert_sensorSummaries, upsert_sensorSummary
 from sensor_api_wrappers.concrete.factories.plume_factory import PlumeFactory
 from sensor_api_wrappers.concrete.products.plume_sensor import PlumeSensor
 from testing.application_config import authenticate_client, database_config, setUpSensor, setUpSensorType
@@ -194,6 +196,49 @@ class Test_Api_6_SensorSummary(TestCase):
             self.assertTrue("properties" in feature)
             self.assertTrue("type" in feature)
 
+    def test_11_get_sensorSummary_as_json_stream(self):
+        """Test that the sensor summaries are streamed as newline delimited json"""
+        response = self.client.get(
+            "/sensor-summary/as-json",
+            params={"start": "23-09-2023", "end": "24-09-2023", "columns": "sensor_id,measurement_data,timestamp", "deserialize": True, "stream": True},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+
+        rows = [json.loads(line) for line in response.text.splitlines() if line]
+        self.assertTrue(len(rows) > 0)
+        for row in rows:
+            self.assertTrue("timestamp_UTC" in row)
+            self.assertTrue(isinstance(row["measurement_data"], list))
+
+    def test_12_get_sensorSummary_as_json_pages(self):
+        """Test that following the next cursor returns every sensor summary once"""
+        params = {"start": "23-09-2023", "end": "24-09-2023", "columns": "sensor_id,timestamp"}
+        all_rows = self.client.get("/sensor-summary/as-json", params=params).json()
+
+        paged_rows = []
+        cursor = None
+        while True:
+            response = self.client.get("/sensor-summary/as-json", params={**params, "page_size": 1, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            paged_rows.extend(response.json()["data"])
+            cursor = response.json()["next"]
+            if cursor is None:
+                break
+
+        key = lambda row: (row["timestamp_UTC"], row["sensor_id"])
+        self.assertEqual([key(row) for row in paged_rows], sorted(key(row) for row in all_rows))
+
+    def test_13_upsert_sensorSummaries_batch(self):
+        """Test that upserting existing sensor summaries updates them in place and returns their keys"""
+        rows = self.db.query(ModelSensorPlatformSummary).filter(ModelSensorPlatformSummary.sensor_id == self.sensor_id).all()
+        self.assertTrue(len(rows) > 0)
+        summaries = [SchemaSensorSummary(**row.to_json()) for row in rows]
+
+        written = upsert_sensorSummaries(summaries + summaries[:1])
+        self.assertEqual(sorted((row.timestamp, row.sensor_id) for row in written), sorted((row.timestamp, row.sensor_id) for row in rows))
+        self.assertEqual(self.db.query(ModelSensorPlatformSummary).filter(ModelSensorPlatformSummary.sensor_id == self.sensor_id).count(), len(rows))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,86 @@
+import io
+import json
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from routers.services.arrow_export import export_columns, export_measurement_projection, generate_sensor_summary_arrow
+from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.measurement_codec import encode_measurements
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+from sqlalchemy.dialects import postgresql
+
+
+class Test_arrowExport(TestCase):
+    """Tests that the parquet and arrow exports contain every reading of the sensor summaries as typed columns."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        file = open("./testing/test_data/test_sensor_fromdb.json", "r")
+        cls.results = json.load(file)
+        file.close()
+
+        df = SensorReadable.JsonStringToDataframe(cls.results[0]["measurement_data"], boundingBox=None)
+        cls.df = df.drop(columns=["boundingBox"]).set_index(SensorMeasurementsColumns.TIMESTAMP.value).astype("float64")
+        cls.rows = [
+            SimpleNamespace(_mapping={"sensor_id": 4, "type_name": "test_sensor_type", "measurement_data": cls.results[0]["measurement_data"], "measurement_blob": None}),
+            SimpleNamespace(_mapping={"sensor_id": 5, "type_name": "other_sensor_type", "measurement_data": None, "measurement_blob": encode_measurements(cls.df)}),
+            SimpleNamespace(_mapping={"sensor_id": 6, "type_name": "test_sensor_type", "measurement_data": cls.results[0]["measurement_data"], "measurement_blob": None}),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_parquet_export(self):
+        chunks = list(generate_sensor_summary_arrow(self.rows, ["VOC", "NO2"], "parquet", batch_size=2))
+        self.assertEqual(len(chunks), 2)
+
+        file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+        self.assertEqual(file.num_row_groups, 2)
+        self.assertEqual(file.schema_arrow.names, ["sensor_id", "type_name", "Timestamp", "VOC", "NO2", "Latitude", "Longitude"])
+
+        df = file.read().to_pandas()
+        self.assertEqual(len(df), 3 * len(self.df))
+        self.assertEqual(df["sensor_id"].unique().tolist(), [4, 5, 6])
+        self.assertEqual(df.loc[df["sensor_id"] == 5, "type_name"].iloc[0], "other_sensor_type")
+        self.assertEqual(df["Timestamp"].iloc[0].timestamp(), self.df.index[0])
+        self.assertEqual(df.loc[df["sensor_id"] == 4, "VOC"].tolist(), df.loc[df["sensor_id"] == 5, "VOC"].tolist())
+
+    def test_arrow_stream_export(self):
+        chunks = list(generate_sensor_summary_arrow(self.rows, ["VOC"], "arrow", batch_size=1))
+        table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+        self.assertEqual(table.num_rows, 3 * len(self.df))
+        self.assertEqual(table.schema.field("VOC").type, pa.float64())
+
+    def test_export_with_measurement_columns(self):
+        """json rows projected by postgres keep the location columns, so they are filled like the columnar rows"""
+        sql = str(export_measurement_projection(["NO2"]).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        self.assertIn("IN ('NO2', 'Latitude', 'Longitude')", sql)
+
+        readings = {str(1695427200 + i * 60): {"NO2": float(i), "VOC": 1.0, "Latitude": 52.45, "Longitude": -1.89} for i in range(3)}
+        # the readings of a json row as the projection returns them
+        projected = {timestamp: {col: reading[col] for col in export_columns(["NO2"])} for timestamp, reading in readings.items()}
+        df = pd.DataFrame.from_dict(readings, orient="index").astype("float64")
+        df.index = df.index.astype("int64").rename(SensorMeasurementsColumns.TIMESTAMP.value)
+        rows = [
+            SimpleNamespace(_mapping={"sensor_id": 4, "type_name": "test_sensor_type", "measurement_data": projected, "measurement_blob": None}),
+            SimpleNamespace(_mapping={"sensor_id": 5, "type_name": "test_sensor_type", "measurement_data": None, "measurement_blob": encode_measurements(df)}),
+        ]
+
+        table = pa.ipc.open_stream(b"".join(generate_sensor_summary_arrow(rows, ["NO2"], "arrow"))).read_all()
+        self.assertEqual(table.schema.names, ["sensor_id", "type_name", "Timestamp", "NO2", "Latitude", "Longitude"])
+        self.assertEqual(table.column("Latitude").to_pylist(), [52.45] * 6)
+        self.assertEqual(table.column("Longitude").null_count, 0)
+        self.assertEqual(table.column("NO2").to_pylist(), [0.0, 1.0, 2.0] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+
+from routers.services.enums import SensorMeasurementsColumns
+from routers.services.formatting import deserializeMeasurementData, generate_sensor_summary_csv, measurement_column_union
+from sensor_api_wrappers.data_transfer_object.measurement_codec import encode_measurements
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+
+
+class Test_formatting(TestCase):
+    """Tests that the pandas-free measurement decoder returns the same records as the dataframe round trip."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        file = open("./testing/test_data/test_sensor_fromdb.json", "r")
+        cls.results = json.load(file)
+        file.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    @staticmethod
+    def dataframe_records(measurement_data: str, columns: list[str]) -> list[dict]:
+        """the records built through a dataframe, as deserializeMeasurementData used to"""
+        df = SensorReadable.JsonStringToDataframe(measurement_data, boundingBox=None).drop(columns=["boundingBox"])
+        if columns:
+            df = df[[col for col in columns if col in df.columns]]
+        return df.to_dict(orient="records")
+
+    def test_matches_dataframe_records(self):
+        for columns in [[], ["NO2", "VOC", SensorMeasurementsColumns.TIMESTAMP.value], ["VOC", "not_a_column"]]:
+            for summary in self.results:
+                records = deserializeMeasurementData(summary["measurement_data"], columns)
+                self.assertEqual(records, self.dataframe_records(summary["measurement_data"], columns))
+
+    def test_timestamp_column_first(self):
+        records = deserializeMeasurementData(self.results[0]["measurement_data"], columns=[])
+        self.assertEqual(next(iter(records[0])), SensorMeasurementsColumns.TIMESTAMP.value)
+        self.assertTrue(isinstance(records[0][SensorMeasurementsColumns.TIMESTAMP.value], int))
+
+    def test_legacy_python_dict_string(self):
+        records = deserializeMeasurementData(str({"1695427256": {"NO2": 1, "VOC": None}}), columns=[])
+        self.assertEqual(records, [{SensorMeasurementsColumns.TIMESTAMP.value: 1695427256, "NO2": 1, "VOC": None}])
+
+    def test_parsed_dictionary(self):
+        records = deserializeMeasurementData({"1695427256": {"NO2": 1}}, columns=["NO2"])
+        self.assertEqual(records, [{"NO2": 1}])
+
+    def test_columnar_blob(self):
+        df = SensorReadable.JsonStringToDataframe(self.results[0]["measurement_data"], boundingBox=None)
+        df = df.drop(columns=["boundingBox"]).set_index(SensorMeasurementsColumns.TIMESTAMP.value).astype("float64")
+
+        records = deserializeMeasurementData(None, columns=["NO2", "latitude"], measurement_blob=encode_measurements(df))
+        self.assertEqual(len(records), len(df))
+        self.assertEqual(records[0], {"NO2": df["NO2"].iloc[0], "latitude": None})
+
+    def test_csv_export_of_many_summaries(self):
+        rows = [SimpleNamespace(_mapping={"sensor_id": 4, "measurement_data": summary["measurement_data"], "measurement_blob": None}) for summary in self.results]
+        chunks = list(generate_sensor_summary_csv(rows, ["VOC", "NO2", "not_a_column"], batch_size=1))
+
+        lines = "".join(chunks).splitlines()
+        self.assertEqual(lines[0], "sensor_id,Timestamp,VOC,NO2,not_a_column")
+        self.assertEqual(len(lines) - 1, sum(summary["measurement_count"] for summary in self.results))
+        self.assertEqual(lines[1], "4,1695427256,144,0,")
+        self.assertEqual(len(chunks), len(rows) + 1)
+
+    def test_measurement_column_union(self):
+        df = SensorReadable.JsonStringToDataframe(self.results[0]["measurement_data"], boundingBox=None)
+        blob = encode_measurements(df[["NO2", "latitude"]].set_index(df[SensorMeasurementsColumns.TIMESTAMP.value]).astype("float64"))
+
+        columns = measurement_column_union(["VOC", "NO2", "VOC", "zz_custom"], [blob])
+        self.assertEqual(columns, ["NO2", "VOC", "latitude", "zz_custom"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest  # The test framework
+import warnings
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+from requests.adapters import HTTPAdapter
+from sensor_api_wrappers.http_client import JitteredRetry, create_session, vendor_session
+
+
+class Test_httpClient(TestCase):
+    """Tests the pooled session shared by the sensor factories."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    @patch.dict(os.environ, {"VENDOR_HTTP_CONNECT_TIMEOUT": "2", "VENDOR_HTTP_READ_TIMEOUT": "10", "VENDOR_HTTP_RETRIES": "4"})
+    def test_session_configuration(self):
+        session = create_session(pool_maxsize=3)
+        adapter = session.get_adapter("https://api.airgradient.com")
+
+        self.assertEqual(adapter.timeout, (2.0, 10.0))
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertIn("gzip", session.headers["Accept-Encoding"])
+
+    def test_default_timeout(self):
+        """A request without a timeout gets the default timeout, an explicit timeout is kept"""
+        session = create_session()
+        adapter = session.get_adapter("https://api.airgradient.com")
+        with patch.object(HTTPAdapter, "send") as mocked_send:
+            adapter.send(requests.Request("GET", "https://api.airgradient.com").prepare())
+            self.assertEqual(mocked_send.call_args.kwargs["timeout"], adapter.timeout)
+
+            adapter.send(requests.Request("GET", "https://api.airgradient.com").prepare(), timeout=30)
+            self.assertEqual(mocked_send.call_args.kwargs["timeout"], 30)
+
+    def test_jittered_backoff(self):
+        retry = JitteredRetry(total=5, backoff_factor=0.5)
+        self.assertEqual(retry.get_backoff_time(), 0)
+
+        retry = retry.increment(method="GET", url="/").increment(method="GET", url="/")
+        for _ in range(20):
+            self.assertTrue(1 <= retry.get_backoff_time() <= 2)
+
+    def test_vendor_session_is_shared(self):
+        self.assertIs(vendor_session(), vendor_session())
+
+
+if __name__ == "__main__":
+    unittest.main()
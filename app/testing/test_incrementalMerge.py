@@ -0,0 +1,70 @@
+import json
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from core.schema import SensorSummary as SchemaSensorSummary
+from routers.services.enums import SensorMeasurementsColumns
+from routers.services.incremental_merge import sensor_summary_delta
+from sensor_api_wrappers.data_transfer_object.measurement_codec import decode_measurements, encode_measurements
+
+
+class Test_incrementalMerge(TestCase):
+    """Tests that only the readings newer than the stored sensor summary are kept for an append-only merge."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        timestamps = np.arange(1695427200, 1695427200 + 120 * 60, 60)
+        cls.df = pd.DataFrame(
+            {SensorMeasurementsColumns.PM2_5.value: np.linspace(0.1, 40.3, 120), SensorMeasurementsColumns.NO2.value: np.arange(120) % 7},
+            index=pd.Index(timestamps, name=SensorMeasurementsColumns.TIMESTAMP.value),
+        )
+        cls.stored_last = int(timestamps[89])
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def summary(self, **kwargs) -> SchemaSensorSummary:
+        """builds a sensor summary of the whole dataframe"""
+        return SchemaSensorSummary(timestamp=1695427200, sensor_id="1", geom=None, measurement_count=len(self.df.index), stationary=False, **kwargs)
+
+    def test_json_delta(self):
+        row = SimpleNamespace(measurement_blob=None, last_json_timestamp=self.stored_last)
+        delta = sensor_summary_delta(self.summary(measurement_data=self.df.to_json(orient="index")), row)
+
+        self.assertEqual(delta.measurement_count, 30)
+        self.assertEqual(sorted(int(key) for key in json.loads(delta.measurement_data)), self.df.index.values[90:].tolist())
+
+    def test_columnar_delta(self):
+        row = SimpleNamespace(measurement_blob=encode_measurements(self.df.iloc[:90]), last_json_timestamp=None)
+        delta = sensor_summary_delta(self.summary(measurement_blob=encode_measurements(self.df)), row)
+
+        self.assertEqual(delta.measurement_count, 30)
+        columns = decode_measurements(row.measurement_blob + delta.measurement_blob)
+        np.testing.assert_array_equal(columns[SensorMeasurementsColumns.TIMESTAMP.value], self.df.index.values)
+        np.testing.assert_array_equal(columns[SensorMeasurementsColumns.NO2.value], self.df[SensorMeasurementsColumns.NO2.value].to_numpy(dtype="float64"))
+
+    def test_no_new_readings(self):
+        row = SimpleNamespace(measurement_blob=None, last_json_timestamp=int(self.df.index.values[-1]))
+        self.assertIsNone(sensor_summary_delta(self.summary(measurement_data=self.df.to_json(orient="index")), row))
+
+    def test_stored_row_is_replaced(self):
+        """The stored row is replaced when the storage formats differ or the new readings have a column the stored row does not have"""
+        json_row = SimpleNamespace(measurement_blob=None, last_json_timestamp=self.stored_last)
+        with self.assertRaises(ValueError):
+            sensor_summary_delta(self.summary(measurement_blob=encode_measurements(self.df)), json_row)
+
+        columnar_row = SimpleNamespace(measurement_blob=encode_measurements(self.df.iloc[:90, :1]), last_json_timestamp=None)
+        with self.assertRaises(ValueError):
+            sensor_summary_delta(self.summary(measurement_blob=encode_measurements(self.df)), columnar_row)
+
+
+if __name__ == "__main__":
+    unittest.main()
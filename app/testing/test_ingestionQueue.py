@@ -0,0 +1,103 @@
+import datetime as dt
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from core.schema import DataIngestionLog
+from ingestion_worker import NO_DATA_MESSAGE, job_results
+from routers.background_tasks import schedule_ingestion_jobs
+from routers.services.ingestion_queue import SECONDS_IN_DAY, failed_ingestion_job, ingestion_jobs, ingestion_task_log, ingestion_task_status, to_timestamp
+
+
+class Test_ingestionQueue(TestCase):
+    """Tests that data ingestion tasks are split into one unit per sensor and day and that the results of the units are derived from the data ingestion logs."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        cls.start = dt.datetime(2023, 4, 1)
+        cls.end = dt.datetime(2023, 4, 4)
+        cls.first_day = to_timestamp(cls.start)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_one_unit_per_sensor_and_day(self):
+        sensors = [{"id": 1, "time_updated": None}, {"id": 2, "time_updated": None}]
+        jobs = ingestion_jobs("2023-04-04 10:00:00", sensors, self.start, self.end)
+
+        self.assertEqual(len(jobs), 6)
+        self.assertEqual(sorted({job["timestamp"] for job in jobs}), [self.first_day + i * SECONDS_IN_DAY for i in range(3)])
+        self.assertTrue(all(job["fetch_start"] == job["timestamp"] and job["status"] == "queued" for job in jobs))
+
+        # a task that starts and ends on the same day still has a unit for each sensor
+        self.assertEqual(len(ingestion_jobs("2023-04-04 10:00:00", sensors, self.start, self.start)), 2)
+
+    def test_resume_from_time_updated(self):
+        # the sensor was last updated two days before the start of the task
+        time_updated = self.start - dt.timedelta(days=2) + dt.timedelta(hours=6)
+        jobs = ingestion_jobs("2023-04-04 10:00:00", [{"id": 1, "time_updated": time_updated}], self.start, self.end, resume=True)
+
+        self.assertEqual(len(jobs), 5)
+        self.assertEqual(jobs[0]["timestamp"], self.first_day - 2 * SECONDS_IN_DAY)
+        self.assertEqual(jobs[0]["fetch_start"], to_timestamp(time_updated))
+        self.assertTrue(all(job["fetch_start"] == job["timestamp"] for job in jobs[1:]))
+
+        # without resume the time_updated of the sensor is ignored
+        self.assertEqual(len(ingestion_jobs("2023-04-04 10:00:00", [{"id": 1, "time_updated": time_updated}], self.start, self.end)), 3)
+
+    def test_job_results(self):
+        jobs = [SimpleNamespace(sensor_id=sensor_id, timestamp=self.first_day) for sensor_id in (1, 2, 3)]
+        logs = [
+            DataIngestionLog(sensor_id=1, sensor_serial_number="a", timestamp=self.first_day, success_status=True),
+            DataIngestionLog(sensor_id=2, sensor_serial_number="b", timestamp=self.first_day, success_status=False, message="upsert failed"),
+        ]
+        results = job_results(jobs, logs)
+
+        self.assertEqual(results[(1, self.first_day)], ("done", None))
+        self.assertEqual(results[(2, self.first_day)], ("failed", "upsert failed"))
+        self.assertEqual(results[(3, self.first_day)], ("failed", NO_DATA_MESSAGE))
+
+    def test_task_status_and_log(self):
+        flagged = failed_ingestion_job("2023-04-04 10:00:00", 3, "Sensor has not been updated in over 90 days")
+        jobs = [
+            SimpleNamespace(sensor_id=1, serial_number="a", timestamp=self.first_day, status="done", attempts=1, message=None),
+            SimpleNamespace(sensor_id=2, serial_number="b", timestamp=self.first_day, status="running", attempts=2, message="timeout"),
+            SimpleNamespace(sensor_id=3, serial_number="c", timestamp=flagged["timestamp"], status=flagged["status"], attempts=0, message=flagged["message"]),
+        ]
+
+        task_status = ingestion_task_status("2023-04-04 10:00:00", jobs)
+        self.assertFalse(task_status["finished"])
+        self.assertEqual((task_status["done"], task_status["running"], task_status["failed"]), (1, 1, 1))
+        self.assertEqual(task_status["failed_jobs"][0]["sensor_id"], 3)
+
+        log = ingestion_task_log(jobs)
+        self.assertEqual(log[self.first_day][1], {"serial_number": "a", "status": True})
+        self.assertEqual(log[flagged["timestamp"]][3]["message"], "Sensor has not been updated in over 90 days")
+
+    @patch("routers.background_tasks.finish_ingestion_task")
+    @patch("routers.background_tasks.enqueue_ingestion_jobs", MagicMock(side_effect=len))
+    @patch("routers.background_tasks.deactivate_unsynced_sensor", MagicMock())
+    @patch("routers.background_tasks.get_sensor_dict")
+    def test_task_without_queued_units_is_finished(self, mock_get_sensor_dict, mock_finish_ingestion_task):
+        """no worker claims a unit of a task whose sensors were all skipped, so the task is finished when it is scheduled"""
+        sensor = {"id": 1, "time_updated": None}
+        for sensors, flagged_sensors, finished in [([], [{"id": 3}], True), ([], [], True), ([sensor], [{"id": 3}], False)]:
+            mock_get_sensor_dict.return_value = (sensors, flagged_sensors)
+            mock_finish_ingestion_task.reset_mock()
+
+            count = schedule_ingestion_jobs("2023-04-04 10:00:00", "01-04-2023", "02-04-2023", [1], "sensor_type_id")
+            self.assertEqual(count, len(sensors) + len(flagged_sensors))
+            if finished:
+                mock_finish_ingestion_task.assert_called_once_with("2023-04-04 10:00:00")
+            else:
+                mock_finish_ingestion_task.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
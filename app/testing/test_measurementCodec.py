@@ -0,0 +1,109 @@
+import json
+import os
+import unittest  # The test framework
+import warnings
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.data_transfer_object.measurement_codec import HEADER_PREFIX_BYTES, decode_measurements, encode_measurements, is_columnar, read_column_names, read_last_timestamp
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+from sensor_api_wrappers.data_transfer_object.sensor_writeable import SensorWritable
+
+
+class Test_measurementCodec(TestCase):
+    """Tests that a day of measurements survives the round trip through the columnar binary format."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        timestamps = np.arange(1695427200, 1695427200 + 1440 * 60, 60)
+        cls.df = pd.DataFrame(
+            {
+                SensorMeasurementsColumns.NO2.value: np.arange(1440) % 7,
+                SensorMeasurementsColumns.PM2_5.value: np.linspace(0.1, 40.3, 1440),
+                SensorMeasurementsColumns.LATITUDE.value: np.nan,
+                SensorMeasurementsColumns.LONGITUDE.value: np.nan,
+            },
+            index=pd.Index(timestamps, name=SensorMeasurementsColumns.TIMESTAMP.value),
+        )
+        cls.df.iloc[10, 1] = np.nan
+        cls.stationaryBox = (
+            "POLYGON ((-1.8968080000000005 52.452656000000005, -1.8968080000000005 52.455859, -1.889424 52.455859, -1.889424 52.452656000000005, -1.8968080000000005 52.452656000000005))"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_round_trip(self):
+        blob = encode_measurements(self.df)
+        self.assertTrue(is_columnar(blob))
+
+        columns = decode_measurements(blob)
+        np.testing.assert_array_equal(columns[SensorMeasurementsColumns.TIMESTAMP.value], self.df.index.values)
+        for column in self.df.columns:
+            np.testing.assert_array_equal(columns[column], self.df[column].to_numpy(dtype="float64"))
+
+    def test_smaller_than_json(self):
+        blob = encode_measurements(self.df)
+        self.assertLess(len(blob), len(self.df.to_json(orient="index")) / 5)
+
+    def test_non_numeric_column(self):
+        df = self.df.head(3).copy()
+        df["status"] = ["ok", None, "error"]
+        columns = decode_measurements(encode_measurements(df))
+        self.assertEqual(columns["status"].tolist(), ["ok", None, "error"])
+
+    def test_columnar_matches_json_dataframe(self):
+        """The dataframe read from a columnar blob should match the one read from the json string"""
+        from_json = SensorReadable.JsonStringToDataframe(self.df.to_json(orient="index"), boundingBox=None)
+        from_blob = SensorReadable.MeasurementDataToDataframe(None, boundingBox=None, measurement_blob=encode_measurements(self.df))
+
+        self.assertEqual(from_json.columns.tolist(), from_blob.columns.tolist())
+        self.assertTrue((from_json.index == from_blob.index).all())
+        self.assertEqual(json.loads(SensorReadable.ColumnarToJsonString(encode_measurements(self.df))), json.loads(self.df.to_json(orient="index")))
+
+    @patch.dict(os.environ, {"MEASUREMENT_STORAGE_FORMAT": "columnar"})
+    def test_sensor_summaries_stored_as_columnar(self):
+        df = self.df.reset_index()
+        df.index = pd.to_datetime(df[SensorMeasurementsColumns.TIMESTAMP.value], unit="s")
+        summaries = list(SensorWritable("1", df).create_sensor_summaries(stationary_box=self.stationaryBox))
+
+        self.assertEqual(len(summaries), 1)
+        self.assertIsNone(summaries[0].measurement_data)
+        self.assertTrue(is_columnar(summaries[0].measurement_blob))
+        self.assertEqual(summaries[0].measurement_count, 1440)
+
+    def test_read_column_names_from_prefix(self):
+        blob = encode_measurements(self.df)
+        self.assertEqual(read_column_names(blob[:HEADER_PREFIX_BYTES]), [SensorMeasurementsColumns.TIMESTAMP.value] + self.df.columns.tolist())
+        with self.assertRaises(ValueError):
+            read_column_names(blob[:12])
+
+    def test_appended_segments(self):
+        """A blob with a segment appended to it should decode to the readings of both segments"""
+        first, second = self.df.iloc[:1000], self.df.iloc[1000:].drop(columns=[SensorMeasurementsColumns.NO2.value])
+        blob = encode_measurements(first) + encode_measurements(second)
+
+        columns = decode_measurements(blob)
+        np.testing.assert_array_equal(columns[SensorMeasurementsColumns.TIMESTAMP.value], self.df.index.values)
+        np.testing.assert_array_equal(columns[SensorMeasurementsColumns.PM2_5.value], self.df[SensorMeasurementsColumns.PM2_5.value].to_numpy(dtype="float64"))
+        self.assertTrue(np.isnan(columns[SensorMeasurementsColumns.NO2.value][1000:]).all())
+        self.assertEqual(read_last_timestamp(blob), self.df.index.values[-1])
+        self.assertEqual(read_column_names(blob[:HEADER_PREFIX_BYTES]), [SensorMeasurementsColumns.TIMESTAMP.value] + self.df.columns.tolist())
+        with self.assertRaises(ValueError):
+            decode_measurements(blob[:-4])
+
+    def test_not_columnar(self):
+        self.assertFalse(is_columnar('{"1695427200": {"NO2": 1}}'))
+        with self.assertRaises(ValueError):
+            decode_measurements(b"{}")
+
+
+if __name__ == "__main__":
+    unittest.main()
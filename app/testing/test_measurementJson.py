@@ -0,0 +1,72 @@
+import datetime as dt
+import json
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+
+from routers.services.enums import SensorMeasurementsColumns
+from routers.services.measurement_reencoding import reencoded_rows
+from sensor_api_wrappers.data_transfer_object.measurement_json import load_measurement_json, measurement_json_columns, reencode_measurement_json
+
+
+class Test_measurementJson(TestCase):
+    """Tests the strict reader of the json measurement_data and the re-encoding of the legacy measurement_data."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        file = open("./testing/test_data/test_sensor_fromdb.json", "r")
+        cls.results = json.load(file)
+        file.close()
+        cls.readings = {"1695427256": {"NO2": 1, "VOC": None, "note": "sensor's None reading"}, "1695427316": {"NO2": 2.5, "latitude": 52.4}}
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_strict_json_is_not_rewritten(self):
+        # the values of strict json may contain the quotes and None that the legacy rows were rewritten with
+        measurement_data = json.dumps(self.readings)
+        self.assertEqual(load_measurement_json(measurement_data), self.readings)
+        self.assertIsNone(reencode_measurement_json(measurement_data))
+        self.assertIsNone(reencode_measurement_json(self.results[0]["measurement_data"]))
+
+    def test_reencode_legacy_measurement_data(self):
+        legacy = str({"1695427256": {"NO2": 1, "VOC": None}})
+        self.assertEqual(json.loads(reencode_measurement_json(legacy)), {"1695427256": {"NO2": 1, "VOC": None}})
+        # NaN is not json, it is rewritten as null
+        self.assertEqual(reencode_measurement_json('{"1695427256": {"NO2": NaN}}'), '{"1695427256":{"NO2":null}}')
+        # rows that have not been rewritten yet are still read
+        self.assertEqual(load_measurement_json(legacy), {"1695427256": {"NO2": 1, "VOC": None}})
+
+        with self.assertRaises(ValueError):
+            reencode_measurement_json("{'1695427256': {'NO2': unknown}}")
+
+    def test_measurement_json_columns(self):
+        columns = measurement_json_columns(json.dumps(self.readings))
+        self.assertEqual(list(columns), [SensorMeasurementsColumns.TIMESTAMP.value, "NO2", "VOC", "note", "latitude"])
+        self.assertEqual(columns[SensorMeasurementsColumns.TIMESTAMP.value], [1695427256, 1695427316])
+        self.assertEqual(columns["latitude"], [None, 52.4])
+
+        columns = measurement_json_columns(self.readings, ["latitude", "not_a_column", SensorMeasurementsColumns.TIMESTAMP.value])
+        self.assertEqual(columns, {"latitude": [None, 52.4], SensorMeasurementsColumns.TIMESTAMP.value: [1695427256, 1695427316]})
+
+    def test_reencoded_rows(self):
+        time_updated = dt.datetime(2023, 9, 24, tzinfo=dt.timezone.utc)
+        rows = [
+            SimpleNamespace(timestamp=1695427200, sensor_id=1, time_updated=time_updated, measurement_data=str({"1695427256": {"NO2": 1}})),
+            SimpleNamespace(timestamp=1695427200, sensor_id=2, time_updated=time_updated, measurement_data=json.dumps({"1695427256": {"note": "it's fine"}})),
+            SimpleNamespace(timestamp=1695427200, sensor_id=3, time_updated=time_updated, measurement_data="{'1695427256': {'NO2': unknown}}"),
+        ]
+        (updates, errors) = reencoded_rows(rows)
+
+        self.assertEqual(updates, [{"timestamp": 1695427200, "sensor_id": 1, "time_updated": time_updated, "measurement_data": '{"1695427256":{"NO2":1}}'}])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("sensor 3 at 1695427200"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,6 +47,12 @@ class Test_plumeFactory(TestCase):
         """
         pass
 
+    def logged_in_factory(self) -> PlumeFactory:
+        """returns a factory with a session that skips the login requests"""
+        pf = PlumeFactory(env["PLUME_EMAIL"], env["PLUME_PASSWORD"], env["PLUME_FIREBASE_API_KEY"], env["PLUME_ORG_NUM"])
+        pf._PlumeFactory__session = requests.Session()
+        return pf
+
     def setup(self):
         """Setup the test environment before each test"""
         pass
@@ -102,7 +108,31 @@ class Test_plumeFactory(TestCase):
         self.assertEqual(len(sensor_data), len(expected))
         self.assertTrue(isinstance(sensor_data, list))
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
+    def test_fetch_measurement_windows_concurrently(self, mocked_get):
+        """Test every 2 day window of the date range is requested and the pages are returned in order"""
+        start = dt.datetime(2023, 9, 21)
+        end = dt.datetime(2023, 9, 27)
+        mocked_get.side_effect = lambda url: Mock(json=Mock(return_value={"measures": [url.split("offset=")[1]]}))
+
+        pages = self.logged_in_factory().get_sensor_measurement_data("19651", start, end)
+
+        self.assertEqual(mocked_get.call_count, 3)
+        self.assertEqual(pages, [["0"], ["2000"], ["4000"]])
+
+    @patch("sensor_api_wrappers.concrete.factories.plume_factory.t.sleep")
+    def test_zip_file_link_polled_with_backoff(self, mocked_sleep):
+        """Test the export task is polled with an increasing delay until the link is ready"""
+        with patch.object(requests.Session, "post") as mocked_post, patch.object(requests.Session, "get") as mocked_get:
+            mocked_post.return_value.json.return_value = {"id": 1}
+            mocked_get.return_value.json.side_effect = [{"link": None}, {"link": None}, {"link": None}, {"link": "https://example.com"}]
+
+            link = self.logged_in_factory().get_zip_file_link(["19651"], dt.datetime(2023, 9, 21), dt.datetime(2023, 9, 22), include_measurements=False)
+
+        self.assertEqual(link, "https://example.com")
+        self.assertEqual([call.args[0] for call in mocked_sleep.call_args_list], [0.5, 1, 2])
+
+    @patch.object(requests.Session, "get")
     def test_extract_zip(self, mocked_get):
         """Test extract the zip file"""
 
@@ -111,7 +141,7 @@ class Test_plumeFactory(TestCase):
             f.close()
 
         mocked_get.return_value.ok = True
-        mocked_get.return_value.content = sensor_zip_bytes
+        mocked_get.return_value.iter_content.return_value = [sensor_zip_bytes[:1000], sensor_zip_bytes[1000:]]
 
         sensors = self.pf.extract_zip_from_link("https://example.com", include_measurements=False)
 
@@ -127,9 +157,9 @@ class Test_plumeFactory(TestCase):
         start = dt.datetime(2023, 9, 21)
         end = dt.datetime(2023, 9, 26)
         link = "https://example.com"
-        with patch.object(requests, "get") as mocked_get:
+        with patch.object(requests.Session, "get") as mocked_get:
             mocked_get.return_value.ok = True
-            mocked_get.return_value.content = open("./testing/test_data/plume_sensorData.zip", "rb").read()
+            mocked_get.return_value.iter_content.return_value = [open("./testing/test_data/plume_sensorData.zip", "rb").read()]
             with patch.object(PlumeFactory, "extract_zip_content") as mocked_sensors_from_zip:
                 mocked_sensors_from_zip.return_value = self.pf.extract_zip_content(zipfile.ZipFile("./testing/test_data/plume_sensorData.zip", "r"), include_measurements=False)
 
@@ -287,9 +317,9 @@ class Test_plumeFactory(TestCase):
 
         data = self.pf.extract_zip_content(zipfile.ZipFile("./testing/test_data/plume_sensorData.zip", "r"), include_measurements=True)
 
-        with patch.object(requests, "get") as mocked_get:
+        with patch.object(requests.Session, "get") as mocked_get:
             mocked_get.return_value.ok = True
-            mocked_get.return_value.content = open("./testing/test_data/plume_sensorData.zip", "rb").read()
+            mocked_get.return_value.iter_content.return_value = [open("./testing/test_data/plume_sensorData.zip", "rb").read()]
 
             with patch.object(PlumeFactory, "extract_zip_content") as mocked_sensors_from_zip:
                 mocked_sensors_from_zip.return_value = data
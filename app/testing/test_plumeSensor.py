@@ -4,6 +4,7 @@ import warnings
 import zipfile
 from unittest import TestCase
 
+import pandas as pd
 from routers.services.enums import SensorMeasurementsColumns
 from sensor_api_wrappers.concrete.factories.plume_factory import PlumeFactory
 from sensor_api_wrappers.concrete.products.plume_sensor import PlumeSensor
@@ -119,6 +120,25 @@ class Test_plumeSensor(TestCase):
         # test for duplicate rows (where index is the same)
         self.assertEqual(len(sensor.df), len(sensor.df.loc[~sensor.df.index.duplicated()]))
 
+    def test_add_measurements_aligns_nearest_location(self):
+        """Each measurement takes the nearest location within the tolerance, the other locations are kept without measurements"""
+        location_times = [1695459976, 1695459996, 1695460030, 1695460300]
+        locations = pd.DataFrame(
+            {"timestamp": location_times, "latitude": [52.1, 52.2, 52.3, 52.4], "longitude": [-1.1, -1.2, -1.3, -1.4]},
+            index=pd.to_datetime(location_times, unit="s").floor("Min"),
+        )
+        sensor = PlumeSensor("19651", locations, error=None)
+
+        measures = [[{"id": i, "date": 1695459956 + i * 60, "no2": i, "voc": i, "pm1": i, "pm10": i, "pm25": i} for i in range(4)]]
+        sensor.add_measurements_json(measures)
+
+        df = sensor.df
+        self.assertEqual(df[SensorMeasurementsColumns.TIMESTAMP.value].tolist(), [1695459956, 1695459996, 1695460016, 1695460076, 1695460136, 1695460300])
+        self.assertEqual(df[SensorMeasurementsColumns.NO2.value].fillna(-1).tolist(), [0, -1, 1, 2, 3, -1])
+        # a location can be the nearest of several measurements, a measurement more than a minute from any location has none
+        self.assertEqual(df[SensorMeasurementsColumns.LATITUDE.value].fillna(-1).tolist(), [52.1, 52.2, 52.3, 52.3, -1, 52.4])
+        self.assertFalse(df.index.duplicated().any())
+
 
 if __name__ == "__main__":
     unittest.main()
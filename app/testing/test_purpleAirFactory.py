@@ -5,13 +5,14 @@ import warnings
 from io import StringIO
 from os import environ as env
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
-from sensor_api_wrappers.concrete.factories.purpleAir_factory import PurpleAirFactory
+from sensor_api_wrappers.concrete.factories.purpleAir_factory import DATA_INITIALIZING_ATTEMPTS, PurpleAirFactory
 from sensor_api_wrappers.concrete.products.purpleAir_sensor import PurpleAirSensor
+from sensor_api_wrappers.upload_stream import spool_csv_by_day
 
 
 class Test_purpleAirFactory(TestCase):
@@ -40,7 +41,7 @@ class Test_purpleAirFactory(TestCase):
         """
         pass
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_successful_login(self, mocked_get):
         """Test the login method of the PurpleAirFactory."""
 
@@ -65,11 +66,10 @@ class Test_purpleAirFactory(TestCase):
         self.assertIsNotNone(self.pf.api_key, "API key should not be None after login.")
         self.assertNotEqual(initial_api_key, self.pf.api_key, "API key should change after login.")
 
-    @patch.object(requests, "get")
+    @patch("sensor_api_wrappers.concrete.factories.purpleAir_factory.DATA_INITIALIZING_RETRY_SECONDS", 0)
+    @patch.object(requests.Session, "get")
     def test_retry_get_sensors(self, mocked_get):
-        """Test the retry mechanism in get_sensors method."""
-
-        mocked_get.return_value.ok = False
+        """Test a sensor whose data is still loading is tried again after the other sensors, without restarting the other sensors."""
 
         error_response = {
             "api_version": "V3.1.5-1.1.44",
@@ -77,22 +77,38 @@ class Test_purpleAirFactory(TestCase):
             "error": "DataInitializingError",
             "description": "The server is loading data and you should try again in 10 seconds.",
         }
-        mocked_get.return_value.text = json.dumps(error_response)
-        mocked_get.return_value.json.return_value = error_response
+        file = open("testing/test_data/purpleair_sensor_274866.csv", "r")
+        csv_text = file.read()
+        file.close()
 
-        sensor_dict = {"132169,outdoor": {"stationary_box": None, "time_updated": None}}
+        def get(url, **kwargs):
+            response = Mock()
+            # the first sensor is still loading, the second sensor has data
+            if "/sensors/132169/" in url:
+                response.ok, response.status_code = False, 503
+                response.headers = {"Retry-After": "0"}
+                response.text = json.dumps(error_response)
+                response.json.return_value = error_response
+            else:
+                response.ok, response.status_code = True, 200
+                response.text = csv_text
+            return response
+
+        mocked_get.side_effect = get
+
+        sensor_dict = {"132169,outdoor": {"stationary_box": None, "time_updated": None}, "274866,outdoor": {"stationary_box": None, "time_updated": None}}
         start = dt.datetime(2025, 7, 7)
         end = dt.datetime(2025, 7, 8)
 
-        with patch.object(PurpleAirFactory, "get_sensors", wraps=self.pf.get_sensors) as mock_get_sensors:
-            # Simulate a retry scenario
-            self.pf.retry_count = 0
-            list(self.pf.get_sensors(sensor_dict, start, end))
+        sensors = list(self.pf.get_sensors(sensor_dict, start, end))
 
-            # Check if the method was retried
-            self.assertGreater(mock_get_sensors.call_count, 1, "get_sensors should be retried on failure.")
+        # the loading sensor is attempted DATA_INITIALIZING_ATTEMPTS times, the other sensor once
+        self.assertEqual(mocked_get.call_count, DATA_INITIALIZING_ATTEMPTS + 1)
+        self.assertEqual([sensor.id for sensor in sensors], ["274866,outdoor", "132169,outdoor"])
+        self.assertIsNone(sensors[0].error)
+        self.assertIsNotNone(sensors[1].error)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_get_sensors(self, mocked_get):
         """Test the get_sensors method of the PurpleAirFactory."""
         mocked_get.return_value.ok = True
@@ -121,6 +137,24 @@ class Test_purpleAirFactory(TestCase):
         # latitude and longitude columns are not included in the sensor DataFrame
         self.assertEqual(sensor.df.shape[1], 19, "The number of columns in the sensor DataFrame should match the test data.")
 
+    def test_get_sensors_from_file_stream(self):
+        """Test a csv file parsed in chunks gives the same readings as parsing it at once"""
+        with open("testing/test_data/purpleair_sensor_274866.csv", "rb") as file:
+            expected = PurpleAirSensor.from_csv("274866,outdoor", file.read().decode("utf-8"))
+
+            file.seek(0)
+            days = list(spool_csv_by_day(file, lambda chunk: PurpleAirSensor.prepare_measurements(chunk, drop_empty_columns=False), chunk_rows=7))
+            self.assertEqual(sum(len(df.index) for df in days), len(expected.df.index))
+
+            file.seek(0)
+            sensors = list(self.pf.get_sensors_from_file_stream({"274866,outdoor": {"stationary_box": None, "time_updated": None}}, file))
+
+        self.assertEqual(len(sensors), len(days))
+        for sensor in sensors:
+            self.assertIsNone(sensor.error)
+            self.assertEqual(sensor.df.columns.tolist(), expected.df.columns.tolist())
+        self.assertEqual(sorted(pd.concat([sensor.df for sensor in sensors]).index), sorted(expected.df.index))
+
 
 if __name__ == "__main__":
     unittest.main()
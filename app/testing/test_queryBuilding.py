@@ -0,0 +1,49 @@
+import unittest  # The test framework
+import warnings
+from unittest import TestCase
+
+from fastapi import HTTPException
+from routers.services.query_building import decodePageCursor, encodePageCursor, keysetPaginationFilter, measurementColumnsProjection, measurementDataAsJsonb
+from sqlalchemy.dialects import postgresql
+
+
+class Test_queryBuilding(TestCase):
+    """Tests the continuation tokens and filters used for keyset pagination of the sensor summaries."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_page_cursor_round_trip(self):
+        cursor = encodePageCursor(1695427200, 42)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decodePageCursor(cursor), (1695427200, 42))
+
+    def test_invalid_page_cursor(self):
+        for cursor in ["", "not a cursor", encodePageCursor(1695427200, 42)[:-3], "MTY5NTQyNzIwMA"]:
+            with self.assertRaises(HTTPException) as context:
+                decodePageCursor(cursor)
+            self.assertEqual(context.exception.status_code, 400)
+
+    def test_keyset_filter_compares_the_primary_key(self):
+        expression = keysetPaginationFilter(encodePageCursor(1695427200, 42))
+        sql = str(expression.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        self.assertEqual(sql, '("SensorSummaries".timestamp, "SensorSummaries".sensor_id) > (1695427200, 42)')
+
+    def test_legacy_measurement_data_is_not_cast_to_jsonb(self):
+        """legacy rows would fail the cast to jsonb, so they are null and the projection returns their measurement_data as is"""
+        sql = str(measurementDataAsJsonb().compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        self.assertEqual(sql, "CASE WHEN (NOT (CAST(\"SensorSummaries\".measurement_data AS TEXT) ~ '''|NaN|Infinity')) THEN CAST(\"SensorSummaries\".measurement_data #>> '{}' AS JSONB) END")
+
+        sql = str(measurementColumnsProjection(["NO2"]).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        self.assertTrue(sql.startswith("CASE WHEN (CAST(\"SensorSummaries\".measurement_data AS TEXT) ~ '''|NaN|Infinity') THEN CAST(\"SensorSummaries\".measurement_data AS JSONB) ELSE"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import unittest  # The test framework
+import warnings
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import requests
+from requests.adapters import HTTPAdapter
+from sensor_api_wrappers.http_client import create_session
+from sensor_api_wrappers.rate_limiter import TokenBucket, parse_retry_after, rate_limiter_for_url, rate_limits, vendor_rate_limiter
+
+
+class FakeClock:
+    """clock that only moves when the bucket sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class Test_rateLimiter(TestCase):
+    """Tests the per vendor token buckets used to pace the requests of the sensor factories."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_token_bucket_paces_requests(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+
+        # the burst is available straight away, then a token every half second
+        for _ in range(6):
+            bucket.acquire()
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_throttled_holds_and_recovers(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, clock=clock, sleep=clock.sleep)
+
+        bucket.throttled(retry_after=30)
+        self.assertEqual(bucket.rate, 2)
+        self.assertGreaterEqual(bucket.delay(), 30)
+
+        bucket.acquire()
+        self.assertGreaterEqual(clock.now, 30)
+
+        for _ in range(100):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 4)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("12"), 12)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    @patch.dict(os.environ, {"VENDOR_RATE_LIMITS": "purpleair=0.5, zephyr=3"})
+    def test_rate_limits(self):
+        limits = rate_limits()
+        self.assertEqual(limits["purpleair"], 0.5)
+        self.assertEqual(limits["zephyr"], 3)
+        self.assertEqual(limits["plume"], 5)
+
+        self.assertIs(rate_limiter_for_url("https://map.purpleair.com/v1/token"), vendor_rate_limiter("purpleair"))
+        self.assertIsNot(rate_limiter_for_url("https://example.com/api"), rate_limiter_for_url("https://example.org/api"))
+
+    def test_adapter_retries_too_many_requests(self):
+        """A 429 response holds the bucket of the vendor and the request is sent again"""
+        session = create_session()
+        adapter = session.get_adapter("https://rate-limit-test.example.com")
+        bucket = rate_limiter_for_url("https://rate-limit-test.example.com")
+
+        throttled, ok = Mock(status_code=429, headers={"Retry-After": "0"}), Mock(status_code=200, headers={})
+        with patch.object(HTTPAdapter, "send", side_effect=[throttled, ok]) as mocked_send:
+            response = adapter.send(requests.Request("GET", "https://rate-limit-test.example.com").prepare())
+
+        self.assertIs(response, ok)
+        self.assertEqual(mocked_send.call_count, 2)
+        self.assertLess(bucket.rate, bucket.configured_rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import datetime as dt
+import unittest  # The test framework
+import warnings
+from unittest import TestCase
+
+from core.models import SensorPlatformTypes as ModelSensorPlatformTypePlatform
+from routers.services.response_cache import CachedResponse, ResponseCache, cache_key, is_not_modified, make_etag, metadata_checksum
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+
+class Test_responseCache(TestCase):
+    """Tests the conditional request headers and the size bounded cache of rendered sensor summary responses."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        cls.last_updated = dt.datetime(2023, 9, 23, 12, 0, 30, 500, tzinfo=dt.timezone.utc)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    @staticmethod
+    def request(query_string: str, headers: dict = None) -> Request:
+        """builds a request to the json export"""
+        raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+        return Request({"type": "http", "method": "GET", "path": "/sensor-summary/as-json", "query_string": query_string.encode(), "headers": raw_headers})
+
+    @staticmethod
+    def entry(etag: str, size: int) -> CachedResponse:
+        return CachedResponse(etag, b"x" * size, "application/json", {"ETag": etag})
+
+    def test_cache_key_ignores_parameter_order(self):
+        self.assertEqual(cache_key(self.request("start=01-09-2023&end=02-09-2023")), cache_key(self.request("end=02-09-2023&start=01-09-2023")))
+        self.assertNotEqual(cache_key(self.request("start=01-09-2023&end=02-09-2023")), cache_key(self.request("start=01-09-2023&end=03-09-2023")))
+
+    def test_etag_changes_with_the_data(self):
+        etag = make_etag("key", 10, self.last_updated)
+        self.assertEqual(etag, make_etag("key", 10, self.last_updated))
+        self.assertNotEqual(etag, make_etag("key", 9, self.last_updated))
+        self.assertNotEqual(etag, make_etag("key", 10, self.last_updated + dt.timedelta(seconds=1)))
+        # the sensor metadata joined to the rows is part of the version
+        self.assertEqual(make_etag("key", 10, self.last_updated, ["a", "b"]), make_etag("key", 10, self.last_updated, ["a", "b"]))
+        self.assertNotEqual(make_etag("key", 10, self.last_updated, ["a", "b"]), make_etag("key", 10, self.last_updated, ["a", "c"]))
+        self.assertNotEqual(etag, make_etag("key", 10, self.last_updated, ["a"]))
+
+    def test_is_not_modified(self):
+        etag = make_etag("key", 10, self.last_updated)
+        self.assertTrue(is_not_modified(self.request("", {"If-None-Match": f'"other", {etag}'}), etag, self.last_updated))
+        self.assertFalse(is_not_modified(self.request("", {"If-None-Match": '"other"'}), etag, self.last_updated))
+        self.assertTrue(is_not_modified(self.request("", {"If-Modified-Since": "Sat, 23 Sep 2023 12:00:30 GMT"}), etag, self.last_updated))
+        self.assertFalse(is_not_modified(self.request("", {"If-Modified-Since": "Sat, 23 Sep 2023 12:00:29 GMT"}), etag, self.last_updated))
+        self.assertFalse(is_not_modified(self.request("", {"If-Modified-Since": "not a date"}), etag, self.last_updated))
+        # If-None-Match takes precedence over If-Modified-Since
+        self.assertFalse(is_not_modified(self.request("", {"If-None-Match": '"other"', "If-Modified-Since": "Sat, 23 Sep 2023 12:00:30 GMT"}), etag, self.last_updated))
+
+    def test_stale_entries_are_not_served(self):
+        cache = ResponseCache(1000)
+        cache.put("key", self.entry('"a"', 100))
+        self.assertEqual(cache.get("key", '"a"').body, b"x" * 100)
+        self.assertIsNone(cache.get("key", '"b"'))
+        self.assertEqual(cache.size, 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(1000)
+        for key in ["a", "b", "c", "d"]:
+            cache.put(key, self.entry('"etag"', 250))
+        cache.get("a", '"etag"')
+        cache.put("e", self.entry('"etag"', 250))
+
+        self.assertEqual(list(cache.entries), ["c", "d", "a", "e"])
+        self.assertEqual(cache.size, 1000)
+        # responses larger than a quarter of the cache are not cached
+        cache.put("f", self.entry('"etag"', 251))
+        self.assertNotIn("f", cache.entries)
+
+    def test_metadata_checksum(self):
+        sql = str(metadata_checksum([ModelSensorPlatformTypePlatform.id, ModelSensorPlatformTypePlatform.name]).compile(dialect=postgresql.dialect()))
+        self.assertIn('md5(string_agg(CAST(json_build_array("SensorPlatformTypes".id, "SensorPlatformTypes".name) AS TEXT), %(param_1)s ORDER BY "SensorPlatformTypes".id))', sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
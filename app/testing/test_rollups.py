@@ -0,0 +1,81 @@
+import json
+import unittest  # The test framework
+import warnings
+from types import SimpleNamespace
+from unittest import TestCase
+
+from routers.services.formatting import JsonToSensorReadable
+from routers.services.rollups import combine_rollups, compute_rollups, month_range, rollups_to_geojson
+from sensor_api_wrappers.data_transfer_object.sensor_readable import SensorReadable
+
+
+class Test_rollups(TestCase):
+    """Tests that the hourly, daily and monthly rollups match the averages computed from the raw measurement data."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the test environment once before all tests"""
+        warnings.simplefilter("ignore", ResourceWarning)
+        file = open("./testing/test_data/test_sensor_fromdb.json", "r")
+        cls.results = json.load(file)
+        file.close()
+        cls.sensor = JsonToSensorReadable(cls.results)[0][0]
+
+    @classmethod
+    def tearDownClass(cls):
+        """Tear down the test environment once after all tests"""
+        pass
+
+    def test_compute_rollups(self):
+        readings = len(self.sensor.df)
+
+        daily = compute_rollups(self.sensor, "D", stationary=False)
+        self.assertEqual(sum(row["measurement_count"] for row in daily), readings)
+        self.assertEqual(len(daily), len(self.results))
+
+        hourly = compute_rollups(self.sensor, "H", stationary=False)
+        self.assertEqual(sum(row["measurement_count"] for row in hourly), readings)
+        self.assertTrue(all(row["timestamp"] % 3600 == 0 for row in hourly))
+
+        monthly = compute_rollups(self.sensor, "M", stationary=False)
+        self.assertEqual(monthly[0]["timestamp"], month_range(daily[0]["timestamp"])[0])
+        self.assertEqual(monthly[0]["measurement_statistics"]["VOC"]["median"], self.sensor.df["VOC"].median())
+        self.assertEqual(monthly[0]["measurement_statistics"]["VOC"]["max"], self.sensor.df["VOC"].max())
+
+    def test_rollups_match_raw_geojson(self):
+        methods = ["mean", "count", "min", "max", "median"]
+        rows = [SimpleNamespace(type_name="test_sensor_type", **row) for row in compute_rollups(self.sensor, "H", stationary=False)]
+
+        from_rollups = rollups_to_geojson(rows, methods, "H")[0].geojson
+        from_raw = SensorReadable(self.sensor.id, self.sensor.df).to_geojson(methods, "H")
+
+        # the raw export also has a feature for the hours without readings
+        raw_features = [feature for feature in from_raw["features"] if feature["properties"]["VOC_count"]]
+        self.assertEqual(len(from_rollups["features"]), len(raw_features))
+        for rollup_feature, raw_feature in zip(from_rollups["features"], raw_features):
+            self.assertEqual(rollup_feature["geometry"], raw_feature["geometry"])
+            for key, value in raw_feature["properties"].items():
+                self.assertAlmostEqual(rollup_feature["properties"][key], value)
+
+    def test_combine_daily_rollups(self):
+        """the monthly rollup combined from the daily rollups matches the one computed from the readings, except for the median"""
+        daily = [SimpleNamespace(**row) for row in compute_rollups(self.sensor, "D", stationary=False)]
+        monthly = compute_rollups(self.sensor, "M", stationary=False)[0]
+
+        combined = combine_rollups(daily, "M", monthly["timestamp"])
+        self.assertEqual(combined["measurement_count"], monthly["measurement_count"])
+        self.assertEqual(combined["geom"], monthly["geom"])
+        for key in ["sensor_id", "resolution", "timestamp", "stationary", "min_latitude", "max_latitude", "min_longitude", "max_longitude"]:
+            self.assertEqual(combined[key], monthly[key])
+        for col, statistics in monthly["measurement_statistics"].items():
+            for method in ["mean", "min", "max", "count"]:
+                self.assertAlmostEqual(combined["measurement_statistics"][col][method], statistics[method])
+            medians = [row.measurement_statistics[col]["median"] for row in daily]
+            self.assertTrue(min(medians) <= combined["measurement_statistics"][col]["median"] <= max(medians))
+
+    def test_month_range(self):
+        self.assertEqual(month_range(1695427256), (1693526400, 1696118400))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import datetime as dt
 import json
+import os
+import tempfile
 import unittest  # The test framework
 import warnings
 from os import environ as env
@@ -10,6 +12,7 @@ import pandas as pd
 import requests
 from dotenv import load_dotenv
 from routers.services.enums import SensorMeasurementsColumns
+from sensor_api_wrappers.archive_cache import ArchiveCache
 from sensor_api_wrappers.concrete.factories.sensorCommunity_factory import SensorCommunityFactory
 from sensor_api_wrappers.concrete.products.sensorCommunity_sensor import SensorCommunitySensor
 
@@ -82,26 +85,74 @@ class Test_sensorCommunityFactory(TestCase):
         responses.append(file.read().encode())
         file.close()
 
-        # with patch.multiple("requests", get=MagicMock(side_effect=MockResponse.generateMockResponses)) as mock_requests:
-        with patch.multiple("requests", get=MagicMock(side_effect=[MockResponse(content=responses[0]), MockResponse(content=responses[1])])) as mock_requests:
-            start = dt.datetime(2023, 4, 1)
-            end = dt.datetime(2023, 4, 1)
-            sensor_id = "60641,SDS011,60642,BME280"
-            sensor_dict = {sensor_id: {"stationary_box": "POLYGON ((-1.5 53.5, -1.5 54.5, -0.5 54.5, -0.5 53.5, -1.5 53.5))", "time_updated": None}}
+        # the days of every sensor are downloaded concurrently, so the responses are matched by url
+        def mock_response(url, stream):
+            return MockResponse(content=responses[0] if "sds011" in url else responses[1])
 
-            sensors = list(self.scf.get_sensors_from_csv(sensor_dict, start, end))
+        start = dt.datetime(2023, 4, 1)
+        end = dt.datetime(2023, 4, 1)
+        sensor_id = "60641,SDS011,60642,BME280"
+
+        with tempfile.TemporaryDirectory() as cache_dir, patch.object(self.scf, "archive_cache", ArchiveCache(cache_dir, max_bytes=1024 * 1024)):
+            for downloads in [2, 0]:
+                with patch.object(requests.Session, "get", MagicMock(side_effect=mock_response)) as mock_requests:
+                    sensor_dict = {sensor_id: {"stationary_box": "POLYGON ((-1.5 53.5, -1.5 54.5, -0.5 54.5, -0.5 53.5, -1.5 53.5))", "time_updated": None}}
+
+                    sensors = list(self.scf.get_sensors_from_csv(sensor_dict, start, end))
+
+                    # the second time the archive files are read from the cache
+                    self.assertEqual(mock_requests.call_count, downloads)
+                    self.assertEqual(len(sensors), 1)
+
+                    sensor = sensors[0]
+                    self.assertTrue(isinstance(sensor, SensorCommunitySensor))
+                    self.assertEqual(sensor.id, sensor_id)
+                    self.assertTrue(isinstance(sensor.df, pd.DataFrame))
+                    # check that the dataframe contains the correct columns in any order
+                    self.assertEqual(
+                        set(sensor.df.columns.tolist()),
+                        set(self.expected_columns),
+                    )
+
+    def test_archive_cache_eviction(self):
+        """Test the least recently used archive files are evicted when the cache is over its budget"""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ArchiveCache(cache_dir, max_bytes=250)
+            first = cache.put("https://archive.sensor.community/a.csv", b"a" * 100)
+            cache.put("https://archive.sensor.community/b.csv", b"b" * 100)
+            os.utime(first, (0, 0))
+            cache.put("https://archive.sensor.community/c.csv", b"c" * 100)
+
+            self.assertIsNone(cache.get("https://archive.sensor.community/a.csv"))
+            self.assertEqual(cache.get("https://archive.sensor.community/c.csv").read_bytes(), b"c" * 100)
+            # identical files are stored once
+            self.assertEqual(cache.put("https://archive.sensor.community/d.csv", b"c" * 100), cache.get("https://archive.sensor.community/c.csv"))
+
+    def test_archive_cache_backfill_over_budget(self):
+        """Test the archive files of a backfill are not evicted before they are read when the days do not fit in the cache"""
+        file = open("testing/test_data/2023-04-01_sds011_sensor_60641.csv", "r")
+        content = file.read().encode()
+        file.close()
+
+        # every day has a different file, blank lines are skipped when the csv is read
+        def mock_response(url, stream):
+            return MockResponse(content=content + b"\n" * int(url.split("/")[-2][-2:]))
+
+        start = dt.datetime(2023, 4, 1)
+        end = dt.datetime(2023, 4, 4)
+        sensor_dict = {"60641,SDS011": {"stationary_box": None, "time_updated": None}}
+
+        with tempfile.TemporaryDirectory() as cache_dir, patch.object(self.scf, "archive_cache", ArchiveCache(cache_dir, max_bytes=len(content) * 2)):
+            with patch.object(requests.Session, "get", MagicMock(side_effect=mock_response)) as mock_requests:
+                sensors = list(self.scf.get_sensors_from_csv(sensor_dict, start, end))
 
-            self.assertEqual(len(sensors), 1)
+                self.assertEqual(mock_requests.call_count, 4)
+                self.assertIsNone(sensors[0].error)
+                self.assertTrue(isinstance(sensors[0].df, pd.DataFrame))
 
-            sensor = sensors[0]
-            self.assertTrue(isinstance(sensor, SensorCommunitySensor))
-            self.assertEqual(sensor.id, sensor_id)
-            self.assertTrue(isinstance(sensor.df, pd.DataFrame))
-            # check that the dataframe contains the correct columns in any order
-            self.assertEqual(
-                set(sensor.df.columns.tolist()),
-                set(self.expected_columns),
-            )
+            # the next write evicts the files of the backfill that was read
+            self.scf.archive_cache.put("https://archive.sensor.community/a.csv", b"a")
+            self.assertLessEqual(sum(path.stat().st_size for path in self.scf.archive_cache.objects.iterdir()), len(content) * 2)
 
     def test_prepare_sensor_platform_dict(self):
         """Test prepare the correct sensor platform dictionary.
@@ -114,7 +165,7 @@ class Test_sensorCommunityFactory(TestCase):
         expected = {"60641,SDS011,60642,BME280": {"60641": "SDS011", "60642": "BME280", "startDate": start}}
         self.assertEqual(sensor_platforms, expected)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_get_sensor_columns_from_db(self, mocked_get):
         """Test fetch the correct sensor columns from the API/database.
         \n Uses mock data"""
@@ -170,7 +221,7 @@ class Test_sensorCommunityFactory(TestCase):
         }
         self.assertEqual(sensor_columns, expected)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_get_sensors(self, mocked_get):
         """Test fetch the correct sensor data from the API.
         \n Uses mock data"""
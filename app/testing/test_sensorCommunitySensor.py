@@ -96,6 +96,21 @@ class Test_sensorCommunitySensor(TestCase):
             set(self.expected_columns_2),
         )
 
+    def test_sensorCommunity_combine_days(self):
+        """Tests that the days of a sensor platform are combined with the values of the first sensor taking precedence, at once and a day at a time."""
+        index = pd.date_range("2023-04-01", periods=4, freq="145S", name="timestamp")
+        sds011 = {0: pd.DataFrame({"P1": [1.0, None, 3.0, 4.0]}, index=index), 86400: pd.DataFrame({"P1": [5.0, 6.0]}, index=index[:2] + pd.Timedelta(days=1))}
+        bme280 = {0: pd.DataFrame({"P1": [9.0, 9.0, 9.0, 9.0], "temperature": [10.0, 11.0, None, None]}, index=index)}
+        sensorPlatform = {"60641,SDS011,60642,BME280": {60641: sds011, 60642: bme280}}
+
+        combined = SensorCommunitySensor.ResampleDataAndSortIntoDays(sensorPlatform, "145S")
+        self.assertEqual(combined["P1"].tolist(), [1.0, 9.0, 3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(combined["temperature"].tolist()[:2], [10.0, 11.0])
+
+        days = list(SensorCommunitySensor.StreamResampledDays(sensorPlatform, "145S"))
+        self.assertEqual(len(days), 2)
+        pd.testing.assert_frame_equal(pd.concat(days)[combined.columns], combined, check_freq=False)
+
 
 if __name__ == "__main__":
     unittest.main()
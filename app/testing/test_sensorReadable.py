@@ -6,6 +6,7 @@ from io import StringIO
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
+import pandas as pd
 from core.schema import SensorSummary as SchemaSensorSummary
 from routers.services.formatting import JsonToSensorReadable
 from sensor_api_wrappers.concrete.factories.plume_factory import PlumeFactory
@@ -48,6 +49,13 @@ class Test_sensorReadable(TestCase):
             self.assertTrue(isinstance(sensor[0], SensorReadable))
             self.assertEqual(sensor[1], "test_sensor_type")
 
+    def test_SensorReadable_from_projected_dictionary(self):
+        """measurement data projected by postgres is returned as a dictionary rather than a json string"""
+        projected = {"1695427256": {"NO2": 0}, "1695427316": {"NO2": None}}
+        df = SensorReadable.JsonStringToDataframe(projected, boundingBox=None)
+        self.assertEqual(df["Timestamp"].tolist(), [1695427256, 1695427316])
+        self.assertEqual(df["NO2"].tolist(), [0, None])
+
     def test_AveragesConversion_from_db(self):
         file = open("./testing/test_data/test_sensor_fromdb.json", "r")
         results = json.load(file)
@@ -82,6 +90,40 @@ class Test_sensorReadable(TestCase):
             # with open("./testing/test_data/output/geojson.json", "w") as file:
             #     file.write(json.dumps(geojson, indent=4, default=str))
 
+    def test_SensorReadable_to_geojson_geometry(self):
+        """stationary sensors use their bounding box, mobile sensors a point or the box around their readings"""
+        index = pd.to_datetime([1695427200, 1695427260, 1695430800, 1695434400], unit="s")
+        df = pd.DataFrame({"NO2": [1.0, 3.0, 5.0, None], "Latitude": [52.1, 52.1, 52.1, None], "Longitude": [-1.9, -1.8, -1.8, None]}, index=index)
+
+        stationary = SensorReadable(1, df.assign(boundingBox=self.stationaryBox)).to_geojson(["mean"], "H")
+        self.assertEqual(stationary["features"][0]["geometry"]["type"], "Polygon")
+        self.assertEqual(stationary["features"][0]["geometry"]["coordinates"][0][0], [-1.8364709615707395, 52.42585638758735])
+        self.assertEqual(stationary["features"][0]["properties"]["NO2_mean"], 2.0)
+
+        mobile = SensorReadable(1, df.assign(boundingBox=None)).to_geojson(["mean"], "H")
+        self.assertEqual(mobile["features"][0]["geometry"], {"type": "Polygon", "coordinates": [[[-1.9, 52.1], [-1.9, 52.1], [-1.8, 52.1], [-1.8, 52.1], [-1.9, 52.1]]]})
+        self.assertEqual(mobile["features"][1]["geometry"], {"type": "Point", "coordinates": [-1.8, 52.1]})
+        self.assertEqual(mobile["features"][2]["geometry"]["coordinates"], [[]])
+        self.assertIsNone(mobile["features"][2]["properties"]["NO2_mean"])
+
+    def test_panel_averages(self):
+        """the averages of a panel of sensors are those of each sensor on its own, including the empty buckets of a sensor"""
+        index = pd.to_datetime([1695427200, 1695427260, 1695438000, 1695441600], unit="s")
+        df = pd.DataFrame({"NO2": [1.0, 3.0, 5.0, None], "Latitude": [52.1, 52.1, 52.1, None], "Longitude": [-1.9, -1.8, -1.8, None]}, index=index)
+        frames = [df.assign(boundingBox=self.stationaryBox), df.iloc[1:].assign(boundingBox=None), df.assign(VOC=[1, 2, 3, 4], boundingBox=None)]
+
+        panel = [SensorReadable(i, frame) for i, frame in enumerate(frames)]
+        measurement_columns = SensorReadable.panel_averages(panel, ["mean", "count"], "H")
+        self.assertEqual(measurement_columns, [["NO2"], ["NO2"], ["NO2", "VOC"]])
+
+        for i, frame in enumerate(frames):
+            sensor = SensorReadable(i, frame)
+            self.assertEqual(sensor.ConvertDFToAverages(["mean", "count"], "H"), measurement_columns[i])
+            self.assertEqual(panel[i].averages_to_geojson(measurement_columns[i], ["mean", "count"]), sensor.averages_to_geojson(measurement_columns[i], ["mean", "count"]))
+
+        # the hours without readings are kept with a count of 0
+        self.assertEqual(panel[0].df[("NO2", "count")].tolist(), [2, 0, 0, 1, 0])
+
 
 if __name__ == "__main__":
     unittest.main()
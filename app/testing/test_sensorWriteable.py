@@ -7,8 +7,10 @@ from io import StringIO
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
+import pandas as pd
 from core.schema import SensorSummary as SchemaSensorSummary
 from parameterized import parameterized
+from routers.services.enums import SensorMeasurementsColumns
 from sensor_api_wrappers.concrete.factories.plume_factory import PlumeFactory
 from sensor_api_wrappers.concrete.products.plume_sensor import PlumeSensor
 from sensor_api_wrappers.concrete.products.sensorCommunity_sensor import SensorCommunitySensor
@@ -230,6 +232,48 @@ class Test_sensorWriteable(TestCase):
             self.assertFalse(sensor_summary.stationary)
             self.assertTrue(sensor_summary.measurement_count > 0)
 
+    def test_dataframe_to_dict(self):
+        first_day = int(dt.datetime(2023, 4, 1, tzinfo=dt.timezone.utc).timestamp())
+        second_day = int(dt.datetime(2023, 4, 2, tzinfo=dt.timezone.utc).timestamp())
+        # hourly readings from 20:00 of the first day
+        timestamps = [first_day + (20 + i) * 3600 for i in range(12)]
+        # unsorted readings, the last of which does not have a valid date
+        df = pd.DataFrame({"Timestamp": timestamps, "value": range(12)}, index=pd.to_datetime(timestamps, unit="s")).iloc[[6, 0, 7, 1, 8, 2, 9, 3, 10, 4, 11, 5]]
+        df.index = list(df.index[:-1]) + ["not a date"]
+
+        data_dict = SensorWritable("1", df).dataframe_to_dict(df)
+
+        self.assertEqual(list(data_dict.keys()), [first_day, second_day])
+        self.assertEqual(list(data_dict[first_day]["value"]), [0, 1, 2, 3])
+        self.assertEqual(sorted(data_dict[second_day]["value"]), [4, 6, 7, 8, 9, 10, 11])
+        self.assertEqual(data_dict[first_day].index.name, "Timestamp")
+        # the dataframe is not changed
+        self.assertEqual(list(df.columns), ["Timestamp", "value"])
+
+    def test_day_geometries(self):
+        first_day = int(dt.datetime(2023, 4, 1, tzinfo=dt.timezone.utc).timestamp())
+        timestamps = [first_day + i * 3600 for i in range(72)]
+        df = pd.DataFrame({"Timestamp": timestamps, "value": range(72)}, index=pd.to_datetime(timestamps, unit="s"))
+        # no location data on the first day, a single location close to the stationary box on the second day and readings far away on the third day
+        df[SensorMeasurementsColumns.LATITUDE.value] = [float("nan")] * 24 + [52.454] * 24 + [51.5 + i * 0.01 for i in range(24)]
+        df[SensorMeasurementsColumns.LONGITUDE.value] = [float("nan")] * 24 + [-1.893] * 24 + [-0.12] * 24
+
+        sensor = SensorWritable("1", df)
+        (frame, keys, boundaries) = sensor.split_into_days(df)
+        self.assertEqual(keys.tolist(), [first_day, first_day + 86400, first_day + 2 * 86400])
+
+        (geometries, stationary) = sensor.day_geometries(frame, boundaries, self.stationaryBox)
+        self.assertEqual(stationary.tolist(), [True, True, False])
+        self.assertEqual(geometries[:2], [self.stationaryBox, self.stationaryBox])
+        self.assertEqual(geometries[2], "POLYGON((-0.12 51.5,-0.12 {0},-0.12 {0},-0.12 51.5,-0.12 51.5))".format(51.5 + 23 * 0.01))
+
+        # without a stationary box the second day is a box of 0.0001 degrees around its location and the first day has no geometry
+        (geometries, stationary) = sensor.day_geometries(frame, boundaries)
+        self.assertFalse(stationary.any())
+        self.assertIsNone(geometries[0])
+        self.assertEqual(geometries[1], sensor.generate_geomertyString(frame.iloc[boundaries[1] : boundaries[2]]))
+        self.assertEqual(sensor.get_centre_of_polygon(self.stationaryBox), sensor.get_centre_of_polygon(self.stationaryBox.replace("POLYGON ((", "POLYGON((")))
+
 
 if __name__ == "__main__":
     unittest.main()
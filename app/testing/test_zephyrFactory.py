@@ -60,7 +60,7 @@ class Test_zephyrFactory(TestCase):
         """Tear down the test environment after each test"""
         pass
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_fetch_lookup_ids(self, mocked_get):
         """Test fetch the correct lookup ids.
         \n Uses mock data"""
@@ -78,7 +78,7 @@ class Test_zephyrFactory(TestCase):
         expected = ["814", "821"]
         self.assertEqual(sensor_platforms, expected)
 
-    @patch.object(requests, "get")
+    @patch.object(requests.Session, "get")
     def test_get_sensors(self, mocked_get):
         """Test fetch the correct sensor data.
         \n Uses mock data"""